@@ -0,0 +1,33 @@
+# Benchmark of the permission check done once per facade call (see Goosvc.permission).
+# run from the repository root:
+# > python -m benchmarks.bench_permissions
+import shutil
+import time
+from goosvc.goosvc import Goosvc
+from goosvc.core.projects import GoosvcPermission
+
+BASE_DIR = "data-bench"
+OWNER_NAME = "bench_owner"
+USER_NAME = "bench_user"
+PROJECT_NAME = "bench_permissions"
+CALLS = 100000
+
+
+def run(gvc: Goosvc, user: str):
+    start = time.perf_counter()
+    for i in range(CALLS):
+        gvc.permission(OWNER_NAME, PROJECT_NAME, user)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    gvc = Goosvc(BASE_DIR)
+    gvc.create_project(OWNER_NAME, PROJECT_NAME)
+    try:
+        gvc.set_access_permission(OWNER_NAME, PROJECT_NAME, USER_NAME, GoosvcPermission(True, False, False))
+        for user in [OWNER_NAME, USER_NAME, "unknown_user", "app"]:
+            seconds = run(gvc, user)
+            print(f"{user}: {CALLS} checks in {seconds:.3f} s ({seconds / CALLS * 1e9:.0f} ns per check)")
+    finally:
+        gvc.delete_project(OWNER_NAME, PROJECT_NAME)
+        shutil.rmtree(BASE_DIR, ignore_errors=True)
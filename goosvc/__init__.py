@@ -1,4 +1,5 @@
 from goosvc.goosvc import Goosvc
+from goosvc.asyncgoosvc import AsyncGoosvc
 from goosvc.core.artifacts import StoreFileArtifact, DeleteArtifact
 from goosvc.core.chats import GoosvcChat
 from goosvc.core.messages import GoosvcMessage
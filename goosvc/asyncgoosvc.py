@@ -0,0 +1,266 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Union
+from goosvc.core import  artifacts, chats, messages, nodes, projects, stages, branches, transactions
+from goosvc.goosvc import Goosvc, DEFAULT_BASE_DIR
+
+DEFAULT_ASYNC_WORKERS = 32 # threads running storage calls. bounds the blocking calls in progress, not the number of callers
+
+
+# Asyncio facade with the same functions as Goosvc. Storage calls (file io and lock waits) run in a bounded
+# worker pool, so the event loop is never blocked and many concurrent sessions share a few threads.
+# Cancelling a call that has not started yet removes it from the pool. A call already running is completed
+# (writes are never interrupted halfway), only its result is discarded.
+class AsyncGoosvc:
+
+    def __init__(self, base_dir: str = DEFAULT_BASE_DIR, workers: int = DEFAULT_ASYNC_WORKERS, gvc: Goosvc = None):
+        # an existing facade can be shared with synchronous code of the same process
+        self.gvc = gvc if gvc != None else Goosvc(base_dir)
+        self.owns_gvc = gvc == None
+        self.core = self.gvc.core
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="goosvc")
+
+    # waits for running calls and stops the worker pool. a facade created here is closed as well (see Goosvc.close)
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        if self.owns_gvc:
+            self.gvc.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+    async def __run(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, functools.partial(function, *args))
+
+    # ----------------
+    # Info functions
+    # ----------------
+
+    async def get_branch_details(self, owner: str, project: str, branch_ids: list = None, requester: str = "app"):
+        return await self.__run(self.gvc.get_branch_details, owner, project, branch_ids, requester)
+
+    # ----------------
+    # Project functions
+    # ----------------
+
+    async def get_project_names(self, owner, requester: str = "app"):
+        return await self.__run(self.gvc.get_project_names, owner, requester)
+
+    async def get_project_names_page(self, owner, limit: int = projects.DEFAULT_PROJECTS_PAGE_SIZE, cursor: str = None, requester: str = "app"):
+        return await self.__run(self.gvc.get_project_names_page, owner, limit, cursor, requester)
+
+    async def get_project_count(self, owner, requester: str = "app"):
+        return await self.__run(self.gvc.get_project_count, owner, requester)
+
+    async def create_project(self, owner: str, project: str, project_description: str = "", requester: str = "app"):
+        return await self.__run(self.gvc.create_project, owner, project, project_description, requester)
+
+    async def get_project(self, owner: str, project: str, requester: str = "app"):
+        return await self.__run(self.gvc.get_project, owner, project, requester)
+
+    async def delete_project(self, owner: str, project: str, requester: str = "app"):
+        return await self.__run(self.gvc.delete_project, owner, project, requester)
+
+    async def set_access_permission(self, owner: str, project: str, user: str, new_permission: projects.GoosvcPermission, requester: str = "app"):
+        return await self.__run(self.gvc.set_access_permission, owner, project, user, new_permission, requester)
+
+    async def get_access_permission(self, owner: str, project: str, user: str, requester: str = "app"):
+        return await self.__run(self.gvc.get_access_permission, owner, project, user, requester)
+
+    async def set_private(self, owner: str, project: str, private: bool, requester: str = "app"):
+        return await self.__run(self.gvc.set_private, owner, project, private, requester)
+
+    # ----------------
+    # Admin functions
+    # ----------------
+
+    async def lock_all_projects(self):
+        return await self.__run(self.gvc.lock_all_projects)
+
+    # ----------------
+    # Owner functions
+    # ----------------
+
+    async def get_owners(self):
+        return await self.__run(self.gvc.get_owners)
+
+    # ----------------
+    # Branch functions
+    # ----------------
+
+    async def get_branches(self, owner: str, project: str, requester: str = "app"):
+        return await self.__run(self.gvc.get_branches, owner, project, requester)
+
+    async def get_branch_head(self, owner: str, project: str, branch_id: str, requester: str = "app"):
+        return await self.__run(self.gvc.get_branch_head, owner, project, branch_id, requester)
+
+    async def get_heads(self, owner: str, project: str, requester: str = "app"):
+        return await self.__run(self.gvc.get_heads, owner, project, requester)
+
+    # Branch Groups
+
+    async def create_branch_group(self, owner: str, project: str, branch_group: branches.BranchGroup, requester: str = "app"):
+        return await self.__run(self.gvc.create_branch_group, owner, project, branch_group, requester)
+
+    async def update_branch_group(self, owner: str, project: str, branch_group: branches.BranchGroup, requester: str = "app"):
+        return await self.__run(self.gvc.update_branch_group, owner, project, branch_group, requester)
+
+    async def get_branch_group(self, owner: str, project: str, group_id: str, requester: str = "app"):
+        return await self.__run(self.gvc.get_branch_group, owner, project, group_id, requester)
+
+    async def get_branch_groups(self, owner: str, project: str, requester: str = "app"):
+        return await self.__run(self.gvc.get_branch_groups, owner, project, requester)
+
+    # ----------------
+    # Stage functions
+    # ----------------
+
+    async def add_stage(self, owner: str, project: str, id: str, stage: stages.GoosvcStage, requester: str = "app"):
+        return await self.__run(self.gvc.add_stage, owner, project, id, stage, requester)
+
+    async def get_stage_node(self, owner: str, project: str, id: str, stage_name: str, root_id: str = None, requester: str = "app"):
+        return await self.__run(self.gvc.get_stage_node, owner, project, id, stage_name, root_id, requester)
+
+    async def get_stage_nodes(self, owner: str, project: str, id: str, root_id: str = None, requester: str = "app"):
+        return await self.__run(self.gvc.get_stage_nodes, owner, project, id, root_id, requester)
+
+    async def get_stage_names(self, owner: str, project: str, id: str, requester: str = "app"):
+        return await self.__run(self.gvc.get_stage_names, owner, project, id, requester)
+
+    # ----------------
+    # Node functions
+    # ----------------
+
+    async def add_node(self, owner: str, project: str, node: nodes.GoosvcNode, requester: str = "app"):
+        return await self.__run(self.gvc.add_node, owner, project, node, requester)
+
+    async def add_nodes(self, owner: str, project: str, parent_id: str, nodes: list[nodes.GoosvcNode], requester: str = "app"):
+        return await self.__run(self.gvc.add_nodes, owner, project, parent_id, nodes, requester)
+
+    async def get_node(self, owner: str, project: str, node_id: str, requester: str = "app"):
+        return await self.__run(self.gvc.get_node, owner, project, node_id, requester)
+
+    async def get_path(self, owner: str, project: str, id: str, type: list[str] = [], root_id: str = None, requester: str = "app"):
+        return await self.__run(self.gvc.get_path, owner, project, id, type, root_id, requester)
+
+    async def get_path_ids(self, owner: str, project: str, id: str, type: list[str] = [], root_id: str = None, requester: str = "app"):
+        return await self.__run(self.gvc.get_path_ids, owner, project, id, type, root_id, requester)
+
+    async def get_nodes(self, owner: str, project: str, requester: str = "app"):
+        return await self.__run(self.gvc.get_nodes, owner, project, requester)
+
+    async def get_nodes_page(self, owner: str, project: str, limit: int = nodes.DEFAULT_NODES_PAGE_SIZE, cursor: str = None, type: list[str] = [], author: str = None, start_time: int = None, end_time: int = None, transaction_id: str = None, requester: str = "app"):
+        return await self.__run(self.gvc.get_nodes_page, owner, project, limit, cursor, type, author, start_time, end_time, transaction_id, requester)
+
+    # pages through the nodes in the worker pool (see get_nodes_page)
+    async def iter_nodes(self, owner: str, project: str, type: list[str] = [], author: str = None, start_time: int = None, end_time: int = None, transaction_id: str = None, cursor: str = None, requester: str = "app"):
+        while True:
+            page, cursor = await self.__run(self.gvc.get_nodes_page, owner, project, nodes.DEFAULT_NODES_PAGE_SIZE, cursor, type, author, start_time, end_time, transaction_id, requester)
+            for node in page:
+                yield node
+            if cursor == None:
+                return
+
+    # ----------------
+    # Artifact functions
+    # ----------------
+
+    async def store_artifact(self, owner: str, project: str, id: str, chat_id: str, artifact: Union[artifacts.StoreFileArtifact, artifacts.StoreTextArtifact], requester: str = "app"):
+        return await self.__run(self.gvc.store_artifact, owner, project, id, chat_id, artifact, requester)
+
+    async def delete_artifact(self, owner: str, project: str, id: str, chat_id: str, artifact: artifacts.DeleteArtifact, requester: str = "app"):
+        return await self.__run(self.gvc.delete_artifact, owner, project, id, chat_id, artifact, requester)
+
+    async def rename_artifact(self, owner: str, project: str, id: str, chat_id: str, artifact: artifacts.RenameArtifact, requester: str = "app"):
+        return await self.__run(self.gvc.rename_artifact, owner, project, id, chat_id, artifact, requester)
+
+    async def get_artifact_file(self, owner: str, project: str, artifact_id: str, requester: str = "app"):
+        return await self.__run(self.gvc.get_artifact_file, owner, project, artifact_id, requester)
+
+    async def get_artifact_name(self, owner: str, project: str, artifact_id: str, requester: str = "app"):
+        return await self.__run(self.gvc.get_artifact_name, owner, project, artifact_id, requester)
+
+    async def get_artifact_nodes(self, owner: str, project: str, node_id: str, chat_id: str, requester: str = "app"):
+        return await self.__run(self.gvc.get_artifact_nodes, owner, project, node_id, chat_id, requester)
+
+    async def get_artifact_node_by_name(self, owner: str, project: str, id: str, chat_id: str, filename: str, path: str, requester: str = "app"):
+        return await self.__run(self.gvc.get_artifact_node_by_name, owner, project, id, chat_id, filename, path, requester)
+
+    async def get_artifacts(self, owner: str, project: str, id: str, chat_id: str, requester: str = "app"):
+        return await self.__run(self.gvc.get_artifacts, owner, project, id, chat_id, requester)
+
+    async def get_diff_artifact_nodes(self, owner, project, from_node_id, to_node_id, requester: str = "app"):
+        return await self.__run(self.gvc.get_diff_artifact_nodes, owner, project, from_node_id, to_node_id, requester)
+
+    async def get_all_artifact_versions(self, owner: str, project: str, id: str, artifact_node_id: str, requester: str = "app"):
+        return await self.__run(self.gvc.get_all_artifact_versions, owner, project, id, artifact_node_id, requester)
+
+    # ----------------
+    # Merge functions
+    # ----------------
+
+    async def merge(self, owner: str, project: str, author: str, head_ids: list[str], requester: str = "app"):
+        return await self.__run(self.gvc.merge, owner, project, author, head_ids, requester)
+
+    # ----------------
+    # Chat functions
+    # ----------------
+
+    async def create_chat(self, owner: str, project: str, id: str, chat: chats.GoosvcChat, requester: str = "app"):
+        return await self.__run(self.gvc.create_chat, owner, project, id, chat, requester)
+
+    async def get_chats(self, owner: str, project: str, id: str, requester: str = "app"):
+        return await self.__run(self.gvc.get_chats, owner, project, id, requester)
+
+    async def get_chat_node(self, owner: str, project: str, chat_id: str, id: str, requester: str = "app"):
+        return await self.__run(self.gvc.get_chat_node, owner, project, chat_id, id, requester)
+
+    # ----------------
+    # Message functions
+    # ----------------
+
+    async def add_message(self, owner: str, project: str, id: str, message: messages.GoosvcMessage, requester: str = "app"):
+        return await self.__run(self.gvc.add_message, owner, project, id, message, requester)
+
+    async def get_message_nodes(self, owner: str, project: str, chat_id: str, node_id: str, requester: str = "app", limit: int = None, before: str = None, after: str = None):
+        return await self.__run(self.gvc.get_message_nodes, owner, project, chat_id, node_id, requester, limit, before, after)
+
+    async def get_last_message_node(self, owner: str, project: str, chat_id: str, id: str, requester: str = "app"):
+        return await self.__run(self.gvc.get_last_message_node, owner, project, chat_id, id, requester)
+
+    async def get_messages(self, owner: str, project: str, chat_id: str, node_id: str, requester: str = "app", limit: int = None, before: str = None, after: str = None):
+        return await self.__run(self.gvc.get_messages, owner, project, chat_id, node_id, requester, limit, before, after)
+
+    async def get_messages_page(self, owner: str, project: str, chat_id: str, node_id: str, limit: int = messages.DEFAULT_MESSAGES_PAGE_SIZE, cursor: str = None, requester: str = "app"):
+        return await self.__run(self.gvc.get_messages_page, owner, project, chat_id, node_id, limit, cursor, requester)
+
+    # returns the message nodes of a chat one at a time, newest first (see Goosvc.iter_message_nodes).
+    # the nodes are read page by page in the worker pool
+    async def iter_message_nodes(self, owner: str, project: str, chat_id: str, node_id: str, requester: str = "app", before: str = None):
+        while True:
+            page = await self.__run(self.gvc.get_message_nodes, owner, project, chat_id, node_id, requester, messages.DEFAULT_MESSAGES_PAGE_SIZE, before)
+            for message_node in reversed(page):
+                yield message_node
+            if len(page) < messages.DEFAULT_MESSAGES_PAGE_SIZE:
+                return
+            before = page[0].node_id
+
+    async def get_message(self, owner: str, project: str, node_id: str, requester: str = "app"):
+        return await self.__run(self.gvc.get_message, owner, project, node_id, requester)
+
+    async def get_message_node(self, owner: str, project: str, node_id: str, requester: str = "app"):
+        return await self.__run(self.gvc.get_message_node, owner, project, node_id, requester)
+
+    # ----------------
+    # Transaction functions
+    # ----------------
+
+    async def start_transaction(self, owner: str, project: str, id: str, transaction: transactions.GoosvcTransaction, requester: str = "app"):
+        return await self.__run(self.gvc.start_transaction, owner, project, id, transaction, requester)
+
+    async def end_transaction(self, owner: str, project: str, id: str, transaction: transactions.GoosvcTransaction, requester: str = "app"):
+        return await self.__run(self.gvc.end_transaction, owner, project, id, transaction, requester)
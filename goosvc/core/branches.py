@@ -1,14 +1,17 @@
 import os
-import time
 import json
+import threading
 from goosvc.core import common as common
 from dataclasses import dataclass
 import dataclasses
 from goosvc.core.projects import GoosvcProjects
+from goosvc.core.exceptions import GoosvcException
 
 
-HEADREAD_MAX_RETRY = 100
-DEFAULT_BRANCH_HEAD_CACHE_SIZE = 1000
+DEFAULT_HEAD_LOG_SIZE = 10000 # head updates logged before the registry is written to a new snapshot
+HEAD_LOG_FILE = "heads.log"
+HEAD_SNAPSHOT_FILE = "heads.json"
+HEAD_LOG_ENTRY_SIZE = 66 # branch id, blank, head id and newline
 
 @dataclass
 class BranchGroup:
@@ -17,106 +20,168 @@ class BranchGroup:
     group_id: str = None
 
 
+# Branch heads of a project, loaded once. The heads are stored in a snapshot (heads.json) and a log of
+# the updates since the snapshot (heads.log, one line per update: branch id and head id).
+class GoosvcBranchRegistry:
+    def __init__(self, branches_dir: str):
+        self.branches_dir = branches_dir
+        self.lock = threading.Lock() # protects the log and the snapshot
+        self.heads = {} # branch id -> head node id, in order of creation
+        self.head_index = {} # head node id -> branch id
+        snapshot_file = os.path.join(branches_dir, HEAD_SNAPSHOT_FILE)
+        if os.path.exists(snapshot_file):
+            with open(snapshot_file, 'r') as f:
+                for branch_id, head_id in json.load(f).items():
+                    self.set_head(branch_id, head_id)
+        log_file = os.path.join(branches_dir, HEAD_LOG_FILE)
+        self.log_entries = 0
+        if os.path.exists(log_file):
+            with open(log_file, 'rb') as f:
+                data = f.read()
+            # an incomplete update at the end (e.g. after a crash) is ignored
+            self.log_entries = len(data) // HEAD_LOG_ENTRY_SIZE
+            for i in range(self.log_entries):
+                entry = data[i * HEAD_LOG_ENTRY_SIZE:(i + 1) * HEAD_LOG_ENTRY_SIZE].decode()
+                self.set_head(entry[:32], entry[33:65])
+        # the log is not changed here: another process may be writing to it (see append)
+        self.log = open(log_file, 'ab')
+        self.__migrate()
+
+    # updates the registry in memory (caller must write the update to the log)
+    def set_head(self, branch_id: str, head_id: str):
+        old_head = self.heads.get(branch_id)
+        if old_head != None and self.head_index.get(old_head) == branch_id:
+            del self.head_index[old_head]
+        self.heads[branch_id] = head_id
+        self.head_index[head_id] = branch_id
+
+    # logs a head update. the registry is written to a new snapshot when the log is full
+    def append(self, branch_id: str, head_id: str, max_log_entries: int):
+        with self.lock:
+            self.set_head(branch_id, head_id)
+            size = os.fstat(self.log.fileno()).st_size
+            if size % HEAD_LOG_ENTRY_SIZE != 0:
+                # incomplete update at the end (interrupted write)
+                self.log.truncate(size - size % HEAD_LOG_ENTRY_SIZE)
+            self.log.write((branch_id + " " + head_id + "\n").encode())
+            self.log.flush()
+            self.log_entries += 1
+            if self.log_entries >= max_log_entries:
+                self.__write_snapshot()
+
+    # flushes the log to disk
+    def sync(self):
+        with self.lock:
+            os.fsync(self.log.fileno())
+
+    def close(self):
+        with self.lock:
+            self.log.close()
+
+    # writes all heads to a new snapshot and clears the log. caller must hold the lock
+    def __write_snapshot(self):
+        snapshot_file = os.path.join(self.branches_dir, HEAD_SNAPSHOT_FILE)
+        common.write_file(snapshot_file, json.dumps(self.heads), True)
+        # a crash before the log is cleared only applies the logged updates again
+        self.log.truncate(0)
+        self.log_entries = 0
+
+    # projects created with one file per branch (<branch id>.json) are converted to a snapshot
+    def __migrate(self):
+        branch_files = [file for file in os.listdir(self.branches_dir) if file.endswith(".json") and file != HEAD_SNAPSHOT_FILE]
+        if len(branch_files) == 0:
+            return
+        for branch_file in branch_files:
+            branch_id = os.path.splitext(branch_file)[0]
+            if branch_id in self.heads:
+                continue
+            with open(os.path.join(self.branches_dir, branch_file), 'r') as f:
+                head_id = f.read()
+            if common.is_id_valid(head_id):
+                self.set_head(branch_id, head_id)
+        with self.lock:
+            self.__write_snapshot()
+        for branch_file in branch_files:
+            os.remove(os.path.join(self.branches_dir, branch_file))
+
+
 # For all functions we assume that the node_id is a valid node_id. 
 # Should be checked before calling the functions
 class GoosvcBranches:
     def __init__(self, projects_dir: str, projects: GoosvcProjects):
         self.projects_dir = projects_dir
         self.projects = projects
-        # path cache by owner and project
-        self.branch_head_cache = {}
-        self.branch_head_cache_size = DEFAULT_BRANCH_HEAD_CACHE_SIZE
+        self.head_log_size = DEFAULT_HEAD_LOG_SIZE
+        # branch registries by owner and project
+        self.registries = {}
+        self.registries_lock = threading.Lock()
 
     def get_branches(self, owner: str, project: str):
-        branches_dir = self.__get_branches_dir(owner, project)
-        if not os.path.exists(branches_dir):
+        registry = self.__get_registry(owner, project)
+        if registry == None:
             return []
-        branch_files = os.listdir(branches_dir)
-        branch_ids = [os.path.splitext(branch_file)[0] for branch_file in branch_files]
-        return branch_ids
+        return list(registry.heads)
     
     def is_branch(self, owner: str, project: str, branch_id: str):
-        if owner in self.branch_head_cache and project in self.branch_head_cache[owner]:
-            if branch_id in self.branch_head_cache[owner][project]:
-                return True
-        branch_file = self.__get_branch_file(owner, project, branch_id)
-        return os.path.exists(branch_file)
+        registry = self.__get_registry(owner, project)
+        return registry != None and branch_id in registry.heads
     
     #  to be removed (backward compatibility)
     def get_heads(self, owner: str, project: str):
-        branches = self.get_branches(owner, project)
-        heads = []
-        for branch_id in branches:
-            branch_head = self.get_branch_head(owner, project, branch_id)
-            if branch_head == None:
-                continue
-            heads.append(branch_head)
-        return heads
+        registry = self.__get_registry(owner, project)
+        if registry == None:
+            return []
+        return list(registry.heads.values())
     
     def get_branch_head(self, owner: str, project: str, branch_id: str):
-        if owner in self.branch_head_cache and project in self.branch_head_cache[owner]:
-            if branch_id in self.branch_head_cache[owner][project]:
-                # read from cache
-                return self.branch_head_cache[owner][project][branch_id]
-        # read from file
-        branch_file = self.__get_branch_file(owner, project, branch_id)
-        retry_count = 0
-        while retry_count < HEADREAD_MAX_RETRY:
-            retry_count += 1
-            if not os.path.exists(branch_file):
-                return None
-            try:
-                with open(branch_file, 'r') as f:
-                    head_id = f.read()
-                    if common.is_id_valid(head_id):
-                        self.update_branch_head_cache(owner, project, branch_id, head_id)
-                        return head_id
-            except:
-                pass
-            time.sleep(0.01)
-
-    def create_branch(self, owner: str, project: str, node_id: str):
-        branch_id = common.get_id()
-        branch_file = self.__get_branch_file(owner, project, branch_id)
-        with open(branch_file, 'w') as f:
-            # save to file
-            f.write(node_id)
-            # update cache
-            self.update_branch_head_cache(owner, project, branch_id, node_id)
+        registry = self.__get_registry(owner, project)
+        if registry == None:
+            return None
+        if not self.projects.lock_project_read(owner, project):
+            raise GoosvcException("1003")
+        try:
+            return registry.heads.get(branch_id)
+        finally:
+            self.projects.release_project_read(owner, project)
+
+    # creates a new branch with head node_id. branch_id is generated if not given
+    def create_branch(self, owner: str, project: str, node_id: str, branch_id: str = None):
+        registry = self.__get_registry(owner, project)
+        if registry == None:
+            return None
+        if branch_id == None:
+            branch_id = common.get_id()
+        if not common.is_id_valid(branch_id) or not common.is_id_valid(node_id):
+            return None
+        registry.append(branch_id, node_id, self.head_log_size)
         return branch_id
 
     def update_branch_head(self, owner: str, project: str, branch_id: str, node_id: str):
-        branch_file = self.__get_branch_file(owner, project, branch_id)
-        if not os.path.exists(branch_file):
+        registry = self.__get_registry(owner, project)
+        if registry == None or not branch_id in registry.heads or not common.is_id_valid(node_id):
             return False
-        with open(branch_file, 'w') as f:
-            # save to file
-            f.write(node_id)
-            # update cache
-            self.update_branch_head_cache(owner, project, branch_id, node_id)
+        registry.append(branch_id, node_id, self.head_log_size)
         return True
     
-    def update_branch_head_cache(self, owner: str, project: str, branch_id: str, node_id: str):
-        if owner not in self.branch_head_cache:
-            self.branch_head_cache[owner] = {}
-        if project not in self.branch_head_cache[owner]:
-            self.branch_head_cache[owner][project] = {}
-        if branch_id in self.branch_head_cache[owner][project]:
-            # remove old entry to make sure the new one is at the end
-            del self.branch_head_cache[owner][project][branch_id]
-        self.branch_head_cache[owner][project][branch_id] = node_id
-        if len(self.branch_head_cache[owner][project]) > self.branch_head_cache_size:
-            # remove oldest entry. sincy python 3.7 the order of keys is the same as the order of insertion
-            oldest_branch_id = list(self.branch_head_cache[owner][project].keys())[0]
-            del self.branch_head_cache[owner][project][oldest_branch_id]
+    # flushes the branch heads of a project to disk
+    def sync(self, owner: str, project: str):
+        registry = self.__get_registry(owner, project)
+        if registry != None:
+            registry.sync()
     
+    # returns the branch id of a head node or None if the node is not a head
     def get_branch_of_node(self, owner: str, project: str, node_id: str):
-        branches = self.get_branches(owner, project)
-        for branch_id in branches:
-            branch_head = self.get_branch_head(owner, project, branch_id)
-            if branch_head == node_id:
-                return branch_id
-        return None
+        registry = self.__get_registry(owner, project)
+        if registry == None:
+            return None
+        return registry.head_index.get(node_id)
+
+    # closes the registry of a project (used when the project is deleted)
+    def close_project(self, owner: str, project: str):
+        with self.registries_lock:
+            if (owner, project) in self.registries:
+                self.registries[(owner, project)].close()
+                del self.registries[(owner, project)]
     
     def create_branch_group(self, owner: str, project: str, branch_group: BranchGroup):
         # check if all branches exist
@@ -127,9 +192,7 @@ class GoosvcBranches:
         group_id = common.get_id()
         branch_group.group_id = group_id
         group_file = self.__get_group_file(owner, project, group_id)
-        with open(group_file, 'w') as f:
-            # save to file
-            f.write(json.dumps(dataclasses.asdict(branch_group)))
+        common.write_file(group_file, json.dumps(dataclasses.asdict(branch_group)))
         return group_id  
     
     def update_branch_group(self, owner: str, project: str, branch_group: BranchGroup):
@@ -146,9 +209,7 @@ class GoosvcBranches:
         if not os.path.exists(group_file):
             self.projects.release_project(owner, project)
             return False
-        with open(group_file, 'w') as f:
-            # save to file
-            f.write(json.dumps(dataclasses.asdict(branch_group)))
+        common.write_file(group_file, json.dumps(dataclasses.asdict(branch_group)))
         self.projects.release_project(owner, project)
         return True
     
@@ -168,14 +229,24 @@ class GoosvcBranches:
         group_ids = [os.path.splitext(group_file)[0] for group_file in group_files]
         return group_ids
     
+    # returns the registry of a project (loaded on first access) or None if the project does not exist
+    def __get_registry(self, owner: str, project: str):
+        key = (owner, project)
+        registry = self.registries.get(key)
+        if registry != None:
+            return registry
+        with self.registries_lock:
+            if not key in self.registries:
+                branches_dir = self.__get_branches_dir(owner, project)
+                if not os.path.isdir(branches_dir):
+                    return None
+                self.registries[key] = GoosvcBranchRegistry(branches_dir)
+            return self.registries[key]
+
     def __get_branches_dir(self, owner: str, project: str):
         project_dir = common.get_project_dir(self.projects_dir, owner, project)
         return os.path.join(project_dir, "branches")
     
-    def __get_branch_file(self, owner: str, project: str, branch_id: str):
-        branches_dir = self.__get_branches_dir(owner, project)
-        return os.path.join(branches_dir, branch_id + ".json")
-    
     def __get_group_dir(self, owner: str, project: str):
         project_dir = common.get_project_dir(self.projects_dir, owner, project)
         return os.path.join(project_dir, "branchgroups")
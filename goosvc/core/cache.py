@@ -0,0 +1,244 @@
+import threading
+from collections import OrderedDict
+
+DEFAULT_CACHE_SIZE = 64 * 1024 * 1024 # bytes shared by all owners and projects
+DEFAULT_PATH_CACHE_SIZE = 100000 # node ids in cached paths of all owners and projects (the nodes are kept in the node cache)
+
+
+# Least recently used cache with a byte budget shared by all projects.
+# Entries are grouped by project (owner and project name). If the cache is full, a project using more
+# than its fair share (budget divided by the number of cached projects) evicts its own entries first.
+class GoosvcLruCache:
+    def __init__(self, max_size: int = DEFAULT_CACHE_SIZE):
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.entries = OrderedDict() # (owner, project, key) -> (value, size), least recently used first
+        self.projects = {} # (owner, project) -> OrderedDict of keys of the project, least recently used first
+        self.project_sizes = {} # (owner, project) -> bytes used by the project
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # returns the cached value or None
+    def get(self, owner: str, project: str, key: str):
+        entry_key = (owner, project, key)
+        with self.lock:
+            entry = self.entries.get(entry_key)
+            if entry == None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end(entry_key)
+            self.projects[(owner, project)].move_to_end(key)
+            return entry[0]
+
+    # adds or replaces a value. size is the (approximate) size of the value in bytes
+    def put(self, owner: str, project: str, key: str, value, size: int):
+        if size > self.max_size:
+            return
+        entry_key = (owner, project, key)
+        project_key = (owner, project)
+        with self.lock:
+            if entry_key in self.entries:
+                self.__remove(entry_key)
+            if not project_key in self.projects:
+                self.projects[project_key] = OrderedDict()
+                self.project_sizes[project_key] = 0
+            self.entries[entry_key] = (value, size)
+            self.projects[project_key][key] = None
+            self.project_sizes[project_key] += size
+            self.size += size
+            while self.size > self.max_size:
+                fair_share = self.max_size // len(self.projects)
+                if self.project_sizes[project_key] > fair_share and len(self.projects[project_key]) > 1:
+                    # project exceeds its share: evict its least recently used entry
+                    self.__remove((owner, project, next(iter(self.projects[project_key]))))
+                else:
+                    self.__remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def remove(self, owner: str, project: str, key: str):
+        with self.lock:
+            if (owner, project, key) in self.entries:
+                self.__remove((owner, project, key))
+
+    # removes all entries of a project (used when the project is deleted)
+    def remove_project(self, owner: str, project: str):
+        with self.lock:
+            for key in list(self.projects.get((owner, project), [])):
+                self.__remove((owner, project, key))
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.projects.clear()
+            self.project_sizes.clear()
+            self.size = 0
+
+    # returns hit and miss counts and the current usage of the cache (or of a single project)
+    def get_stats(self, owner: str = None, project: str = None):
+        with self.lock:
+            stats = {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "entries": len(self.entries), "size": self.size, "max_size": self.max_size}
+            if owner != None and project != None:
+                stats["project_entries"] = len(self.projects.get((owner, project), []))
+                stats["project_size"] = self.project_sizes.get((owner, project), 0)
+            return stats
+
+    # caller must hold the lock
+    def __remove(self, entry_key: tuple):
+        owner, project, key = entry_key
+        _, size = self.entries.pop(entry_key)
+        project_key = (owner, project)
+        del self.projects[project_key][key]
+        self.project_sizes[project_key] -= size
+        self.size -= size
+        if len(self.projects[project_key]) == 0:
+            del self.projects[project_key]
+            del self.project_sizes[project_key]
+
+
+# Part of a cached path: node ids ordered from the oldest to the newest node.
+# The first node is attached to a node of the parent segment (or is a root node).
+class GoosvcPathSegment:
+    def __init__(self, owner: str, project: str, parent, parent_index: int):
+        self.owner = owner
+        self.project = project
+        self.parent = parent
+        self.parent_index = parent_index
+        self.node_ids = []
+        self.children = 0 # number of segments attached to this segment
+
+
+# Cache for paths of all owners and projects. Paths are stored as linked segments, so paths sharing
+# ancestors (e.g. branches of the same project) share the cached node ids. The size is the number of cached node ids.
+# Only the structure of the paths is cached: the nodes are kept in the node cache and its byte budget.
+# Since nodes are immutable, cached paths never become invalid.
+class GoosvcPathCache:
+    def __init__(self, max_size: int = DEFAULT_PATH_CACHE_SIZE):
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.segments = OrderedDict() # segments, least recently used first
+        self.index = {} # (owner, project, node_id) -> segment and position of the node
+        self.size = 0
+
+    def contains(self, owner: str, project: str, node_id: str):
+        return (owner, project, node_id) in self.index
+
+    # returns the cached node ids from node_id to the root (or to root_id, exclusive) or None if the node is not cached
+    def get_path(self, owner: str, project: str, node_id: str, root_id: str = None):
+        with self.lock:
+            location = self.index.get((owner, project, node_id))
+            if location == None:
+                return None
+            segment, index = location
+            path = []
+            # ancestors are used more recently than their children: only leaf segments are evicted
+            self.__touch(segment)
+            while segment != None:
+                node_ids = segment.node_ids[index::-1]
+                if root_id != None and root_id in node_ids:
+                    path.extend(node_ids[:node_ids.index(root_id)])
+                    return path
+                path.extend(node_ids)
+                index = segment.parent_index
+                segment = segment.parent
+            return path
+
+    # adds a path (list of nodes from a node towards the root) by node ids. the path is only added
+    # if it ends at a root node or the parent of the last node is cached
+    def add_path(self, owner: str, project: str, nodes: list):
+        with self.lock:
+            nodes = list(nodes)
+            # skip nodes already cached (e.g. added by another thread)
+            while len(nodes) > 0 and (owner, project, nodes[-1].node_id) in self.index:
+                nodes.pop()
+            if len(nodes) == 0:
+                return
+            parent = None
+            parent_index = 0
+            if nodes[-1].parent_id != None:
+                location = self.index.get((owner, project, nodes[-1].parent_id))
+                if location == None:
+                    return
+                parent, parent_index = location
+            segment = GoosvcPathSegment(owner, project, parent, parent_index)
+            segment.node_ids = [node.node_id for node in reversed(nodes)]
+            self.__add_segment(segment)
+            for index, node_id in enumerate(segment.node_ids):
+                self.index[(owner, project, node_id)] = (segment, index)
+            self.size += len(segment.node_ids)
+            self.__evict()
+
+    # extends the cached path of the parent by a new node. if the parent is the last node of its segment,
+    # the node is appended to the segment, else a new segment is started
+    def append(self, owner: str, project: str, node):
+        with self.lock:
+            if (owner, project, node.node_id) in self.index:
+                return
+            if node.parent_id == None:
+                segment = GoosvcPathSegment(owner, project, None, 0)
+            else:
+                location = self.index.get((owner, project, node.parent_id))
+                if location == None:
+                    return
+                segment, index = location
+                if index < len(segment.node_ids) - 1:
+                    segment = GoosvcPathSegment(owner, project, segment, index)
+            if len(segment.node_ids) == 0:
+                self.__add_segment(segment)
+            else:
+                self.__touch(segment)
+            segment.node_ids.append(node.node_id)
+            self.index[(owner, project, node.node_id)] = (segment, len(segment.node_ids) - 1)
+            self.size += 1
+            self.__evict()
+
+    # removes all paths of a project (used when the project is deleted)
+    def remove_project(self, owner: str, project: str):
+        with self.lock:
+            for segment in [segment for segment in self.segments if segment.owner == owner and segment.project == project]:
+                self.__remove_segment(segment)
+
+    def clear(self):
+        with self.lock:
+            self.segments.clear()
+            self.index.clear()
+            self.size = 0
+
+    # caller must hold the lock
+    def __add_segment(self, segment: GoosvcPathSegment):
+        self.segments[segment] = None
+        if segment.parent != None:
+            segment.parent.children += 1
+        self.__touch(segment)
+
+    # marks a segment and its ancestors as recently used. ancestors are always more recent than their children.
+    # caller must hold the lock
+    def __touch(self, segment: GoosvcPathSegment):
+        while segment != None:
+            self.segments.move_to_end(segment)
+            segment = segment.parent
+
+    # removes least recently used leaf segments until the cache fits its size. caller must hold the lock
+    def __evict(self):
+        while self.size > self.max_size:
+            leaf = None
+            for segment in self.segments:
+                if segment.children == 0:
+                    leaf = segment
+                    break
+            if leaf == None:
+                return
+            self.__remove_segment(leaf)
+
+    # caller must hold the lock
+    def __remove_segment(self, segment: GoosvcPathSegment):
+        if not segment in self.segments:
+            return
+        del self.segments[segment]
+        for node_id in segment.node_ids:
+            del self.index[(segment.owner, segment.project, node_id)]
+        self.size -= len(segment.node_ids)
+        if segment.parent != None:
+            segment.parent.children -= 1
@@ -1,11 +1,16 @@
 import os
 import json
-from dataclasses import dataclass
+import threading
+from dataclasses import dataclass, field
 import dataclasses
+from collections import OrderedDict
 from goosvc.core import common as common
 from goosvc.core import nodes
 from goosvc.core.exceptions import GoosvcException
 
+DEFAULT_CHAT_PROJECTS = 64 # projects with registered chat nodes kept in memory (least recently used are dropped)
+DEFAULT_CHAT_LOOKUPS = 10000 # chat lookups remembered per project (least recently used are dropped)
+NO_CHAT = "" # remembered lookup of a chat that is not visible from the chat node
 
 @dataclass
 class GoosvcChat:
@@ -20,11 +25,32 @@ class ChatNodeContent:
     chat_id: str
     parent_chat_node_id: str = None # chat continues from this node. If None, chat is new
 
+# registered chat node: its chat and the entry of the nearest chat node before it (None for the first chat on the path).
+# nodes are immutable, so entries never change and are shared by all later chat nodes
+@dataclass(eq=False)
+class GoosvcChatEntry:
+    chat_id: str
+    node_id: str
+    parent: "GoosvcChatEntry" = None
+
+# registered chat nodes of a project (chat node id -> entry) and remembered lookups ((chat node id, chat id) -> chat node id or NO_CHAT)
+@dataclass
+class GoosvcChatRegistry:
+    entries: dict = field(default_factory=dict)
+    lookups: OrderedDict = field(default_factory=OrderedDict)
+
 
 class GoosvcChats:
-    def __init__(self, projects_dir: str, nodes: nodes.GoosvcNodes):
+    def __init__(self, projects_dir: str, nodes: nodes.GoosvcNodes, chat_projects: int = DEFAULT_CHAT_PROJECTS, chat_lookups: int = DEFAULT_CHAT_LOOKUPS):
         self.projects_dir = projects_dir
         self.nodes = nodes
+        self.chat_projects = chat_projects
+        self.chat_lookups = chat_lookups
+        # chat registries by owner and project, least recently used first. the chats visible from a node are the chats of
+        # the nearest chat node and its parent entries. nodes between two chat nodes share the nearest chat node, so a chat
+        # is found from any node with a single jump and a walk that stops at the first remembered lookup
+        self.registries = OrderedDict()
+        self.registries_lock = threading.Lock()
 
     def create_chat(self, owner: str, project: str, id: str, chat: GoosvcChat):
         chat_id = common.get_id()
@@ -41,6 +67,8 @@ class GoosvcChats:
         chat_node_content = ChatNodeContent(chat.chat_name, chat_id, chat.parent_chat_node_id)
         chat_node = nodes.GoosvcNode("chat", id, chat.author, chat_node_content)
         branch_id, node_id = self.nodes.add_node(owner, project, chat_node)
+        # register the new chat (links to the entry of the previous chat node)
+        self.__get_entry(owner, project, self.__get_registry(owner, project), node_id)
         return branch_id, node_id, chat_id
     
     # returns all chats for a given node_id or branch_id    
@@ -52,19 +80,93 @@ class GoosvcChats:
         return chats
     
     def get_chat_node(self, owner: str, project: str, chat_id: str, id: str):
-        path = self.nodes.get_path(owner, project, id, ["chat"])
-        if path == None:
-            return []
-        for node in path:
-            if node.content["chat_id"] == chat_id:
-                return node
-        return None
+        chat_node_id = self.get_chat_node_id(owner, project, chat_id, id)
+        if chat_node_id == None:
+            return None
+        return self.nodes.get_node(owner, project, chat_node_id)
     
     def chat_exists(self, owner: str, project: str, id: str, chat_id: str):
-        chats = self.get_chats(owner, project, id)
-        for chat in chats:
-            if chat["chat_id"] == chat_id:
-                return True
-        return False
+        return self.get_chat_node_id(owner, project, chat_id, id) != None
+
+    # returns the ids of all chats for a given node_id or branch_id
+    def get_chat_ids(self, owner: str, project: str, id: str):
+        chat_ids = set()
+        chat_node_id = self.nodes.get_nearest_node_id(owner, project, id, "chat")
+        if chat_node_id == None:
+            return chat_ids
+        entry = self.__get_entry(owner, project, self.__get_registry(owner, project), chat_node_id)
+        while entry != None:
+            chat_ids.add(entry.chat_id)
+            entry = entry.parent
+        return chat_ids
+
+    # returns the id of the chat node of a chat for a given node_id or branch_id or None if the chat does not exist
+    def get_chat_node_id(self, owner: str, project: str, chat_id: str, id: str):
+        chat_node_id = self.nodes.get_nearest_node_id(owner, project, id, "chat")
+        if chat_node_id == None:
+            return None
+        return self.__find_chat(owner, project, chat_node_id, chat_id)
+
+    # drops the chat registry of a project (used when the project is deleted)
+    def close_project(self, owner: str, project: str):
+        with self.registries_lock:
+            self.registries.pop((owner, project), None)
+
+    # returns the chat node of a chat visible from a chat node or None. the entries are followed back until
+    # the chat or a remembered lookup is found. the result is remembered for the chat node
+    def __find_chat(self, owner: str, project: str, chat_node_id: str, chat_id: str):
+        registry = self.__get_registry(owner, project)
+        entry = self.__get_entry(owner, project, registry, chat_node_id)
+        found_id = NO_CHAT
+        while entry != None:
+            if entry.chat_id == chat_id:
+                found_id = entry.node_id
+                break
+            with self.registries_lock:
+                remembered_id = registry.lookups.get((entry.node_id, chat_id))
+                if remembered_id != None:
+                    registry.lookups.move_to_end((entry.node_id, chat_id))
+            if remembered_id != None:
+                found_id = remembered_id
+                break
+            entry = entry.parent
+        with self.registries_lock:
+            registry.lookups[(chat_node_id, chat_id)] = found_id
+            registry.lookups.move_to_end((chat_node_id, chat_id))
+            while len(registry.lookups) > self.chat_lookups:
+                registry.lookups.popitem(last=False)
+        return None if found_id == NO_CHAT else found_id
+
+    def __get_registry(self, owner: str, project: str):
+        key = (owner, project)
+        with self.registries_lock:
+            registry = self.registries.get(key)
+            if registry != None:
+                self.registries.move_to_end(key)
+                return registry
+            registry = GoosvcChatRegistry()
+            self.registries[key] = registry
+            while len(self.registries) > self.chat_projects:
+                self.registries.popitem(last=False)
+            return registry
+
+    # returns the entry of a chat node. chat nodes not registered yet (e.g. after a restart or eviction)
+    # are registered from the nearest registered chat node on
+    def __get_entry(self, owner: str, project: str, registry: GoosvcChatRegistry, chat_node_id: str):
+        missing = [] # chat nodes without entry, newest first
+        entry = None
+        while chat_node_id != None:
+            entry = registry.entries.get(chat_node_id)
+            if entry != None:
+                break
+            chat_node = self.nodes.get_node(owner, project, chat_node_id)
+            if chat_node == None:
+                break
+            missing.append(chat_node)
+            chat_node_id = self.nodes.get_nearest_node_id(owner, project, chat_node.parent_id, "chat")
+        for chat_node in reversed(missing):
+            entry = GoosvcChatEntry(chat_node.content["chat_id"], chat_node.node_id, entry)
+            registry.entries[chat_node.node_id] = entry
+        return entry
     
  
\ No newline at end of file
@@ -10,8 +10,13 @@ def get_project_dir(projects_dir: str, owner: str, project: str):
 def get_id():
     return uuid.uuid4().hex
 
+# ids are 32 lowercase hex characters (see get_id)
 def is_id_valid(id: str):
-    return len(id) == 32 and id.isalnum()
+    return len(id) == 32 and all(c in "0123456789abcdef" for c in id)
+
+# owner and project names: at least 4 characters, alphanumeric and underscores
+def is_name_valid(name: str):
+    return len(name) >= 4 and name.replace('_', '').isalnum()
 
 def get_file_hash(artifact_file):
     hash_md5 = hashlib.md5()
@@ -27,3 +32,29 @@ def get_artifact_file(projects_dir: str, owner: str, project: str, artifact_id:
 def get_timestamp():
     return int(time.time())
 
+
+# flushes a file (or folder) to disk
+def sync_file(file_name: str):
+    fd = os.open(file_name, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+# replaces a file atomically: readers see the old or the new content, never a partially written file.
+# with sync, the new content is on disk when the function returns
+def write_file(file_name: str, data: str, sync: bool = False):
+    temp_file = file_name + "." + get_id() + ".tmp"
+    try:
+        with open(temp_file, 'w') as f:
+            f.write(data)
+            if sync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(temp_file, file_name)
+    except:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        raise
+    if sync:
+        sync_file(os.path.dirname(file_name))
@@ -1,6 +1,6 @@
 import os
 from dataclasses import dataclass
-from goosvc.core import artifacts, branches, chats, messages, merge, nodes, owners, projects, stages, info, transactions
+from goosvc.core import artifacts, branches, cache, chats, generations, messages, merge, nodes, owners, packs, projects, stages, info, topology, transactions, wal
 
 
 DEFAULT_BASE_DIR = "data"
@@ -21,12 +21,32 @@ class GoosvcCore:
             os.makedirs(self.projects_dir)
         # old school dependency injection
         self.owners = owners.GoosvcOwners(self.projects_dir)
-        self.projects = projects.GoosvcProjects(self.projects_dir, self.owners)
+        self.generations = generations.GoosvcGenerations(self.projects_dir)
+        self.projects = projects.GoosvcProjects(self.projects_dir, self.owners, self.generations)
+        self.projects.add_delete_listener(self.generations.close_project)
         self.branches = branches.GoosvcBranches(self.projects_dir, self.projects)
-        self.nodes = nodes.GoosvcNodes(self.projects_dir,self.branches, self.projects)
+        self.projects.add_delete_listener(self.branches.close_project)
+        self.packs = packs.GoosvcPacks(self.projects_dir)
+        self.topology = topology.GoosvcTopology(self.projects_dir, self.packs)
+        self.node_cache = cache.GoosvcLruCache(cache.DEFAULT_CACHE_SIZE)
+        self.wal = wal.GoosvcWal(self.projects_dir)
+        self.projects.add_delete_listener(self.wal.close_project)
+        self.projects.add_delete_listener(self.packs.close_project)
+        self.projects.add_delete_listener(self.topology.close_project)
+        self.path_cache = cache.GoosvcPathCache(cache.DEFAULT_PATH_CACHE_SIZE)
+        self.projects.add_delete_listener(self.node_cache.remove_project)
+        self.projects.add_delete_listener(self.path_cache.remove_project)
+        self.nodes = nodes.GoosvcNodes(self.projects_dir,self.branches, self.projects, self.packs, self.topology, self.node_cache, self.path_cache, self.wal)
+        self.projects.add_delete_listener(self.nodes.close_project)
+        # state cached per process is updated when another process wrote to the project. nodes are never changed:
+        # the node and path caches stay valid, only the ends of the files, the branch heads and the metadata are read again
+        for listener in [self.wal.refresh, self.packs.refresh, self.topology.refresh, self.branches.close_project, self.projects.reload_project]:
+            self.generations.add_invalidate_listener(listener)
         self.chats = chats.GoosvcChats(self.projects_dir, self.nodes)
+        self.projects.add_delete_listener(self.chats.close_project)
         self.transactions = transactions.GoosvcTransactions(self.projects_dir, self.nodes)
-        self.messages = messages.GoosvcMessages(self.projects_dir, self.nodes, self.chats)
+        self.messages = messages.GoosvcMessages(self.projects_dir, self.nodes, self.chats, self.branches)
+        self.projects.add_delete_listener(self.messages.close_project)
         self.artifacts = artifacts.GoosvcArtifacts(self.projects_dir, self.nodes, self.chats)
         self.stages = stages.GoosvcStages(self.projects_dir, self.nodes)
         self.merge = merge.GoosvcMerge(self.projects_dir, self.nodes, self.artifacts, self.stages, self.chats, self.messages, self.branches)
@@ -34,5 +54,9 @@ class GoosvcCore:
 
     def get_base_dir(self):
         return self.base_dir
+
+    # syncs pending writes to disk (durability batched syncs in the background). call before the process exits
+    def close(self):
+        self.wal.close()
     
  
\ No newline at end of file
@@ -0,0 +1,117 @@
+import os
+import mmap
+import struct
+import threading
+from goosvc.core import common as common
+
+GENERATION_FILE = "generation"
+OWNER_GENERATION_FILE = ".generation" # in the owner directory. never a valid project name
+GENERATION = struct.Struct("<Q")
+
+
+# Generation counter of a project: a memory mapped file shared by all processes using the project.
+# seen is the generation the caches of this process belong to.
+class GoosvcProjectGeneration:
+    def __init__(self, generation_file: str):
+        fd = os.open(generation_file, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size < GENERATION.size:
+                os.ftruncate(fd, GENERATION.size)
+            self.map = mmap.mmap(fd, GENERATION.size)
+        finally:
+            os.close(fd)
+        self.lock = threading.Lock() # protects increments by threads of this process
+        self.seen = self.read()
+
+    def read(self):
+        return GENERATION.unpack_from(self.map, 0)[0]
+
+    def close(self):
+        self.map.close()
+
+
+# Cross-process cache invalidation. Every write to a project increments its generation counter.
+# A process finding a generation it has not seen (written by another process) drops its cached
+# state of the project (invalidate listeners). Checking the counter is a single memory read.
+class GoosvcGenerations:
+    def __init__(self, projects_dir: str):
+        self.projects_dir = projects_dir
+        # open counters by owner and project
+        self.generations = {}
+        self.generations_lock = threading.Lock()
+        # functions called with owner and project name when the cached state of a project is stale
+        self.invalidate_listeners = []
+
+    def add_invalidate_listener(self, listener):
+        self.invalidate_listeners.append(listener)
+
+    # true if another process wrote to the project since this process cached its state
+    def is_stale(self, owner: str, project: str):
+        generation = self.__get_generation(owner, project)
+        return generation != None and generation.read() != generation.seen
+
+    # drops the cached state of the project if it is stale. the caller must have exclusive access
+    # to the project in this process (no running reads or writes)
+    def validate(self, owner: str, project: str):
+        generation = self.__get_generation(owner, project)
+        if generation == None:
+            return
+        current = generation.read()
+        if current == generation.seen:
+            return
+        for listener in self.invalidate_listeners:
+            listener(owner, project)
+        generation.seen = current
+
+    # marks a write to the project. the caller must hold the project lock
+    def bump(self, owner: str, project: str):
+        generation = self.__get_generation(owner, project)
+        if generation == None:
+            return
+        with generation.lock:
+            value = generation.read() + 1
+            GENERATION.pack_into(generation.map, 0, value)
+            generation.seen = value
+
+    # returns the generation counter of an owner (changed when the visibility of one of its projects changes)
+    # or None if the owner does not exist
+    def get_owner_generation(self, owner: str):
+        generation = self.__get_generation(owner, None)
+        if generation == None:
+            return None
+        return generation.read()
+
+    # marks a visibility change of a project of the owner
+    def bump_owner(self, owner: str):
+        self.bump(owner, None)
+
+    # opens the counter of a project before its state is cached (e.g. the project metadata is read)
+    def open_project(self, owner: str, project: str):
+        self.__get_generation(owner, project)
+
+    # closes the counter of a project (used when the project is deleted)
+    def close_project(self, owner: str, project: str):
+        with self.generations_lock:
+            if (owner, project) in self.generations:
+                self.generations[(owner, project)].close()
+                del self.generations[(owner, project)]
+
+    # returns the counter of a project or of an owner (project is None) opened on first access
+    # or None if the project does not exist
+    def __get_generation(self, owner: str, project: str):
+        key = (owner, project)
+        generation = self.generations.get(key)
+        if generation != None:
+            return generation
+        with self.generations_lock:
+            if not key in self.generations:
+                if project == None:
+                    generation_dir = os.path.join(self.projects_dir, owner)
+                    generation_file = OWNER_GENERATION_FILE
+                else:
+                    generation_dir = common.get_project_dir(self.projects_dir, owner, project)
+                    generation_file = GENERATION_FILE
+                if not os.path.isdir(generation_dir):
+                    return None
+                self.generations[key] = GoosvcProjectGeneration(os.path.join(generation_dir, generation_file))
+            return self.generations[key]
@@ -0,0 +1,157 @@
+import os
+import mmap
+import struct
+import tempfile
+
+DEFAULT_INDEX_CAPACITY = 1024 # initial number of slots. the table is doubled when it is half full
+
+INDEX_MAGIC = b"GOOSVCIX"
+# header: magic, capacity, count, retired flag (set when the table was replaced by a bigger one)
+INDEX_HEADER = struct.Struct("<8sQQI4x")
+# slot: node id (16 bytes), sequence number, segment, offset, length
+INDEX_SLOT = struct.Struct("<16sIIQI4x")
+INDEX_EMPTY_KEY = bytes(16)
+
+
+# Persistent hash table mapping node ids to the location of their record in the pack.
+# The table is a memory mapped file (open addressing, linear probing). All processes working
+# on the same project share its pages through the page cache.
+class GoosvcNodeIndex:
+    def __init__(self, index_file: str):
+        self.index_file = index_file
+        self.file = None
+        self.map = None
+        self.capacity = 0
+        self.count = 0
+        self.table = None # map and capacity, replaced together for lock free lookups
+
+    # opens the table. returns False if there is no valid table
+    def open(self):
+        if not os.path.exists(self.index_file):
+            return False
+        file = open(self.index_file, 'r+b')
+        size = os.path.getsize(self.index_file)
+        if size < INDEX_HEADER.size:
+            file.close()
+            return False
+        index_map = mmap.mmap(file.fileno(), size)
+        magic, capacity, count, retired = INDEX_HEADER.unpack_from(index_map, 0)
+        if magic != INDEX_MAGIC or retired or size != INDEX_HEADER.size + capacity * INDEX_SLOT.size:
+            index_map.close()
+            file.close()
+            return False
+        # replace the current map without closing it (other threads may still read from it)
+        if self.file != None:
+            self.file.close()
+        self.file = file
+        self.capacity = capacity
+        self.count = count
+        self.map = index_map
+        self.table = (index_map, capacity)
+        return True
+
+    # creates a new empty table
+    def create(self, capacity: int = DEFAULT_INDEX_CAPACITY):
+        self.close()
+        self.__create(self.index_file, capacity)
+        self.open()
+
+    def close(self):
+        self.table = None
+        if self.map != None:
+            self.map.close()
+            self.map = None
+        if self.file != None:
+            self.file.close()
+            self.file = None
+
+    # returns sequence number, segment, offset and length of a node or None if the node is not indexed
+    def lookup(self, node_id: str):
+        key = self.__get_key(node_id)
+        if key == None or self.map == None:
+            return None
+        self.__check_retired()
+        index_map, capacity = self.table
+        slot = int.from_bytes(key[:8], "little") % capacity
+        while True:
+            slot_key, seq, segment, offset, length = INDEX_SLOT.unpack_from(index_map, INDEX_HEADER.size + slot * INDEX_SLOT.size)
+            if slot_key == key:
+                return seq, segment, offset, length
+            if slot_key == INDEX_EMPTY_KEY:
+                return None
+            slot = (slot + 1) % capacity
+
+    # adds a node to the table. existing entries are overwritten. caller must prevent concurrent inserts
+    def insert(self, node_id: str, seq: int, segment: int, offset: int, length: int):
+        key = self.__get_key(node_id)
+        if key == None:
+            return
+        # the table may have been replaced or filled by another process since the last access
+        self.__check_retired()
+        self.count = INDEX_HEADER.unpack_from(self.map, 0)[2]
+        if (self.count + 1) * 2 > self.capacity:
+            self.__grow()
+        if self.__insert(self.map, self.capacity, key, seq, segment, offset, length):
+            self.count += 1
+            INDEX_HEADER.pack_into(self.map, 0, INDEX_MAGIC, self.capacity, self.count, 0)
+
+    # returns the number of indexed nodes (0 if there is no table)
+    def get_count(self):
+        if self.map == None:
+            return 0
+        self.__check_retired()
+        self.count = INDEX_HEADER.unpack_from(self.map, 0)[2]
+        return self.count
+
+    # returns True if a slot was added, False if an existing slot was updated
+    def __insert(self, index_map, capacity: int, key: bytes, seq: int, segment: int, offset: int, length: int):
+        slot = int.from_bytes(key[:8], "little") % capacity
+        while True:
+            position = INDEX_HEADER.size + slot * INDEX_SLOT.size
+            slot_key = index_map[position:position + 16]
+            if slot_key == key or slot_key == INDEX_EMPTY_KEY:
+                index_map[position:position + INDEX_SLOT.size] = INDEX_SLOT.pack(key, seq, segment, offset, length)
+                return slot_key == INDEX_EMPTY_KEY
+            slot = (slot + 1) % capacity
+
+    # copies all entries to a table with twice the capacity and replaces the current file.
+    # the old table is marked as retired so other processes reopen the file
+    def __grow(self):
+        capacity = self.capacity * 2
+        # unique name: a temporary file left by a crashed process is never written again
+        fd, new_file = tempfile.mkstemp(prefix=os.path.basename(self.index_file) + ".", suffix=".tmp", dir=os.path.dirname(self.index_file))
+        os.close(fd)
+        self.__create(new_file, capacity)
+        with open(new_file, 'r+b') as f:
+            new_map = mmap.mmap(f.fileno(), INDEX_HEADER.size + capacity * INDEX_SLOT.size)
+            count = 0
+            for slot in range(self.capacity):
+                entry = INDEX_SLOT.unpack_from(self.map, INDEX_HEADER.size + slot * INDEX_SLOT.size)
+                if entry[0] != INDEX_EMPTY_KEY:
+                    self.__insert(new_map, capacity, *entry)
+                    count += 1
+            INDEX_HEADER.pack_into(new_map, 0, INDEX_MAGIC, capacity, count, 0)
+            new_map.flush()
+            new_map.close()
+        os.replace(new_file, self.index_file)
+        INDEX_HEADER.pack_into(self.map, 0, INDEX_MAGIC, self.capacity, self.count, 1)
+        self.open()
+
+    # reopens the file if the table was replaced by another process
+    def __check_retired(self):
+        if INDEX_HEADER.unpack_from(self.map, 0)[3]:
+            self.open()
+
+    def __create(self, index_file: str, capacity: int):
+        with open(index_file, 'wb') as f:
+            f.write(INDEX_HEADER.pack(INDEX_MAGIC, capacity, 0, 0))
+            f.truncate(INDEX_HEADER.size + capacity * INDEX_SLOT.size)
+
+    # node ids are 32 hex characters (see common.get_id)
+    def __get_key(self, node_id: str):
+        if node_id == None or len(node_id) != 32:
+            return None
+        try:
+            return bytes.fromhex(node_id)
+        except ValueError:
+            return None
@@ -0,0 +1,129 @@
+import os
+import threading
+import time
+try:
+    import fcntl
+except ImportError:
+    # not available on windows: only thread locks can be used
+    fcntl = None
+
+LOCK_BACKEND_THREAD = "thread" # locks are only valid in the current process
+LOCK_BACKEND_FILE = "file" # locks are also valid across processes using the same base directory (os file locks)
+DEFAULT_LOCK_BACKEND = LOCK_BACKEND_THREAD
+DEFAULT_FILE_LOCK_POLL_INTERVAL = 0.005 # seconds between attempts to get a file lock held by another process
+
+
+# Reader-writer lock. Any number of readers or a single writer hold the lock.
+# Waiting writers are preferred: new readers wait until the writers are done, so writers never starve.
+# Readers are reentrant and a writer may also read (e.g. a write checking its parent node).
+# The write lock is not reentrant and may be released by another thread (like threading.Lock).
+class GoosvcRWLock:
+    def __init__(self):
+        self.condition = threading.Condition(threading.Lock())
+        self.readers = {} # thread id -> number of read locks held by the thread
+        self.writer = None # thread id of the writer holding the lock
+        self.writing = False
+        self.waiting_writers = 0
+
+    # returns False if the lock could not be acquired within timeout seconds (None or -1 waits forever)
+    def acquire_read(self, timeout: float = None):
+        if timeout != None and timeout < 0:
+            timeout = None
+        thread_id = threading.get_ident()
+        with self.condition:
+            if thread_id in self.readers or self.writer == thread_id:
+                # reentrant read: must not wait for writers waiting for this thread
+                self.readers[thread_id] = self.readers.get(thread_id, 0) + 1
+                return True
+            if not self.condition.wait_for(lambda: not self.writing and self.waiting_writers == 0, timeout):
+                return False
+            self.readers[thread_id] = 1
+            return True
+
+    def release_read(self):
+        thread_id = threading.get_ident()
+        with self.condition:
+            count = self.readers.get(thread_id, 0)
+            if count == 0:
+                raise RuntimeError("release of unlocked read lock")
+            if count == 1:
+                del self.readers[thread_id]
+                if len(self.readers) == 0:
+                    self.condition.notify_all()
+            else:
+                self.readers[thread_id] = count - 1
+
+    # returns False if the lock could not be acquired within timeout seconds (None or -1 waits forever).
+    # a thread holding a read lock must not wait for the write lock
+    def acquire_write(self, timeout: float = None):
+        if timeout != None and timeout < 0:
+            timeout = None
+        with self.condition:
+            self.waiting_writers += 1
+            acquired = self.condition.wait_for(lambda: not self.writing and len(self.readers) == 0, timeout)
+            self.waiting_writers -= 1
+            if not acquired:
+                # readers may be waiting behind this writer
+                self.condition.notify_all()
+                return False
+            self.writing = True
+            self.writer = threading.get_ident()
+            return True
+
+    def release_write(self):
+        with self.condition:
+            if not self.writing:
+                raise RuntimeError("release of unlocked write lock")
+            self.writing = False
+            self.writer = None
+            self.condition.notify_all()
+
+    # true if a writer holds the lock
+    def locked(self):
+        return self.writing
+
+    # true if no thread holds or waits for the write lock and no thread holds a read lock
+    def is_idle(self):
+        with self.condition:
+            return not self.writing and len(self.readers) == 0 and self.waiting_writers == 0
+
+    # true if the current thread holds a read lock or the write lock
+    def is_held(self):
+        thread_id = threading.get_ident()
+        return thread_id in self.readers or self.writer == thread_id
+
+
+
+# Exclusive lock held by a process on a lock file (advisory os lock). The lock is released by the os
+# if the process dies, so a crashed worker never leaves a project locked. Threads of a process must
+# be serialized by a thread lock before acquiring the file lock (see GoosvcProjects).
+class GoosvcFileLock:
+    def __init__(self, lock_file: str):
+        if fcntl == None:
+            raise RuntimeError("file locks are not supported on this platform")
+        self.lock_file = lock_file
+        self.fd = None
+
+    # returns False if the lock could not be acquired within timeout seconds (None or -1 waits forever)
+    def acquire(self, timeout: float = None):
+        if timeout != None and timeout < 0:
+            timeout = None
+        fd = os.open(self.lock_file, os.O_RDWR | os.O_CREAT, 0o644)
+        end_time = None if timeout == None else time.monotonic() + timeout
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                self.fd = fd
+                return True
+            except BlockingIOError:
+                if end_time != None and time.monotonic() >= end_time:
+                    os.close(fd)
+                    return False
+                time.sleep(DEFAULT_FILE_LOCK_POLL_INTERVAL)
+
+    def release(self):
+        fd = self.fd
+        self.fd = None
+        if fd != None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
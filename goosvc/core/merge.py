@@ -60,6 +60,7 @@ class GoosvcMerge:
         merge_nodes = []
         node_dict = {} # new node temp id -> old node
         all_chat_ids = set() # chat ids in all branches so far
+        merged_messages = {} # chat id -> temporary node id of the last merged message of the chat
         for head_id in merge_head_ids:
             path = self.nodes.get_path(owner, project, head_id, [], common_parent_id)
             if path == None:
@@ -68,8 +69,12 @@ class GoosvcMerge:
             path = path[::-1] # reverse path
             current_branch_chat_dict = {}
             for node in path:
+                content = node.content
+                if isinstance(content, dict):
+                    # the merged node gets its own copy: the original node may be shared through the node cache
+                    content = dict(content)
                 if node.type == "message":
-                    chat_id = node.content['chat_id']
+                    chat_id = content['chat_id']
                     if not chat_id in current_branch_chat_dict:
                         # new chat id in current branch. check if chat id already exists in merge
                         if chat_id in all_chat_ids:
@@ -99,24 +104,31 @@ class GoosvcMerge:
                             current_branch_chat_dict[chat_id] = new_chat_id
                         else:
                             current_branch_chat_dict[chat_id] = chat_id
-                    node.content['chat_id'] = current_branch_chat_dict[chat_id]
-                new_node = GoosvcNode(node.type, None, node.author, node.content) # parent_id will be set on write
+                    content['chat_id'] = current_branch_chat_dict[chat_id]
+                new_node = GoosvcNode(node.type, None, node.author, content) # parent_id will be set on write
+                if node.type == "message" and "previous_message_node_id" in content:
+                    # previous message of the chat in the merge. the first message of a branched chat has none
+                    merged_chat_id = content['chat_id']
+                    if merged_chat_id in merged_messages:
+                        content['previous_message_node_id'] = merged_messages[merged_chat_id]
+                    elif merged_chat_id != chat_id:
+                        content['previous_message_node_id'] = None
                 # set temporary node id to find corresponding original node on write
                 # this id will be replaced by the actual node id on write
                 new_node.node_id = common.get_id()
                 node_dict[new_node.node_id] = node
                 merge_nodes.append(new_node)
+                if node.type == "message":
+                    merged_messages[new_node.content['chat_id']] = new_node.node_id
             # update chat ids for next branch
             all_chat_ids.update(current_branch_chat_dict.keys())
         
         
         # write merge to repository
-        last_node_id = common_parent_id
-        merge_start_node_id = None
+        # the temporary node ids are kept as node ids: chat nodes can refer to merged messages before they are written
         message_id_map = {} # old message_id -> new message_id
         node_id_dict = {} # new node_id -> old node_id
         for node in merge_nodes:
-            node.parent_id = last_node_id
             # update parent_chat_node_id for chat nodes if needed
             if node.type == "chat":
                 if node.content['parent_chat_node_id'] != None:
@@ -127,41 +139,23 @@ class GoosvcMerge:
             if node.node_id in node_dict:
                 original_node = node_dict[node.node_id] # use temporary node id to get original node
                 original_node_id = original_node.node_id
-            # add node
-            _, last_node_id = self.nodes.add_node(owner, project, node, True) # node.node_id will be set by add_node. silent=True: no branch creation
-            # set merge_start_node_id (used by end node)
-            if merge_start_node_id == None:
-                merge_start_node_id = last_node_id
             # update node_map (used by end node, documents merge process)
             # original_node_id is None for nodes not in the original branch
-            node_id_dict[last_node_id] = original_node_id
+            node_id_dict[node.node_id] = original_node_id
             # update message_id_map (used by chat nodes to update parent_chat_node_id)
             if node.type == "message":
-                old_message_id = original_node.node_id
-                message_id_map[old_message_id] = last_node_id
+                message_id_map[original_node_id] = node.node_id
         # append merge end node
         merge_node_content = MergeNodeContent(common_parent_id, merge_head_ids, node_id_dict)
-        last_node = GoosvcNode("merge", last_node_id, author, merge_node_content) 
-        branch_id, last_node_id = self.nodes.add_node(owner, project, last_node) # with this write the branch will be visible
+        merge_nodes.append(GoosvcNode("merge", None, author, merge_node_content))
+        # add all nodes at once. the branch becomes visible with the merge end node
+        branch_id, node_ids = self.nodes.add_nodes(owner, project, common_parent_id, merge_nodes, False, True)
 
-        return branch_id, last_node_id
+        return branch_id, node_ids[-1]
     
     # find earliest common ancestor for a list of nodes
     def get_common_parent(self, owner: str, project: str, head_ids: list[str]):
-        num_nodes = len(head_ids)
-        node_dict = {}
-        for node_id in head_ids:
-            path = self.nodes.get_path(owner, project, node_id)
-            if path == None:
-                print(f"Node {node_id} not found")
-                return None
-            for node in path:
-                if node.node_id not in node_dict:
-                    node_dict[node.node_id] = 0
-                node_dict[node.node_id] += 1
-                if node_dict[node.node_id] == num_nodes:
-                    return node.node_id
-        return None
+        return self.nodes.get_common_ancestor(owner, project, head_ids)
     
     def get_merge_conflicts(self, owner: str, project: str, common_parent_id, head_ids: list[str]):
         # check for merge conflicts
@@ -1,8 +1,14 @@
+import threading
+import itertools
 from dataclasses import dataclass, field
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 from goosvc.core import nodes, chats
+from goosvc.core.branches import GoosvcBranches
 from goosvc.core.exceptions import GoosvcException
 
+DEFAULT_MESSAGES_PAGE_SIZE = 50 # messages per page (see get_messages_page)
+DEFAULT_LAST_MESSAGES_SIZE = 10000 # branches with an index of the last messages kept in memory (least recently used are dropped)
+
 # Data class for adding a message 
 @dataclass
 class GoosvcMessage:
@@ -24,18 +30,91 @@ class MessageNodeContent:
     assistant: str
     request_artifacts: defaultdict[dict] = field(default_factory=lambda: defaultdict(dict)) # list of artifact node Ids in the request. value is the artifact node Id, key can be any string
     response_artifacts: defaultdict[dict] = field(default_factory=lambda: defaultdict(dict)) # list of artifact node Ids in the response. value is the artifact node Id, key can be any string
+    previous_message_node_id: str = None # previous message of the same chat. If None, the message is the first message of the chat
 
 class GoosvcMessages:
-    def __init__(self, projects_dir: str, nodes: nodes.GoosvcNodes, chats: chats.GoosvcChats):
+    def __init__(self, projects_dir: str, nodes: nodes.GoosvcNodes, chats: chats.GoosvcChats, branches: GoosvcBranches, last_messages_size: int = DEFAULT_LAST_MESSAGES_SIZE):
         self.projects_dir = projects_dir
         self.nodes = nodes
         self.chats = chats
+        self.branches = branches
+        self.last_messages_size = last_messages_size
+        # last message of each chat by owner, project and branch id: (anchor, {chat_id: message node id or None}).
+        # the anchor is the newest message or chat node of the branch the entry was built for.
+        # entries of older anchors are extended by the message and chat nodes added since. least recently used first
+        self.last_messages = OrderedDict()
+        self.last_messages_lock = threading.Lock()
+
+    # Returns a list of message nodes for a chat (identified by its chat_id) starting form id (node_id or branch_id), oldest first.
+    # before and after are message node ids (cursors): only messages before or after these messages are returned.
+    # limit returns the newest messages (or with after the oldest messages after the cursor)
+    def get_message_nodes(self, owner: str, project: str, chat_id: str, id: str, limit: int = None, before: str = None, after: str = None):
+        messages = []
+        after_found = False
+        for node in self.iter_message_nodes(owner, project, chat_id, id, before):
+            if node.node_id == after:
+                after_found = True
+                break
+            messages.append(node)
+            if limit != None and after == None and len(messages) >= limit:
+                break
+        if after != None:
+            if not after_found:
+                raise GoosvcException("1023")
+            if limit != None:
+                messages = messages[-limit:]
+        messages.reverse()
+        return messages
 
-    # Returns a list of message nodes for a chat (identified by its chat_id) starting form id (node_id or branch_id)
-    def get_message_nodes(self, owner: str, project: str, chat_id: str, id: str):
+    # returns the message nodes for a chat starting from id (node_id or branch_id) back to the start of the chat, newest first, one at a time.
+    # parent chats are followed. before is the id of a message already read: reading continues with the message before it
+    def iter_message_nodes(self, owner: str, project: str, chat_id: str, id: str, before: str = None):
         if not self.chats.chat_exists(owner, project, id, chat_id):
             # Chat does not exist
-            return []
+            return
+        if before == None:
+            _, last_messages = self.__get_last_messages(owner, project, chat_id, id)
+            message_id = last_messages[chat_id]
+            chat_node_id = self.chats.get_chat_node_id(owner, project, chat_id, id)
+        else:
+            before_node = self.nodes.get_node(owner, project, before)
+            if before_node == None or before_node.type != "message" or not self.nodes.is_ancestor(owner, project, before, id):
+                raise GoosvcException("1023")
+            chat_id = before_node.content["chat_id"]
+            chat_node_id = self.chats.get_chat_node_id(owner, project, chat_id, before)
+            if not "previous_message_node_id" in before_node.content:
+                # message written by an older version (no back-pointer): walk the path
+                yield from self.__walk_message_nodes(owner, project, chat_id, before)[1:]
+                return
+            message_id = before_node.content["previous_message_node_id"]
+        while True:
+            # follow the messages of the chat back to its start
+            while message_id != None:
+                node = self.nodes.get_node(owner, project, message_id)
+                if not "previous_message_node_id" in node.content:
+                    # message written by an older version (no back-pointer): walk the path
+                    yield from self.__walk_message_nodes(owner, project, node.content["chat_id"], message_id)
+                    return
+                yield node
+                message_id = node.content["previous_message_node_id"]
+            # chat starts here or continues from a parent chat
+            chat_node = self.nodes.get_node(owner, project, chat_node_id)
+            parent_id = chat_node.content["parent_chat_node_id"]
+            if parent_id == None:
+                return
+            parent_node = self.nodes.get_node(owner, project, parent_id)
+            chat_id = parent_node.content["chat_id"]
+            chat_node_id = self.chats.get_chat_node_id(owner, project, chat_id, parent_id)
+            message_id = parent_id if parent_node.type == "message" else None
+
+    # drops the message index of a project (used when the project is deleted)
+    def close_project(self, owner: str, project: str):
+        with self.last_messages_lock:
+            for key in [key for key in self.last_messages if key[0] == owner and key[1] == project]:
+                del self.last_messages[key]
+
+    # returns the message nodes of a chat from id to the start of the chat (newest first) by walking the path
+    def __walk_message_nodes(self, owner: str, project: str, chat_id: str, id: str):
         path = self.nodes.get_path(owner, project, id, ["message", "chat"])
         if path == None:
             return []
@@ -59,14 +138,64 @@ class GoosvcMessages:
                 next_node_id = node.content["parent_chat_node_id"]
             if node.type == "message" and node.content["chat_id"] == chat_id:
                 messages.append(node)
-        messages.reverse()
         return messages
+
+    # returns the newest message or chat node visible from id and the last messages of the chats (chat_id -> message
+    # node id or None) visible from it. contains at least chat_id (the chat must exist)
+    def __get_last_messages(self, owner: str, project: str, chat_id: str, id: str):
+        anchor_id = self.nodes.get_nearest_node_id(owner, project, id, ["message", "chat"])
+        branch_id = id if self.branches.is_branch(owner, project, id) else self.branches.get_branch_of_node(owner, project, id)
+        entry = None
+        if branch_id != None:
+            entry = self.__get_entry((owner, project, branch_id))
+        if entry != None and entry[0] == anchor_id and chat_id in entry[1]:
+            return entry
+        # walk the message and chat nodes back to the last message of the chat and the anchor of the entry.
+        # message and chat nodes added since the entry was built are visited once
+        stop_id = None
+        if entry != None and anchor_id != None and self.nodes.is_ancestor(owner, project, entry[0], anchor_id):
+            stop_id = entry[0]
+        last_messages = {}
+        node_id = anchor_id
+        while node_id != None:
+            if node_id == stop_id:
+                # older nodes are in the entry
+                for entry_chat_id, message_id in entry[1].items():
+                    last_messages.setdefault(entry_chat_id, message_id)
+                stop_id = None
+            if chat_id in last_messages and stop_id == None:
+                break
+            node = self.nodes.get_node(owner, project, node_id)
+            # a chat node is the start of its chat: no messages before
+            last_messages.setdefault(node.content["chat_id"], node_id if node.type == "message" else None)
+            node_id = self.nodes.get_nearest_node_id(owner, project, node.parent_id, ["message", "chat"])
+        last_messages.setdefault(chat_id, None)
+        entry = (anchor_id, last_messages)
+        if branch_id != None:
+            self.__put_entry((owner, project, branch_id), entry)
+        return entry
+
+    def __get_entry(self, key: tuple):
+        with self.last_messages_lock:
+            entry = self.last_messages.get(key)
+            if entry != None:
+                self.last_messages.move_to_end(key)
+            return entry
+
+    # stores the entry of a branch. if replaced_anchor_id is given, a newer entry (stored by a later write) is kept
+    def __put_entry(self, key: tuple, entry: tuple, replaced_anchor_id: str = None):
+        with self.last_messages_lock:
+            current = self.last_messages.get(key)
+            if replaced_anchor_id != None and current != None and current[0] != replaced_anchor_id:
+                return
+            self.last_messages[key] = entry
+            self.last_messages.move_to_end(key)
+            while len(self.last_messages) > self.last_messages_size:
+                self.last_messages.popitem(last=False)
     
+    # returns the newest message node of a chat (only this message is read) or None if the chat has no messages
     def get_last_message_node(self, owner: str, project: str, chat_id: str, id: str):
-        message_nodes = self.get_message_nodes(owner, project, chat_id, id)
-        if len(message_nodes) == 0:
-            return None
-        return message_nodes[0]
+        return next(self.iter_message_nodes(owner, project, chat_id, id), None)
     
     def get_message_node(self, owner: str, project: str, node_id: str):
         message_node = self.nodes.get_node(owner, project, node_id)
@@ -82,9 +211,9 @@ class GoosvcMessages:
             return None
         return message_node.content
     
-    # Returns a list of messages for a chat starting form id (node_id or branch_id)
-    def get_messages(self, owner: str, project: str, chat_id: str, id: str):
-        message_nodes = self.get_message_nodes(owner, project, chat_id, id)
+    # Returns a list of messages for a chat starting form id (node_id or branch_id). see get_message_nodes for limit, before and after
+    def get_messages(self, owner: str, project: str, chat_id: str, id: str, limit: int = None, before: str = None, after: str = None):
+        message_nodes = self.get_message_nodes(owner, project, chat_id, id, limit, before, after)
         if len(message_nodes) == 0:
             return []
         messages = []
@@ -92,6 +221,17 @@ class GoosvcMessages:
             messages.append(message_node.content)
         return messages
 
+    # returns a page of messages (oldest first) for a chat starting from id (node_id or branch_id) and the cursor of the
+    # next page (None if there are no older messages). pages go back in time: the first page has the newest messages
+    def get_messages_page(self, owner: str, project: str, chat_id: str, id: str, limit: int = DEFAULT_MESSAGES_PAGE_SIZE, cursor: str = None):
+        message_nodes = list(itertools.islice(self.iter_message_nodes(owner, project, chat_id, id, cursor), limit + 1))
+        next_cursor = None
+        if len(message_nodes) > limit:
+            message_nodes = message_nodes[:limit]
+            next_cursor = message_nodes[-1].node_id
+        message_nodes.reverse()
+        return [message_node.content for message_node in message_nodes], next_cursor
+
     def add_message(self, owner: str, project: str, id: str, message: GoosvcMessage):
         # check if referenced chat exists
         chat_id = message.chat_id
@@ -113,5 +253,16 @@ class GoosvcMessages:
             message.response_artifacts = []
         node_content = MessageNodeContent(chat_id, message.request, message.response, message.assistant, message.request_artifacts, message.response_artifacts)
         node = nodes.GoosvcNode("message", id, message.author, node_content, None, None, None, message.transaction_id)
-        branch_id, node_id = self.nodes.add_node(owner, project, node)
+        previous = []
+        # the previous message is found from the parent the message is added to (the branch head) while the branch is locked:
+        # concurrent writers of a branch append to the branch one after another
+        def set_previous_message(parent_id: str):
+            anchor_id, last_messages = self.__get_last_messages(owner, project, chat_id, parent_id)
+            node_content.previous_message_node_id = last_messages[chat_id]
+            previous[:] = [anchor_id, last_messages]
+        branch_id, node_id = self.nodes.add_node(owner, project, node, prepare=set_previous_message)
+        # the new message is the anchor of its branch
+        if branch_id != None:
+            anchor_id, last_messages = previous
+            self.__put_entry((owner, project, branch_id), (node_id, {**last_messages, chat_id: node_id}), anchor_id)
         return branch_id, node_id
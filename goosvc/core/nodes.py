@@ -1,14 +1,21 @@
 import os
+import threading
 import json
+import itertools
 from dataclasses import dataclass
 import dataclasses
 from goosvc.core import common as common
 from goosvc.core.branches import GoosvcBranches
 from goosvc.core.projects import GoosvcProjects
+from goosvc.core.packs import GoosvcPacks
+from goosvc.core.topology import GoosvcTopology, GoosvcProjectTopology, NO_NODE
+from goosvc.core.cache import GoosvcLruCache, GoosvcPathCache
+from goosvc.core.wal import GoosvcWal, DURABILITY_NONE
 from goosvc.core.exceptions import GoosvcException
+from goosvc.core.locks import LOCK_BACKEND_FILE
 
-DEFAULT_PATH_CACHE_SIZE = 10 # paths per owner
-DEFAULT_NODE_CACHE_SIZE = 10 # nodes per owner
+DEFAULT_NODES_PAGE_SIZE = 100 # nodes per page (see get_nodes_page)
+DEFAULT_RESIDENT_MODE = False # if true, paths are resolved from the topology arrays before nodes are loaded (get_path still returns loaded nodes, see get_path_ids)
 
 
 @dataclass
@@ -23,162 +30,188 @@ class GoosvcNode:
     transaction_id: str = None # ID of the transaction that created the node
 
 class GoosvcNodes:
-    def __init__(self, projects_dir: str, branches: GoosvcBranches, projects: GoosvcProjects):
+    def __init__(self, projects_dir: str, branches: GoosvcBranches, projects: GoosvcProjects, packs: GoosvcPacks, topology: GoosvcTopology, node_cache: GoosvcLruCache, path_cache: GoosvcPathCache, wal: GoosvcWal):
         # base folder for all projects
         self.projects_dir = projects_dir
         self.branches = branches
         self.projects = projects
-        # path cache by owner
-        self.path_cache = {}
-        self.path_cache_size = DEFAULT_PATH_CACHE_SIZE
-        # node cache by owner
-        self.node_cache = {}
-        self.node_cache_size = DEFAULT_NODE_CACHE_SIZE
+        self.packs = packs
+        self.topology = topology
+        self.resident = DEFAULT_RESIDENT_MODE
+        # path cache shared by all owners and projects
+        self.path_cache = path_cache
+        # write-ahead log. projects are recovered from the log on their first access (read or write)
+        self.wal = wal
+        self.recovered = set()
+        # node cache shared by all owners and projects
+        self.node_cache = node_cache
+        # write locks by owner, project and branch id (see add_nodes): lock and number of threads holding
+        # or waiting for it. a lock is dropped when it is no longer used
+        self.branch_locks = {}
+        self.branch_locks_lock = threading.Lock()
+        # keeps pack and topology appends of concurrent writers in the same order
+        self.append_lock = threading.Lock()
     
     # always returns the branch id and node id of the new node. 
     # a new branch is created automatically whenever the nodes parent is not a head node.
-    # exception: if silent is true, no new branch is created. this allows to add multiple nodes before the new branch becomes visible (used by merge)
-    def add_node(self, owner: str, project: str, node: GoosvcNode, silent: bool = False):
-        node_id = common.get_id()
-        node.node_id = node_id
-        node.timestamp = common.get_timestamp()
-        if not node.parent_id == None:
-
-            # lock project for write. if lock fails, throw exception
-            # lock is released after the write operation
-            if not self.projects.lock_project(owner, project):
-                raise GoosvcException("1003")
-
-            # print("check if parent is a branch head")
-            branch_head = self.branches.get_branch_head(owner, project, node.parent_id)
-            if branch_head == None:
-                # parent_id it is not a branch id: check if its a node which is head of a branch
-                if self.is_node(owner, project, node.parent_id):
-                    branch_id = self.branches.get_branch_of_node(owner, project, node.parent_id)
-                    if branch_id != None:
-                        # its a head node
-                        branch_head = node.parent_id
-                        node.parent_id = branch_id
-            if not branch_head == None:
-                # it is a branch: save node and update the branch head
-                # print("it is a branch")
-                branch_id = node.parent_id
-                node.parent_id = branch_head
-                # read parent node
-                parent_node = self.get_node(owner, project, branch_head)
-                # check if parent node is part of an ongoing transaction
-                if parent_node.transaction_id != None and parent_node.type != "transaction_end":
-                    # print("parent node is part of an ongoing transaction")
-                    # new node must refer to the same transaction id as parent node
-                    if parent_node.transaction_id != node.transaction_id:
-                        # print("Error: transaction id does not match")
-                        self.projects.release_project(owner, project)
-                        raise GoosvcException("1026")
-                    # new node must not start a new transaction
-                    if node.type == "transaction_start":
-                        # print("Error: node tries to start a new transaction within an ongoing transaction")
-                        self.projects.release_project(owner, project)
-                        raise GoosvcException("1026")
-                    # all fine, use the same node version as parent node
-                    node.version = parent_node.version
-                else:
-                    # print("parent node is not part of an ongoing transaction")
-                    # transaction id in new node is only allowed to start a new transaction 
-                    # because the parent node is not part of an ongoing transaction
-                    if node.transaction_id != None and node.type != "transaction_start":
-                        # print("Error: node tries continue or end a non existing transaction")
-                        self.projects.release_project(owner, project)
-                        raise GoosvcException("1027")
-                    # all fine. either there is no transaction id or the node is a transaction start
-                    node.version = parent_node.version + 1
-                # write new node to file
-                self.__write_node(owner, project, node)
-                self.branches.update_branch_head(owner, project, branch_id, node.node_id)
-                self.projects.release_project(owner, project)
-                return branch_id, node_id
-            elif self.is_node(owner, project, node.parent_id):
-                # print("parent node is a node but node is not a head: save node and create branch")
-                parent_node = self.get_node(owner, project, node.parent_id)
-                # check if parent node within a transaction
-                if parent_node.transaction_id != None and parent_node.type != "transaction_end":
-                    # print("Error: parent node is within a transaction. branching refused")
-                    self.projects.release_project(owner, project)
-                    raise GoosvcException("1028")
-                node.version = self.get_node(owner,project,node.parent_id).version + 1
-                self.__write_node(owner, project, node)
-                if silent:
-                    branch_id = None
-                else:
-                    branch_id = self.branches.create_branch(owner, project, node.node_id)
-                self.projects.release_project(owner, project)
-                return branch_id, node_id
-            # print("invalid parent")  
-            self.projects.release_project(owner, project)
-            raise GoosvcException("1029")
+    # exception: if silent is true, no new branch is created. this allows to add multiple nodes before the new branch becomes visible
+    def add_node(self, owner: str, project: str, node: GoosvcNode, silent: bool = False, prepare = None):
+        branch_id, node_ids = self.add_nodes(owner, project, node.parent_id, [node], silent, prepare=prepare)
+        return branch_id, node_ids[0]
+    
+    # adds a chain of nodes: the first node is added to parent_id (branch id, node id or None for a new root),
+    # every other node to the node before. returns the branch id and the node ids of the new nodes.
+    # the nodes are validated before anything is written and the branch head is updated once.
+    # if keep_ids is true, node ids set by the caller are used (e.g. to refer to nodes of the same batch).
+    # they must be valid ids (see common.is_id_valid), unique within the batch and not used in the project.
+    # prepare is called with the id of the parent node (e.g. the branch head) while the write lock is held, before
+    # the nodes are written. it may set node content that depends on the parent (e.g. the previous message of a chat)
+    def add_nodes(self, owner: str, project: str, parent_id: str, nodes: list[GoosvcNode], silent: bool = False, keep_ids: bool = False, prepare = None):
+        if len(nodes) == 0:
+            raise GoosvcException("1000")
+        timestamp = common.get_timestamp()
+        node_ids = set()
+        for node in nodes:
+            if not keep_ids or node.node_id == None:
+                node.node_id = common.get_id()
+            elif not common.is_id_valid(node.node_id):
+                raise GoosvcException("1031")
+            if node.node_id in node_ids:
+                raise GoosvcException("1032")
+            node_ids.add(node.node_id)
+            node.timestamp = timestamp
 
-        # print("no parent: save node and create branch")
-        # check if new node does not continue or end a transaction
-        if node.transaction_id != None and node.type != "transaction_start":
-            # print("Error: node tries to continue or end a non existing transaction")
-            raise GoosvcException("1027")
-        
-        # Since this is the first node of the branch, one might think that no lock is needed
-        # because no other thread can access the branch because id is not known.
-        # But if the project was locked to run a backup, lock is needed.
+        # writes to an existing branch only lock the branch: writes to other branches of the project run in parallel.
+        # new branches, new roots, recovery, checkpoints and node ids set by the caller (checked against all branches) lock the whole project
+        branch_id = None if keep_ids else self.__lock_branch(owner, project, parent_id)
+        if branch_id != None:
+            try:
+                position = self.__add_to_branch(owner, project, branch_id, parent_id, nodes, prepare)
+            finally:
+                self.__release_branch(owner, project, branch_id)
+            if position != None:
+                self.wal.commit(owner, project, position)
+                return branch_id, [node.node_id for node in nodes]
 
         # lock project for write. if lock fails, throw exception
         # lock is released after the write operation
+        # (also needed for new root nodes: the project might be locked to run a backup)
         if not self.projects.lock_project(owner, project):
             raise GoosvcException("1003")
-        node.version = 1
-        self.__write_node(owner, project, node)
-        branch_id = self.branches.create_branch(owner, project, node.node_id)
-        self.projects.release_project(owner, project)
-
-        return branch_id, node_id
+        try:
+            if not (owner, project) in self.recovered:
+                self.__recover(owner, project)
+            elif self.projects.lock_backend == LOCK_BACKEND_FILE:
+                # another process may have crashed while writing to the project
+                self.__repair(owner, project)
+            branch_id = None
+            parent_node = None
+            if parent_id != None:
+                branch_head = self.branches.get_branch_head(owner, project, parent_id)
+                if branch_head != None:
+                    # parent is a branch: nodes are added to the branch head
+                    branch_id = parent_id
+                    parent_id = branch_head
+                elif self.is_node(owner, project, parent_id):
+                    # parent is a node. if it is a head node, nodes are added to its branch
+                    branch_id = self.branches.get_branch_of_node(owner, project, parent_id)
+                else:
+                    # print("invalid parent")
+                    raise GoosvcException("1029")
+                parent_node = self.get_node(owner, project, parent_id)
+                if branch_id == None and self.__is_in_transaction(parent_node):
+                    # print("Error: parent node is within a transaction. branching refused")
+                    raise GoosvcException("1028")
+            if keep_ids:
+                self.__check_new_ids(owner, project, nodes)
+            if prepare != None:
+                prepare(parent_id)
+            # check transaction rules and set parent and version of all nodes
+            for node in nodes:
+                self.__set_version(parent_node, node)
+                parent_node = node
+            if branch_id == None and not silent:
+                # new branch
+                branch_id = common.get_id()
+            if self.wal.needs_checkpoint(owner, project):
+                self.__checkpoint(owner, project)
+            # log nodes and branch head before anything is written
+            records = [self.__encode_node(node) for node in nodes]
+            position = self.wal.append(owner, project, {"records": [record.decode() for record in records], "branch_id": branch_id})
+            # write new nodes and update (or create) the branch
+            self.__write_nodes(owner, project, nodes, records)
+            if branch_id != None:
+                self.__set_branch_head(owner, project, branch_id, nodes[-1].node_id)
+            self.projects.generations.bump(owner, project)
+        finally:
+            self.projects.release_project(owner, project)
+        # wait for the log outside the project lock: concurrent writers share a single sync
+        self.wal.commit(owner, project, position)
+        return branch_id, [node.node_id for node in nodes]
     
     def is_node(self, owner: str, project: str, node_id: str, type: str = None):
-        node_file = self.__get_node_file(owner, project, node_id)
+        self.__recover_once(owner, project)
         # without type check
         if type == None:
-            return os.path.exists(node_file)
+            return self.packs.contains(owner, project, node_id)
         # with type check
         node = self.get_node(owner, project, node_id)
         if node == None:
             return False
         return node.type == type
     
+    # drops the write state of a project (used when the project is deleted)
+    def close_project(self, owner: str, project: str):
+        self.recovered.discard((owner, project))
+
     # returns a node by id or branch head if its a branch id
     def get_node(self, owner: str, project: str, id: str):
         if id == None:
             return None
+        self.__recover_once(owner, project)
+        # reads run in parallel but never see a write in progress
+        if not self.projects.lock_project_read(owner, project):
+            raise GoosvcException("1003")
+        try:
+            return self.__get_node(owner, project, id)
+        finally:
+            self.projects.release_project_read(owner, project)
+
+    def __get_node(self, owner: str, project: str, id: str):
         # check if node is in cache
-        if owner in self.node_cache and id in self.node_cache[owner]:
-            return self.node_cache[owner][id]
-        # load node from file
-        node_file = self.__get_node_file(owner, project, id)
-        if not os.path.exists(node_file):
+        node = self.node_cache.get(owner, project, id)
+        if node != None:
+            return node
+        # load node from pack
+        record = self.packs.read(owner, project, id)
+        if record == None:
             # Node does not exist
             branch_head = self.branches.get_branch_head(owner, project, id)
             if branch_head == None:
                 return None
-            return self.get_node(owner, project, branch_head)
-        with open(node_file, 'r') as f:
-            node = GoosvcNode(**json.loads(f.read()))
-        # save node in cache
-        if not owner in self.node_cache:
-            self.node_cache[owner] = {}
-        self.node_cache[owner][id] = node
-        # remove oldest cache entry if cache is full
-        if len(self.node_cache[owner]) > self.node_cache_size:
-            del self.node_cache[owner][list(self.node_cache[owner].keys())[0]]
+            return self.__get_node(owner, project, branch_head)
+        node = self.__decode_node(record)
+        # save node in cache (size of the record is used as size of the node)
+        self.node_cache.put(owner, project, id, node, len(record))
         return node
     
     # returns the last node of a branch filtered by type
     def get_last_node(self, owner: str, project: str, branch_id: str, type: str):
+        self.__recover_once(owner, project)
         branch_head = self.branches.get_branch_head(owner, project, branch_id)
         if branch_head == None:
             return None
+        if type != None:
+            # jump to the nearest node of the type
+            topology = self.topology.get_topology(owner, project)
+            seq = self.packs.get_seq(owner, project, branch_head)
+            if topology != None and seq != None and seq < topology.get_count():
+                type_codes = topology.get_type_codes([type])
+                if type_codes != None:
+                    nearest_seq = topology.get_nearest(seq, type_codes)
+                    if nearest_seq == NO_NODE:
+                        return None
+                    return self.get_node(owner, project, self.packs.get_node_id(owner, project, nearest_seq))
         node = self.get_node(owner, project, branch_head)
         if type == None:
             return node
@@ -190,97 +223,444 @@ class GoosvcNodes:
     # returns the last node id of a branch filtered by type
     def get_last_node_id(self, owner: str, project: str, branch_id: str, type: str):
         return self.get_last_node(owner, project, branch_id, type).node_id
+
+    # returns the id of the nearest node of one of the types on the path from id (node id or branch id, the node itself included)
+    # to the root or None if there is no such node
+    def get_nearest_node_id(self, owner: str, project: str, id: str, types: list[str]):
+        if id == None:
+            return None
+        if isinstance(types, str):
+            types = [types]
+        self.__recover_once(owner, project)
+        topology = self.topology.get_topology(owner, project)
+        seq = self.__get_seq(owner, project, id)
+        if seq == None:
+            return None
+        if topology != None and seq < topology.get_count():
+            type_codes = topology.get_type_codes(types)
+            if type_codes != None:
+                nearest_seq = topology.get_nearest(seq, type_codes)
+                if nearest_seq == NO_NODE:
+                    return None
+                return self.packs.get_node_id(owner, project, nearest_seq)
+        path = self.get_path(owner, project, id, types)
+        if len(path) == 0:
+            return None
+        return path[0].node_id
     
     # returns a list of nodes from id to the root filtered by type. 
-    # id can be a node id or a branch id. for branch id the head node is used as start
+    # id can be a node id or a branch id. for branch id the head node is used as start.
+    # all returned nodes are loaded: get_path_ids walks a path without loading any node
     def get_path(self, owner: str, project: str, id: str, types: list[str] = [], root_id: str = None):
+        self.__recover_once(owner, project)
+        if not self.projects.lock_project_read(owner, project):
+            raise GoosvcException("1003")
+        try:
+            return self.__get_path(owner, project, id, types, root_id)
+        finally:
+            self.projects.release_project_read(owner, project)
+
+    def __get_path(self, owner: str, project: str, id: str, types: list[str] = [], root_id: str = None):
+        if self.resident or len(types) > 0:
+            # walk the topology and load matching nodes only. without types every node matches:
+            # the nodes are loaded with read-ahead like a walk of the pack
+            node_ids = self.get_path_ids(owner, project, id, types, root_id)
+            if node_ids != None:
+                if len(types) > 0:
+                    return [self.get_node(owner, project, node_id) for node_id in node_ids]
+                prefetched = {}
+                return [self.__get_path_node(owner, project, node_id, prefetched) for node_id in node_ids]
         current_node = self.get_node(owner, project, id)
         if current_node == None:
             return []
+        if root_id != None and not self.is_ancestor(owner, project, root_id, current_node.node_id):
+            # root is not on the path
+            return []
 
-        start_node_id = current_node.node_id # save start node id to store result in cache
-        read_from_cache = False # if true, read from cache. if false, read from file
-        cache_node_id = None # cache entry in use
-        cache_index = 0 # current index in cache entry
-        path = [] # path to return
-        unfiltered_path = [] # path to cache
-        if not owner in self.path_cache:
-            self.path_cache[owner] = {}
-
-        current_node_id = start_node_id
-        while current_node_id != root_id:
-            unfiltered_path.append(current_node)
-            if len(types) == 0 or current_node.type in types:
-                path.append(current_node)
-            
-            if not read_from_cache and current_node_id in self.path_cache[owner]:
-                # print("start reading from cache")
-                read_from_cache = True
-                cache_node_id = current_node_id
-            if read_from_cache:
-                cache_index += 1
-                if cache_index >= len(self.path_cache[owner][cache_node_id]):
-                    # print("cache end reached")
-                    break
-                # print("read from cache")
-                if len(types) == 0 and root_id == None:
-                    # read all nodes from cache at once
-                    path.extend(self.path_cache[owner][cache_node_id][1:])
-                    unfiltered_path.extend(self.path_cache[owner][cache_node_id][1:])
+        path = [] # nodes read from the pack
+        cached_path = [] # nodes of the path cache
+        prefetched = {} # nodes read ahead from the pack
+        while current_node != None and current_node.node_id != root_id:
+            if self.path_cache.contains(owner, project, current_node.node_id):
+                # rest of the path is cached. the path cache holds node ids: the nodes are taken from the node cache
+                cached_ids = self.path_cache.get_path(owner, project, current_node.node_id, root_id)
+                if cached_ids != None:
+                    cached_path = [current_node] + [self.__get_path_node(owner, project, node_id, prefetched) for node_id in cached_ids[1:]]
                     break
-                else:
-                    # continue reading node by node
-                    current_node = self.path_cache[owner][cache_node_id][cache_index]
-            else:
-                # print("read from file")                    
-                current_node = self.get_node(owner, project, current_node.parent_id)
-            if current_node == None:
-                break
-            current_node_id = current_node.node_id
+            path.append(current_node)
+            current_node = self.__get_path_node(owner, project, current_node.parent_id, prefetched)
         
-        # validate path (in case path was dropped from cache while reading)
-        if len(unfiltered_path) > 0: # empty path is possible if root_id is same as start_node_id
+        # cache the path read from the pack. it is linked to the cached path or starts at the root
+        self.path_cache.add_path(owner, project, path)
+        path.extend(cached_path)
+
+        # validate path
+        if len(path) > 0: # empty path is possible if root_id is same as start node id
             if root_id == None: 
-                if not unfiltered_path[-1].version == 1 or not unfiltered_path[-1].parent_id == None:
-                    print("path invalid")
+                if not path[-1].version == 1 or not path[-1].parent_id == None:
                     return []
             else:
-                if not unfiltered_path[-1].parent_id == root_id:
-                    print("path invalid")
+                if not path[-1].parent_id == root_id:
                     return []
-        
-        # add path to cache if root_id is None and its not already in cache
-        if root_id == None and not start_node_id in self.path_cache:
-            # print("add path to cache", start_node_id)
-            # print("cache size", len(self.path_cache))
-            self.path_cache[owner][start_node_id] = unfiltered_path
-            # remove oldest cache entry if cache is full
-            cached_ids = list(self.path_cache[owner].keys())
-            if len(cached_ids) > self.path_cache_size:
-                # print("remove oldest cache entry")
-                del self.path_cache[owner][cached_ids[0]]
-
 
+        if len(types) > 0:
+            path = [node for node in path if node.type in types]
         return path
     
-    # returns all nodes of a project
+    # returns the node ids of a path (see get_path) without loading the nodes (lazy alternative to get_path:
+    # nodes are loaded with get_node when needed). returns None if the path can not be resolved from the topology
+    def get_path_ids(self, owner: str, project: str, id: str, types: list[str] = [], root_id: str = None):
+        self.__recover_once(owner, project)
+        topology = self.topology.get_topology(owner, project)
+        if topology == None:
+            return None
+        seq = self.__get_seq(owner, project, id)
+        if seq == None:
+            return []
+        if seq >= topology.get_count():
+            return None
+        type_codes = None
+        if len(types) > 0:
+            if isinstance(types, str):
+                types = [types]
+            type_codes = topology.get_type_codes(types)
+            if type_codes == None:
+                return None
+        root_seq = NO_NODE
+        if root_id != None:
+            root_seq = self.packs.get_seq(owner, project, root_id)
+            if root_seq == None:
+                return []
+        path = topology.get_path(seq, type_codes, root_seq)
+        if path == None:
+            # root is not an ancestor
+            return []
+        return [self.packs.get_node_id(owner, project, path_seq) for path_seq in path]
+    
+    # returns true if the node with id ancestor_id is an ancestor of the node with the given id (node id or branch id)
+    def is_ancestor(self, owner: str, project: str, ancestor_id: str, id: str):
+        self.__recover_once(owner, project)
+        topology = self.topology.get_topology(owner, project)
+        if topology == None:
+            return False
+        ancestor_seq = self.packs.get_seq(owner, project, ancestor_id)
+        seq = self.__get_seq(owner, project, id)
+        if ancestor_seq == None or seq == None or max(ancestor_seq, seq) >= topology.get_count():
+            return False
+        return topology.is_ancestor(ancestor_seq, seq)
+    
+    # returns the id of the k-th ancestor of a node (k=0 is the node itself, id can be a node id or a branch id).
+    # returns None if the path to the root is shorter
+    def get_ancestor(self, owner: str, project: str, id: str, k: int):
+        self.__recover_once(owner, project)
+        topology = self.topology.get_topology(owner, project)
+        if topology == None:
+            return None
+        seq = self.__get_seq(owner, project, id)
+        if seq == None or seq >= topology.get_count():
+            return None
+        ancestor_seq = topology.get_ancestor(seq, k)
+        if ancestor_seq == NO_NODE:
+            return None
+        return self.packs.get_node_id(owner, project, ancestor_seq)
+    
+    # returns the id of the lowest common ancestor of a list of nodes (node ids or branch ids)
+    # or None if there is no common ancestor
+    def get_common_ancestor(self, owner: str, project: str, ids: list[str]):
+        self.__recover_once(owner, project)
+        topology = self.topology.get_topology(owner, project)
+        if topology == None or len(ids) == 0:
+            return None
+        common_seq = None
+        for id in ids:
+            seq = self.__get_seq(owner, project, id)
+            if seq == None or seq >= topology.get_count():
+                return None
+            if common_seq == None:
+                common_seq = seq
+            else:
+                common_seq = topology.get_common_ancestor(common_seq, seq)
+            if common_seq == NO_NODE:
+                return None
+        return self.packs.get_node_id(owner, project, common_seq)
+    
+    # returns all nodes of a project in the order they were written
     def get_nodes(self, owner: str, project: str):
-        project_dir = common.get_project_dir(self.projects_dir, owner, project)
-        nodes_dir = os.path.join(project_dir, "nodes")
-        nodes = []
-        for node_file in os.listdir(nodes_dir):
-            with open(os.path.join(nodes_dir, node_file), 'r') as f:
-                nodes.append(GoosvcNode(**json.loads(f.read())))
-        return nodes
+        return list(self.iter_nodes(owner, project))
+    
+    # returns a page of nodes (see iter_nodes) and the cursor of the next page (None if there are no more nodes)
+    def get_nodes_page(self, owner: str, project: str, limit: int = DEFAULT_NODES_PAGE_SIZE, cursor: str = None, types: list[str] = [], author: str = None, start_time: int = None, end_time: int = None, transaction_id: str = None):
+        nodes = list(itertools.islice(self.iter_nodes(owner, project, types, author, start_time, end_time, transaction_id, cursor), limit + 1))
+        if len(nodes) > limit:
+            return nodes[:limit], nodes[limit - 1].node_id
+        return nodes, None
+    
+    # returns the nodes of a project in the order they were written, one at a time.
+    # nodes can be filtered by types, author, timestamp (start_time included, end_time excluded) and transaction id.
+    # cursor is the id of the last node already read: reading continues after this node
+    def iter_nodes(self, owner: str, project: str, types: list[str] = [], author: str = None, start_time: int = None, end_time: int = None, transaction_id: str = None, cursor: str = None):
+        if isinstance(types, str):
+            types = [types]
+        self.__recover_once(owner, project)
+        start = 0
+        if cursor != None:
+            cursor_seq = self.packs.get_seq(owner, project, cursor)
+            if cursor_seq == None:
+                raise GoosvcException("1025")
+            start = cursor_seq + 1
+        records = None
+        if len(types) > 0 or start_time != None or end_time != None:
+            # type and timestamp are filtered on the topology: only matching nodes are read
+            records = self.__select_records(owner, project, start, types, start_time, end_time)
+        if records == None:
+            records = self.packs.scan(owner, project, start)
+        for record in records:
+            node = self.__decode_node(record)
+            if len(types) > 0 and not node.type in types:
+                continue
+            if author != None and node.author != author:
+                continue
+            if start_time != None and node.timestamp < start_time:
+                continue
+            if end_time != None and node.timestamp >= end_time:
+                continue
+            if transaction_id != None and node.transaction_id != transaction_id:
+                continue
+            yield node
+    
+    # returns a node while walking a path. on a cache miss, the records stored before the node
+    # are read as well since they most likely contain the next ancestors
+    def __get_path_node(self, owner: str, project: str, node_id: str, prefetched: dict):
+        if node_id == None:
+            return None
+        if not node_id in prefetched:
+            node = self.node_cache.get(owner, project, node_id)
+            if node != None:
+                return node
+            for record in self.packs.read_window(owner, project, node_id):
+                node = self.__decode_node(record)
+                prefetched[node.node_id] = (node, len(record))
+            if not node_id in prefetched:
+                return self.get_node(owner, project, node_id)
+        # nodes of the path are added to the node cache (nodes read ahead but not on the path are dropped)
+        node, size = prefetched.pop(node_id)
+        self.node_cache.put(owner, project, node_id, node, size)
+        return node
+    
+    # returns the records of nodes matching types and timestamp range starting with sequence number start.
+    # returns None if the topology can not be used
+    def __select_records(self, owner: str, project: str, start: int, types: list[str], start_time: int, end_time: int):
+        topology = self.topology.get_topology(owner, project)
+        if topology == None:
+            return None
+        type_codes = None
+        if len(types) > 0:
+            type_codes = topology.get_type_codes(types)
+            if type_codes == None:
+                return None
+        return self.__read_selected_records(owner, project, topology, start, type_codes, start_time, end_time)
+    
+    def __read_selected_records(self, owner: str, project: str, topology: GoosvcProjectTopology, start: int, type_codes: set, start_time: int, end_time: int):
+        node_types = topology.types
+        timestamps = topology.timestamps
+        for seq in range(start, topology.get_count()):
+            if type_codes != None and not node_types[seq] in type_codes:
+                continue
+            if start_time != None and timestamps[seq] < start_time:
+                continue
+            if end_time != None and timestamps[seq] >= end_time:
+                continue
+            yield self.packs.read_seq(owner, project, seq)
+    
+    # returns the sequence number of a node. id can be a node id or a branch id
+    def __get_seq(self, owner: str, project: str, id: str):
+        seq = self.packs.get_seq(owner, project, id)
+        if seq == None:
+            branch_head = self.branches.get_branch_head(owner, project, id)
+            if branch_head == None:
+                return None
+            seq = self.packs.get_seq(owner, project, branch_head)
+        return seq
+    
+    # sets parent id and version of a new node. checks that the node continues, starts or ends transactions correctly
+    def __set_version(self, parent_node: GoosvcNode, node: GoosvcNode):
+        if parent_node == None:
+            # no parent: node must not continue or end a transaction
+            if node.transaction_id != None and node.type != "transaction_start":
+                raise GoosvcException("1027")
+            node.parent_id = None
+            node.version = 1
+            return
+        node.parent_id = parent_node.node_id
+        if self.__is_in_transaction(parent_node):
+            # new node must refer to the same transaction id as parent node
+            # and must not start a new transaction
+            if parent_node.transaction_id != node.transaction_id or node.type == "transaction_start":
+                raise GoosvcException("1026")
+            # use the same node version as parent node
+            node.version = parent_node.version
+        else:
+            # transaction id in new node is only allowed to start a new transaction 
+            # because the parent node is not part of an ongoing transaction
+            if node.transaction_id != None and node.type != "transaction_start":
+                raise GoosvcException("1027")
+            node.version = parent_node.version + 1
+    
+    # raises an exception if a node id of a new node is already used in the project. caller must hold the project lock
+    def __check_new_ids(self, owner: str, project: str, nodes: list[GoosvcNode]):
+        for node in nodes:
+            if self.packs.contains(owner, project, node.node_id):
+                raise GoosvcException("1032")
+
+    # true if the node is part of an ongoing transaction
+    def __is_in_transaction(self, node: GoosvcNode):
+        return node.transaction_id != None and node.type != "transaction_end"
+    
+    # writes a chain of nodes (see add_nodes) with a single append to the pack
+    def __write_nodes(self, owner: str, project: str, nodes: list[GoosvcNode], records: list[bytes]):
+        parent_seq = NO_NODE
+        if nodes[0].parent_id != None:
+            parent_seq = self.packs.get_seq(owner, project, nodes[0].parent_id)
+        # writers of different branches write concurrently: the topology must be appended in pack order
+        with self.append_lock:
+            seqs = self.packs.append(owner, project, [(node.node_id, record) for node, record in zip(nodes, records)])
+            topology_nodes = []
+            for node, seq in zip(nodes, seqs):
+                topology_nodes.append((parent_seq, node.type, node.version, node.timestamp))
+                parent_seq = seq
+            self.topology.append_nodes(owner, project, seqs[0], topology_nodes)
+        # new nodes are most likely read next (read after write): add them to the caches as they are read from the pack
+        for node, record in zip(nodes, records):
+            stored_node = self.__decode_node(record)
+            self.node_cache.put(owner, project, node.node_id, stored_node, len(record))
+            self.path_cache.append(owner, project, stored_node)
+    
+    # locks the branch of parent_id (branch id or head node id) for a write and shares the project with
+    # writers of other branches. returns the branch id or None if the write must lock the whole project
+    def __lock_branch(self, owner: str, project: str, parent_id: str):
+        if parent_id == None or not (owner, project) in self.recovered or self.wal.needs_checkpoint(owner, project):
+            return None
+        if self.projects.lock_backend == LOCK_BACKEND_FILE:
+            # other processes only respect the project lock
+            return None
+        branch_id = parent_id
+        if not self.branches.is_branch(owner, project, parent_id):
+            branch_id = self.branches.get_branch_of_node(owner, project, parent_id)
+            if branch_id == None:
+                return None
+        if not self.projects.lock_project_read(owner, project):
+            raise GoosvcException("1003")
+        key = (owner, project, branch_id)
+        with self.branch_locks_lock:
+            if not key in self.branch_locks:
+                self.branch_locks[key] = [threading.Lock(), 0]
+            branch_lock = self.branch_locks[key]
+            branch_lock[1] += 1
+        if not branch_lock[0].acquire(timeout=self.projects.project_lock_timeout):
+            self.__drop_branch_lock(key)
+            self.projects.release_project_read(owner, project)
+            raise GoosvcException("1003")
+        return branch_id
+
+    def __release_branch(self, owner: str, project: str, branch_id: str):
+        key = (owner, project, branch_id)
+        self.branch_locks[key][0].release()
+        self.__drop_branch_lock(key)
+        self.projects.release_project_read(owner, project)
+
+    # removes a branch lock when no other thread holds or waits for it
+    def __drop_branch_lock(self, key: tuple):
+        with self.branch_locks_lock:
+            branch_lock = self.branch_locks[key]
+            branch_lock[1] -= 1
+            if branch_lock[1] == 0:
+                del self.branch_locks[key]
+
+    # adds nodes to the head of a locked branch. returns the log position or None if parent_id
+    # is no longer the head of the branch (the nodes start a new branch)
+    def __add_to_branch(self, owner: str, project: str, branch_id: str, parent_id: str, nodes: list[GoosvcNode], prepare = None):
+        branch_head = self.branches.get_branch_head(owner, project, branch_id)
+        if parent_id != branch_id and parent_id != branch_head:
+            return None
+        if prepare != None:
+            prepare(branch_head)
+        parent_node = self.__get_node(owner, project, branch_head)
+        for node in nodes:
+            self.__set_version(parent_node, node)
+            parent_node = node
+        records = [self.__encode_node(node) for node in nodes]
+        position = self.wal.append(owner, project, {"records": [record.decode() for record in records], "branch_id": branch_id})
+        self.__write_nodes(owner, project, nodes, records)
+        self.__set_branch_head(owner, project, branch_id, nodes[-1].node_id)
+        self.projects.generations.bump(owner, project)
+        return position
+
+    def __set_branch_head(self, owner: str, project: str, branch_id: str, node_id: str):
+        if not self.branches.update_branch_head(owner, project, branch_id, node_id):
+            self.branches.create_branch(owner, project, node_id, branch_id)
+    
+    # recovers a project before its first access in this process. not for threads already holding the project
+    # lock (they can not wait for the write lock): the project is recovered on the next access
+    def __recover_once(self, owner: str, project: str):
+        if (owner, project) in self.recovered or not common.is_name_valid(owner) or not common.is_name_valid(project):
+            return
+        if not os.path.isdir(common.get_project_dir(self.projects_dir, owner, project)) or self.projects.is_project_lock_held(owner, project):
+            return
+        if not self.projects.lock_project(owner, project):
+            raise GoosvcException("1003")
+        try:
+            if not (owner, project) in self.recovered:
+                self.__recover(owner, project)
+        finally:
+            self.projects.release_project(owner, project)
+
+    # removes incomplete writes at the end of the project files. caller must hold the project lock for writing
+    def __repair(self, owner: str, project: str):
+        self.wal.repair(owner, project)
+        self.packs.repair(owner, project)
+        self.topology.repair(owner, project)
+
+    # completes writes interrupted by a crash before the first write of this process
+    def __recover(self, owner: str, project: str):
+        self.__repair(owner, project)
+        self.__checkpoint(owner, project)
+        self.recovered.add((owner, project))
+
+    # applies all logged writes again: writes interrupted by a crash (of this or another process) are completed.
+    # applied writes are not changed: nodes in the pack are skipped and a branch head is only set if the branch
+    # does not exist or its head is still the parent of the logged nodes. caller must hold the project lock for writing
+    def __replay(self, owner: str, project: str):
+        for entry in self.wal.read(owner, project):
+            records = [record.encode() for record in entry["records"]]
+            nodes = [self.__decode_node(record) for record in records]
+            missing = [i for i, node in enumerate(nodes) if not self.packs.contains(owner, project, node.node_id)]
+            if len(missing) > 0:
+                # nodes of an entry are written with a single append: either all or none are missing
+                self.__write_nodes(owner, project, [nodes[i] for i in missing], [records[i] for i in missing])
+            if entry["branch_id"] != None:
+                branch_head = self.branches.get_branch_head(owner, project, entry["branch_id"])
+                if branch_head == None or branch_head == nodes[0].parent_id:
+                    self.__set_branch_head(owner, project, entry["branch_id"], nodes[-1].node_id)
+
+    # completes all logged writes, flushes them to disk and clears the log
+    def __checkpoint(self, owner: str, project: str):
+        self.__replay(owner, project)
+        if self.wal.durability != DURABILITY_NONE:
+            self.branches.sync(owner, project)
+            self.packs.sync(owner, project)
+        self.wal.truncate(owner, project)
+    
+    # nodes are stored as json lines. content may be a dataclass or a dict
+    def __encode_node(self, node: GoosvcNode):
+        return (json.dumps(node, default=self.__encode_dataclass) + "\n").encode()
     
-    def __get_node_file(self, owner: str, project: str, node_id: str):
-        project_dir = common.get_project_dir(self.projects_dir, owner, project)
-        return os.path.join(project_dir, "nodes", node_id + ".json")
+    def __encode_dataclass(self, obj):
+        if dataclasses.is_dataclass(obj):
+            return {field.name: getattr(obj, field.name) for field in dataclasses.fields(obj)}
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
     
-    def __write_node(self, owner: str, project: str, node: GoosvcNode):
-        node_file = self.__get_node_file(owner, project, node.node_id)
-        with open(node_file, 'w') as f:
-            f.write(json.dumps(dataclasses.asdict(node)))
+    def __decode_node(self, record: bytes):
+        return GoosvcNode(**json.loads(record))
     
 
 
@@ -0,0 +1,381 @@
+import os
+import json
+import struct
+import threading
+from goosvc.core import common as common
+from goosvc.core.index import GoosvcNodeIndex
+from goosvc.core.exceptions import GoosvcException
+
+DEFAULT_PACK_SEGMENT_SIZE = 64 * 1024 * 1024 # bytes per pack segment. a new segment is started when the current one is full
+DEFAULT_PACK_READ_AHEAD = 256 * 1024 # bytes read at once when several records are requested (e.g. walking a path)
+PACK_SCAN_CHUNK_SIZE = 1024 * 1024 # bytes read at once when scanning all records of a project
+
+# index entry: node id, segment number, offset in segment, record length. 
+# entries are appended in write order, the position of an entry is the sequence number of the node
+PACK_INDEX_ENTRY = struct.Struct("<32sIQI")
+PACK_INDEX_FILE = "pack.idx"
+PACK_MAP_FILE = "pack.map"
+PACK_SEGMENT_SUFFIX = ".pack"
+
+
+# Storage of a single project: records are appended to the current segment file,
+# the location of every record is appended to the index file and added to the memory mapped node index.
+class GoosvcPack:
+    def __init__(self, nodes_dir: str):
+        self.nodes_dir = nodes_dir
+        self.lock = threading.Lock()
+        self.index = GoosvcNodeIndex(os.path.join(nodes_dir, PACK_MAP_FILE)) # node id -> location
+        self.seq = 0 # number of indexed records
+        self.segment = 1 # current segment number
+        self.segment_end = 0 # size of the current segment
+        self.writer = None # append handle of the current segment
+        self.index_writer = None # append handle of the index file
+        self.index_reader = None # read handle of the index file
+        self.readers = {} # read handles by segment number
+        self.imported = False # node files of older versions were imported (see repair)
+
+    def close(self):
+        with self.lock:
+            if self.writer != None:
+                self.writer.close()
+                self.writer = None
+            if self.index_writer != None:
+                self.index_writer.close()
+                self.index_writer = None
+            if self.index_reader != None:
+                self.index_reader.close()
+                self.index_reader = None
+            for reader in self.readers.values():
+                reader.close()
+            self.readers = {}
+            self.index.close()
+
+
+# Append-only node storage. Every project has its own set of pack segments in its nodes folder.
+# Records are opaque bytes (one json line per node), identified by the node id.
+class GoosvcPacks:
+    def __init__(self, projects_dir: str):
+        self.projects_dir = projects_dir
+        self.segment_size = DEFAULT_PACK_SEGMENT_SIZE
+        self.read_ahead = DEFAULT_PACK_READ_AHEAD
+        # open packs by owner and project
+        self.packs = {}
+        self.packs_lock = threading.Lock()
+
+    # appends records (list of node id and record bytes) with a single write. 
+    # returns the sequence numbers of the records
+    def append(self, owner: str, project: str, records: list):
+        pack = self.__get_pack(owner, project)
+        if pack == None:
+            raise GoosvcException("1001")
+        with pack.lock:
+            return self.__append(pack, records)
+
+    # returns the number of nodes in the pack
+    def get_count(self, owner: str, project: str):
+        pack = self.__get_pack(owner, project)
+        if pack == None:
+            return 0
+        return pack.seq
+
+    # returns the sequence number (position in write order) of a node or None if there is no such node
+    def get_seq(self, owner: str, project: str, node_id: str):
+        pack = self.__get_pack(owner, project)
+        if pack == None:
+            return None
+        location = pack.index.lookup(node_id)
+        if location == None:
+            return None
+        return location[0]
+
+    # returns the id of the node with the given sequence number
+    def get_node_id(self, owner: str, project: str, seq: int):
+        pack = self.__get_pack(owner, project)
+        if pack == None:
+            return None
+        return self.__read_index_entry(pack, seq)[0].decode()
+
+    def contains(self, owner: str, project: str, node_id: str):
+        pack = self.__get_pack(owner, project)
+        if pack == None:
+            return False
+        return pack.index.lookup(node_id) != None
+
+    # returns the record of a node or None if there is no such node
+    def read(self, owner: str, project: str, node_id: str):
+        pack = self.__get_pack(owner, project)
+        if pack == None:
+            return None
+        location = pack.index.lookup(node_id)
+        if location == None:
+            return None
+        _, segment, offset, length = location
+        with pack.lock:
+            return self.__read(pack, segment, offset, length)
+
+    # returns the record of the node with the given sequence number or None if there is no such node
+    def read_seq(self, owner: str, project: str, seq: int):
+        pack = self.__get_pack(owner, project)
+        if pack == None or seq < 0 or seq >= pack.seq:
+            return None
+        _, segment, offset, length = self.__read_index_entry(pack, seq)
+        with pack.lock:
+            return self.__read(pack, segment, offset, length)
+
+    # returns the record of a node together with the records stored right before it (read ahead window).
+    # since parents are always written before their children, most ancestors of a node are found in this window.
+    def read_window(self, owner: str, project: str, node_id: str):
+        pack = self.__get_pack(owner, project)
+        if pack == None:
+            return []
+        location = pack.index.lookup(node_id)
+        if location == None:
+            return []
+        _, segment, offset, length = location
+        end = offset + length
+        start = max(0, end - self.read_ahead)
+        with pack.lock:
+            data = self.__read(pack, segment, start, end - start)
+        lines = data.split(b"\n")
+        if start > 0:
+            # first line is most likely incomplete
+            lines = lines[1:]
+        return [line for line in lines if len(line) > 0]
+
+    # returns all records of a project in the order they were written, starting with sequence number start
+    def scan(self, owner: str, project: str, start: int = 0):
+        pack = self.__get_pack(owner, project)
+        if pack == None:
+            return
+        segment = 1
+        offset = 0
+        if start > 0:
+            if start >= pack.seq:
+                return
+            _, segment, offset, _ = self.__read_index_entry(pack, start)
+        while True:
+            segment_file = self.__get_segment_file(pack, segment)
+            if not os.path.exists(segment_file):
+                break
+            with open(segment_file, 'rb') as f:
+                f.seek(offset)
+                offset = 0
+                rest = b""
+                while True:
+                    chunk = f.read(PACK_SCAN_CHUNK_SIZE)
+                    if len(chunk) == 0:
+                        break
+                    lines = (rest + chunk).split(b"\n")
+                    rest = lines.pop()
+                    for line in lines:
+                        if len(line) > 0:
+                            yield line
+            segment += 1
+
+    # flushes the current segment and the index of a project to disk
+    def sync(self, owner: str, project: str):
+        pack = self.__get_pack(owner, project)
+        if pack == None:
+            return
+        with pack.lock:
+            os.fsync(pack.writer.fileno())
+            os.fsync(pack.index_writer.fileno())
+
+    # re-reads the end of the index and the current segment after another process wrote to the project.
+    # nothing is changed on disk: the other process may still be writing (see repair)
+    def refresh(self, owner: str, project: str):
+        pack = self.packs.get(owner, {}).get(project)
+        if pack == None:
+            return
+        with pack.lock:
+            self.__refresh(pack)
+
+    # repairs writes interrupted by a crash of this or another process: incomplete entries and records at the end
+    # are removed, records missing in the index are added and node files of older versions are imported.
+    # caller must hold the project lock for writing (with the file lock backend also the file lock)
+    def repair(self, owner: str, project: str):
+        pack = self.__get_pack(owner, project)
+        if pack == None:
+            return
+        with pack.lock:
+            index_file = os.path.join(pack.nodes_dir, PACK_INDEX_FILE)
+            index_size = os.path.getsize(index_file)
+            if index_size % PACK_INDEX_ENTRY.size != 0:
+                # incomplete entry at the end of the index (interrupted write)
+                with open(index_file, 'r+b') as f:
+                    f.truncate(index_size - index_size % PACK_INDEX_ENTRY.size)
+            if pack.index.map == None and not pack.index.open():
+                pack.index.create()
+            index_end = self.__read_tail(pack)
+            if pack.index.get_count() < pack.seq:
+                # node index is missing entries (new or interrupted write): add them from the index file
+                self.__update_node_index(pack, index_file)
+            if pack.segment_end > index_end:
+                # records written but not indexed (interrupted write)
+                self.__recover(pack, index_end)
+            if not pack.imported:
+                self.__import_node_files(pack)
+                pack.imported = True
+
+    # closes all files of a project (used when the project is deleted)
+    def close_project(self, owner: str, project: str):
+        with self.packs_lock:
+            if owner in self.packs and project in self.packs[owner]:
+                self.packs[owner][project].close()
+                del self.packs[owner][project]
+
+    # returns the pack of a project (opened on first access) or None if the project does not exist
+    def __get_pack(self, owner: str, project: str):
+        if owner in self.packs and project in self.packs[owner]:
+            return self.packs[owner][project]
+        with self.packs_lock:
+            if not owner in self.packs:
+                self.packs[owner] = {}
+            if not project in self.packs[owner]:
+                project_dir = common.get_project_dir(self.projects_dir, owner, project)
+                nodes_dir = os.path.join(project_dir, "nodes")
+                if not os.path.isdir(nodes_dir):
+                    return None
+                pack = GoosvcPack(nodes_dir)
+                self.__open(pack)
+                self.packs[owner][project] = pack
+            return self.packs[owner][project]
+
+    # opens the files of a project without changing them (other processes may be writing, see repair)
+    def __open(self, pack: GoosvcPack):
+        pack.index_writer = open(os.path.join(pack.nodes_dir, PACK_INDEX_FILE), 'ab')
+        self.__refresh(pack)
+
+    # reads the end of the index as seen by readers: nodes become visible once they are in the node index,
+    # which is updated after the index entry is written. caller must hold the pack lock
+    def __refresh(self, pack: GoosvcPack):
+        if pack.index.map == None:
+            pack.index.open()
+        self.__read_tail(pack)
+        pack.seq = min(pack.seq, pack.index.get_count())
+
+    # reads the number of index entries, the last segment and its size.
+    # returns the end of the last indexed record in the last segment. caller must hold the pack lock
+    def __read_tail(self, pack: GoosvcPack):
+        index_file = os.path.join(pack.nodes_dir, PACK_INDEX_FILE)
+        pack.seq = os.path.getsize(index_file) // PACK_INDEX_ENTRY.size
+        segment = 1
+        index_end = 0
+        if pack.seq > 0:
+            with open(index_file, 'rb') as f:
+                f.seek((pack.seq - 1) * PACK_INDEX_ENTRY.size)
+                _, segment, offset, length = PACK_INDEX_ENTRY.unpack(f.read(PACK_INDEX_ENTRY.size))
+                index_end = offset + length
+        # find last segment
+        while os.path.exists(self.__get_segment_file(pack, segment + 1)):
+            segment += 1
+            index_end = 0
+        if pack.writer == None or segment != pack.segment:
+            if pack.writer != None:
+                pack.writer.close()
+            pack.segment = segment
+            pack.writer = open(self.__get_segment_file(pack, segment), 'ab')
+        pack.segment_end = os.fstat(pack.writer.fileno()).st_size
+        return index_end
+
+    def __update_node_index(self, pack: GoosvcPack, index_file: str):
+        seq = pack.index.get_count()
+        with open(index_file, 'rb') as f:
+            f.seek(seq * PACK_INDEX_ENTRY.size)
+            data = f.read((pack.seq - seq) * PACK_INDEX_ENTRY.size)
+        for node_id, segment, offset, length in PACK_INDEX_ENTRY.iter_unpack(data):
+            pack.index.insert(node_id.decode(), seq, segment, offset, length)
+            seq += 1
+
+    # adds records missing in the index and removes an incomplete record at the end of the current segment
+    def __recover(self, pack: GoosvcPack, index_end: int):
+        data = self.__read(pack, pack.segment, index_end, pack.segment_end - index_end)
+        offset = index_end
+        entries = []
+        for line in data.split(b"\n")[:-1]:
+            length = len(line) + 1
+            node_id = json.loads(line)["node_id"]
+            pack.index.insert(node_id, pack.seq, pack.segment, offset, length)
+            pack.seq += 1
+            entries.append(PACK_INDEX_ENTRY.pack(node_id.encode(), pack.segment, offset, length))
+            offset += length
+        if offset < pack.segment_end:
+            pack.writer.truncate(offset)
+            pack.segment_end = offset
+        pack.index_writer.write(b"".join(entries))
+        pack.index_writer.flush()
+
+    # imports nodes stored as single files (<node_id>.json) by older versions, parents first
+    def __import_node_files(self, pack: GoosvcPack):
+        node_files = [f for f in os.listdir(pack.nodes_dir) if f.endswith(".json") and common.is_id_valid(os.path.splitext(f)[0])]
+        if len(node_files) == 0:
+            return
+        nodes = {}
+        for node_file in node_files:
+            with open(os.path.join(pack.nodes_dir, node_file), 'rb') as f:
+                record = f.read().strip()
+            nodes[os.path.splitext(node_file)[0]] = (json.loads(record)["parent_id"], record)
+        children = {}
+        for node_id, (parent_id, record) in nodes.items():
+            if not parent_id in nodes:
+                parent_id = None
+            children.setdefault(parent_id, []).append(node_id)
+        records = []
+        pending = list(children.get(None, []))
+        while len(pending) > 0:
+            node_id = pending.pop()
+            pending.extend(children.get(node_id, []))
+            if pack.index.lookup(node_id) == None:
+                records.append((node_id, nodes[node_id][1] + b"\n"))
+        self.__append(pack, records)
+        for node_file in node_files:
+            os.remove(os.path.join(pack.nodes_dir, node_file))
+
+    # caller must hold the pack lock
+    def __append(self, pack: GoosvcPack, records: list):
+        if len(records) == 0:
+            return []
+        size = sum(len(record) for _, record in records)
+        if pack.segment_end > 0 and pack.segment_end + size > self.segment_size:
+            # start a new segment
+            pack.writer.close()
+            pack.segment += 1
+            pack.writer = open(self.__get_segment_file(pack, pack.segment), 'ab')
+            pack.segment_end = 0
+        locations = []
+        entries = []
+        offset = pack.segment_end
+        for node_id, record in records:
+            location = (pack.segment, offset, len(record))
+            locations.append(location)
+            entries.append(PACK_INDEX_ENTRY.pack(node_id.encode(), *location))
+            offset += len(record)
+        pack.writer.write(b"".join(record for _, record in records))
+        pack.writer.flush()
+        pack.index_writer.write(b"".join(entries))
+        pack.index_writer.flush()
+        pack.segment_end = offset
+        seqs = []
+        for (node_id, _), location in zip(records, locations):
+            pack.index.insert(node_id, pack.seq, *location)
+            seqs.append(pack.seq)
+            pack.seq += 1
+        return seqs
+
+    def __read_index_entry(self, pack: GoosvcPack, seq: int):
+        with pack.lock:
+            if pack.index_reader == None:
+                pack.index_reader = open(os.path.join(pack.nodes_dir, PACK_INDEX_FILE), 'rb')
+            pack.index_reader.seek(seq * PACK_INDEX_ENTRY.size)
+            return PACK_INDEX_ENTRY.unpack(pack.index_reader.read(PACK_INDEX_ENTRY.size))
+
+    # caller must hold the pack lock
+    def __read(self, pack: GoosvcPack, segment: int, offset: int, length: int):
+        if not segment in pack.readers:
+            pack.readers[segment] = open(self.__get_segment_file(pack, segment), 'rb')
+        reader = pack.readers[segment]
+        reader.seek(offset)
+        return reader.read(length)
+
+    def __get_segment_file(self, pack: GoosvcPack, segment: int):
+        return os.path.join(pack.nodes_dir, str(segment).zfill(8) + PACK_SEGMENT_SUFFIX)
@@ -4,13 +4,24 @@ from dataclasses import dataclass
 import dataclasses
 import shutil
 import threading
+import bisect
+from collections import OrderedDict
 from goosvc.core import common as common
 from goosvc.core.owners import GoosvcOwners
 from goosvc.core.exceptions import GoosvcException
+from goosvc.core.generations import GoosvcGenerations
+from goosvc.core.locks import GoosvcRWLock, GoosvcFileLock, DEFAULT_LOCK_BACKEND, LOCK_BACKEND_FILE
 
 
 DEFAULT_PROJECT_LOCK_TIMEOUT = 10 # seconds. set to -1 for infinite timeout
 DEFAULT_OWNER_LOCK_TIMEOUT = 10 # seconds. set to -1 for infinite timeout
+DEFAULT_PROJECT_CACHE_SIZE = 10000 # projects with metadata kept in memory (least recently used are dropped)
+MANIFEST_FILE = "manifest.json"
+DEFAULT_PROJECTS_PAGE_SIZE = 100 # project names per page (see get_project_names_page)
+PERMISSION_READ = 1
+PERMISSION_WRITE = 2
+PERMISSION_ADMIN = 4
+PERMISSION_ALL = PERMISSION_READ | PERMISSION_WRITE | PERMISSION_ADMIN
 
 @dataclass
 class GoosvcProject:
@@ -26,96 +37,205 @@ class GoosvcPermission:
     write: bool
     admin: bool
 
+# Immutable permission used for access checks. There is one shared instance per bitmask (see ACCESS)
+@dataclass(frozen=True, slots=True)
+class GoosvcAccess:
+    mask: int
+    read: bool
+    write: bool
+    admin: bool
+
+ACCESS = tuple(GoosvcAccess(mask, bool(mask & PERMISSION_READ), bool(mask & PERMISSION_WRITE), bool(mask & PERMISSION_ADMIN)) for mask in range(PERMISSION_ALL + 1))
+
+# returns the bitmask of a permission (GoosvcPermission or dict read from a project file)
+def get_permission_mask(permission):
+    if type(permission) == dict:
+        permission = GoosvcPermission(**permission)
+    return (PERMISSION_READ if permission.read else 0) | (PERMISSION_WRITE if permission.write else 0) | (PERMISSION_ADMIN if permission.admin else 0)
+
+# Permissions of a project compiled to bitmasks: one per user and one for all other users.
+# Tables are never changed, a changed project gets a new table
+class GoosvcPermissionTable:
+    __slots__ = ("masks", "default")
+
+    def __init__(self, project: GoosvcProject):
+        self.masks = {user: get_permission_mask(permission) for user, permission in project.users.items()}
+        self.default = 0 if project.private else PERMISSION_READ
+
+    def get(self, user: str):
+        return ACCESS[self.masks.get(user, self.default)]
+
+
+# Project names of an owner in sorted order (all projects and public projects only).
+# Names are used as cursors for paging, so pages stay stable while projects are added or removed.
+class GoosvcOwnerIndex:
+    def __init__(self, mtime: int, generation: int):
+        self.mtime = mtime # modification time of the owner directory when the index was built
+        self.generation = generation # owner generation when the index was built (see GoosvcGenerations.get_owner_generation)
+        self.projects = []
+        self.public = []
+
+    def set(self, project: str, private: bool):
+        self.__insert(self.projects, project)
+        if private:
+            self.__remove(self.public, project)
+        else:
+            self.__insert(self.public, project)
+
+    def remove(self, project: str):
+        self.__remove(self.projects, project)
+        self.__remove(self.public, project)
+
+    # returns up to limit names after cursor and the cursor of the next page (None on the last page)
+    def get_page(self, public_only: bool, limit: int, cursor: str = None):
+        names = self.public if public_only else self.projects
+        start = 0 if cursor == None else bisect.bisect_right(names, cursor)
+        page = names[start:start + limit]
+        if start + limit >= len(names) or len(page) == 0:
+            return page, None
+        return page, page[-1]
+
+    def __insert(self, names: list, project: str):
+        index = bisect.bisect_left(names, project)
+        if index == len(names) or names[index] != project:
+            names.insert(index, project)
+
+    def __remove(self, names: list, project: str):
+        index = bisect.bisect_left(names, project)
+        if index < len(names) and names[index] == project:
+            del names[index]
+
+
 class GoosvcProjects:
-    def __init__(self, projects_dir: str, owners: GoosvcOwners):
+    def __init__(self, projects_dir: str, owners: GoosvcOwners, generations: GoosvcGenerations):
         # base folder for all projects
         self.projects_dir = projects_dir
         self.owners = owners
+        # generation counters to detect writes of other processes
+        self.generations = generations
         # create individual locks for all projects and owners
         self.owner_lock_timeout = DEFAULT_OWNER_LOCK_TIMEOUT
         self.owner_locks = {}
         self.project_lock_timeout = DEFAULT_PROJECT_LOCK_TIMEOUT
         self.project_locks = {}
-        projects = self.get_all_project_names()
-        for owner in projects:
-            self.owner_locks[owner] = threading.Lock()
-            self.project_locks[owner] = {}
-            for project in projects[owner]:
-                self.project_locks[owner][project] = threading.Lock()
-        # load all projects to memory
-        self.projects = {}
-        for owner in projects:
-            self.projects[owner] = {}
-            for project in projects[owner]:
-                self.projects[owner][project] = self.read_project(owner, project)
+        self.locks_lock = threading.Lock() # protects the creation of locks
+        # with the file backend, project and owner locks are also held as os file locks (multiple processes)
+        self.lock_backend = DEFAULT_LOCK_BACKEND
+        self.locks_dir = os.path.join(os.path.dirname(projects_dir), "locks")
+        self.file_locks = {} # lock file -> file lock
+        # functions called with owner and project name when a project is deleted
+        self.delete_listeners = []
+        # project metadata is loaded on first access. locks are created on first use
+        self.projects = OrderedDict() # (owner, project) -> project, least recently used first
+        self.projects_lock = threading.Lock()
+        self.project_cache_size = DEFAULT_PROJECT_CACHE_SIZE
+        # optional list of all projects (see build_manifest)
+        self.manifest_file = os.path.join(os.path.dirname(projects_dir), MANIFEST_FILE)
+        self.manifest = None # file id (inode and modification time) and content of the loaded manifest
+        self.manifest_lock = threading.Lock()
+        # compiled permissions by owner and project (dropped with the project metadata)
+        self.permission_tables = {}
+        # project names by owner (loaded on first access, rebuilt if another process changed the projects of the owner)
+        self.owner_indexes = {}
 
+    # returns the project names of all owners. uses the manifest if there is one
     def get_all_project_names(self): 
+        manifest = self.get_manifest()
+        if manifest != None:
+            return {owner: list(manifest[owner]) for owner in manifest}
         projects = {}
         for owner in self.owners.get_owners():
             projects[owner] = self.get_project_names(owner)
         return projects
     
+    # returns the names of all project directories of an owner
     def get_project_names(self, owner): 
         user_dir = os.path.join(self.projects_dir, owner)
         if not os.path.exists(user_dir):
             return []
-        return os.listdir(user_dir)
+        return [project for project in os.listdir(user_dir) if os.path.isdir(os.path.join(user_dir, project))]
     
     def get_public_project_names(self, owner): 
-        user_dir = os.path.join(self.projects_dir, owner)
-        if not os.path.exists(user_dir):
+        index = self.__get_owner_index(owner)
+        if index == None:
             return []
-        projects = os.listdir(user_dir)
-        public_projects = []
-        for project in projects:
-            project_file = self.__get_project_file(owner, project)
-            with open(project_file, 'r') as f:
-                project_obj = GoosvcProject(**json.load(f))
-                if not project_obj.private:
-                    public_projects.append(project)
-        return public_projects
+        return list(index.public)
+
+    # returns a page of project names (sorted) and the cursor of the next page (None on the last page)
+    def get_project_names_page(self, owner: str, public_only: bool = False, limit: int = DEFAULT_PROJECTS_PAGE_SIZE, cursor: str = None):
+        index = self.__get_owner_index(owner)
+        if index == None:
+            return [], None
+        with self.projects_lock:
+            return index.get_page(public_only, limit, cursor)
+
+    # returns the number of projects and public projects of an owner
+    def get_project_count(self, owner: str):
+        index = self.__get_owner_index(owner)
+        if index == None:
+            return {"projects": 0, "public": 0}
+        return {"projects": len(index.projects), "public": len(index.public)}
         
     def set_access_permission(self, owner: str, project: str, user: str, permission: GoosvcPermission):
         if user == owner: # owner has full access. cannot be changed
             raise GoosvcException("1010") 
         if len(user) < 4 or not user.replace('_', '').isalnum(): # invalid user name
             raise GoosvcException("1007") 
-        if not owner in self.projects or not project in self.projects[owner]: # project not found
+        if self.get_project(owner, project) == None: # project not found
             raise GoosvcException("1001") 
         if not self.lock_project(owner, project): # no concurrent write access to project file
             raise GoosvcException("1003")
-        # set permission in memory
-        self.projects[owner][project].users[user] = permission
-        # write permission to file
-        self.write_project(owner, project, self.projects[owner][project])
-        self.release_project(owner, project)
+        try:
+            project_obj = self.get_project(owner, project)
+            # changed copy of the metadata (a copy of the permission: the caller may change its object)
+            users = dict(project_obj.users)
+            users[user] = GoosvcPermission(permission.read, permission.write, permission.admin)
+            project_obj = dataclasses.replace(project_obj, users=users)
+            # write permission to file
+            self.write_project(owner, project, project_obj)
+            self.__replace_project(owner, project, project_obj)
+        finally:
+            self.release_project(owner, project)
         return True
     
     def get_access_permission(self, owner: str, project: str, user: str):
-        if not owner in self.projects or not project in self.projects[owner]:
-            # project does not exist
-            return GoosvcPermission(False, False, False)
+        access = self.get_access(owner, project, user)
+        return GoosvcPermission(access.read, access.write, access.admin)
+
+    # returns the permission of a user as shared immutable object (fast path for access checks)
+    def get_access(self, owner: str, project: str, user: str):
+        self.__validate(owner, project)
+        key = (owner, project)
+        table = self.permission_tables.get(key)
+        if table == None:
+            project_obj = self.get_project(owner, project)
+            if project_obj == None:
+                # project does not exist
+                return ACCESS[0]
+            table = GoosvcPermissionTable(project_obj)
+            with self.projects_lock:
+                # cached metadata is never changed but replaced (see __replace_project):
+                # the table is only kept if the metadata was not replaced meanwhile
+                if self.projects.get(key) is project_obj:
+                    self.permission_tables[key] = table
         if user == "app": # app has full access
-            return GoosvcPermission(True, True, True)
-        if user in self.projects[owner][project].users:
-            permission = self.projects[owner][project].users[user]
-            if (type(permission) == GoosvcPermission):
-                return permission
-            return GoosvcPermission(**permission) 
-        if not self.projects[owner][project].private:
-            return GoosvcPermission(True, False, False)
-        return GoosvcPermission(False, False, False)
+            return ACCESS[PERMISSION_ALL]
+        return table.get(user)
     
     def set_private(self, owner: str, project: str, private: bool):
-        if not owner in self.projects or not project in self.projects[owner]:
+        if self.get_project(owner, project) == None:
             return False
         if not self.lock_project(owner, project): # no concurrent write access to project file
             return False
-        # set permission in memory
-        self.projects[owner][project].private = private
-        # write permission to file
-        self.write_project(owner, project, self.projects[owner][project])
-        self.release_project(owner, project)
+        try:
+            project_obj = dataclasses.replace(self.get_project(owner, project), private=private)
+            # write permission to file
+            self.write_project(owner, project, project_obj)
+            self.__replace_project(owner, project, project_obj)
+            self.__update_owner_index(owner, project, private, True)
+            self.__update_manifest(owner, project, private)
+        finally:
+            self.release_project(owner, project)
         return True
     
     def create_project(self, owner: str, project_name: str, project_description: str = ""):
@@ -152,18 +272,18 @@ class GoosvcProjects:
         project_obj = GoosvcProject(project_name, owner, {owner: GoosvcPermission(True, True, True)}, project_description)
         self.write_project(owner, project_name, project_obj)
         # create lock for project
-        if owner not in self.project_locks:
-            self.project_locks[owner] = {}
-        self.project_locks[owner][project_name] = threading.Lock()
+        self.__get_project_lock(owner, project_name)
         # add project to memory
-        if not owner in self.projects:
-            self.projects[owner] = {}
-        self.projects[owner][project_name] = project_obj
+        self.__cache_project(owner, project_name, project_obj)
+        self.__update_owner_index(owner, project_name, project_obj.private)
+        self.__update_manifest(owner, project_name, project_obj.private)
         self.release_owner(owner)
         return True
     
-    #  only used during startup (no lock required)
+    # reads the metadata of a project from its file
     def read_project(self, owner: str, project_name: str):
+        # changes of other processes after this point are detected
+        self.generations.open_project(owner, project_name)
         project_file = self.__get_project_file(owner, project_name)
         with open(project_file, 'r') as f:
             return GoosvcProject(**json.load(f))
@@ -171,41 +291,102 @@ class GoosvcProjects:
     # caller should lock project if its not a new project
     def write_project(self, owner: str, project_name: str, project: GoosvcProject):
         project_file = self.__get_project_file(owner, project_name)
-        with open(project_file, 'w') as f:
-            f.write(json.dumps(dataclasses.asdict(project)))
+        common.write_file(project_file, json.dumps(dataclasses.asdict(project)))
+        self.generations.bump(owner, project_name)
+
+    # reads the metadata of a project again (e.g. after another process changed it)
+    def reload_project(self, owner: str, project_name: str):
+        with self.projects_lock:
+            self.projects.pop((owner, project_name), None)
+            self.permission_tables.pop((owner, project_name), None)
     
+    # returns the metadata of a project (loaded on first access) or None if the project does not exist
     def get_project(self, owner: str, project_name: str):
-        if not owner in self.projects or not project_name in self.projects[owner]:
+        key = (owner, project_name)
+        with self.projects_lock:
+            project_obj = self.projects.get(key)
+            if project_obj != None:
+                self.projects.move_to_end(key)
+                return project_obj
+        if not common.is_name_valid(owner) or not common.is_name_valid(project_name) or not self.__is_project_dir(owner, project_name):
+            return None
+        try:
+            project_obj = self.read_project(owner, project_name)
+        except FileNotFoundError:
+            # deleted meanwhile
+            return None
+        return self.__cache_project(owner, project_name, project_obj)
+
+    # returns the manifest (owner -> project name -> private) or None if no manifest was built.
+    # the manifest is read again when another process replaced it
+    def get_manifest(self):
+        try:
+            stat = os.stat(self.manifest_file)
+        except FileNotFoundError:
             return None
-        return self.projects[owner][project_name]
+        manifest = self.manifest
+        if manifest == None or manifest[0] != (stat.st_ino, stat.st_mtime_ns):
+            with open(self.manifest_file, 'r') as f:
+                manifest = ((stat.st_ino, stat.st_mtime_ns), json.load(f))
+            self.manifest = manifest
+        return manifest[1]
+
+    # writes the manifest of all projects. once built, it is kept up to date and used to list projects
+    def build_manifest(self):
+        with self.manifest_lock:
+            manifest = {}
+            for owner in self.owners.get_owners():
+                manifest[owner] = {}
+                for project in self.get_project_names(owner):
+                    project_obj = self.get_project(owner, project)
+                    if project_obj != None:
+                        manifest[owner][project] = project_obj.private
+            common.write_file(self.manifest_file, json.dumps(manifest))
     
     def delete_project(self, owner: str, project_name: str):
-        if not self.lock_project(owner, project_name): # stop all write access to project
-            return False
-        projects = self.get_project_names(owner)
-        if project_name not in projects:
-            # Project does not exist
-            return False
-        project_dir = common.get_project_dir(self.projects_dir, owner, project_name)
-        if not self.__is_project_dir(owner, project_name):
+        if not self.lock_project(owner, project_name): # stop all read and write access to project
             return False
-        #  delete project directory
-        shutil.rmtree(project_dir)
-        # remove lock
-        if owner in self.project_locks and project_name in self.project_locks[owner]:
-            del self.project_locks[owner][project_name]
-        # remove project from memory
-        if owner in self.projects and project_name in self.projects[owner]:
-            del self.projects[owner][project_name]
-        return True
+        try:
+            projects = self.get_project_names(owner)
+            if project_name not in projects:
+                # Project does not exist
+                return False
+            project_dir = common.get_project_dir(self.projects_dir, owner, project_name)
+            if not self.__is_project_dir(owner, project_name):
+                return False
+            # release resources held for the project (e.g. open files)
+            for listener in self.delete_listeners:
+                listener(owner, project_name)
+            #  delete project directory
+            shutil.rmtree(project_dir)
+            # remove project from memory
+            with self.projects_lock:
+                self.projects.pop((owner, project_name), None)
+                self.permission_tables.pop((owner, project_name), None)
+            self.__update_owner_index(owner, project_name, None)
+            self.__update_manifest(owner, project_name, None)
+            return True
+        finally:
+            # the lock is dropped if no thread waits for it. waiting readers and writers find the project deleted
+            self.release_project(owner, project_name)
     
+    def add_delete_listener(self, listener):
+        self.delete_listeners.append(listener)
+    
+    # locks a project for writing. waits until running reads and writes are done
     def lock_project(self, owner: str, project: str):
-        if owner not in self.project_locks:
-            self.project_locks[owner] = {}
-        if project not in self.project_locks[owner]:
-            self.project_locks[owner][project] = threading.Lock()
         # print("***** Locking project", owner, project)
-        return self.project_locks[owner][project].acquire(timeout=self.project_lock_timeout)
+        lock = self.__acquire_project_lock(owner, project, True)
+        if lock == None:
+            return False
+        if self.lock_backend == LOCK_BACKEND_FILE:
+            # the thread lock is held: no other thread of this process uses the file lock
+            if not self.__get_file_lock(os.path.join(self.locks_dir, owner, project + ".lock")).acquire(self.project_lock_timeout):
+                lock.release_write()
+                return False
+        # drop cached state written by other processes before it is used for the write
+        self.generations.validate(owner, project)
+        return True
 
     def release_project(self, owner: str, project: str):
         if owner not in self.project_locks:
@@ -215,19 +396,51 @@ class GoosvcProjects:
             print("Error: project not in locks")
             return
         # print("****** Releasing Project", owner, project)
-        self.project_locks[owner][project].release()
+        self.__release_file_lock(os.path.join(self.locks_dir, owner, project + ".lock"))
+        self.project_locks[owner][project].release_write()
+        if not self.__is_project_dir(owner, project):
+            # project was deleted (or never existed)
+            self.__drop_project_lock(owner, project)
+
+    # locks a project for reading. reads run in parallel, but wait for running and waiting writes
+    def lock_project_read(self, owner: str, project: str):
+        if not common.is_name_valid(owner) or not common.is_name_valid(project):
+            # invalid names never refer to a project: nothing to lock
+            return True
+        self.__validate(owner, project)
+        return self.__acquire_project_lock(owner, project, False) != None
+
+    def release_project_read(self, owner: str, project: str):
+        if owner not in self.project_locks or project not in self.project_locks[owner]:
+            return
+        self.project_locks[owner][project].release_read()
+        if not (owner, project) in self.projects and not self.__is_project_dir(owner, project):
+            self.__drop_project_lock(owner, project)
     
+    # true if the current thread holds the read or write lock of a project
+    def is_project_lock_held(self, owner: str, project: str):
+        lock = self.project_locks.get(owner, {}).get(project)
+        return lock != None and lock.is_held()
+
     def lock_owner(self, owner: str):
-        if owner not in self.owner_locks:
-            self.owner_locks[owner] = threading.Lock()
+        with self.locks_lock:
+            if owner not in self.owner_locks:
+                self.owner_locks[owner] = threading.Lock()
         # print("***** Locking owner", owner)
-        return self.owner_locks[owner].acquire(timeout=self.owner_lock_timeout)
+        if not self.owner_locks[owner].acquire(timeout=self.owner_lock_timeout):
+            return False
+        if self.lock_backend == LOCK_BACKEND_FILE:
+            if not self.__get_file_lock(os.path.join(self.locks_dir, owner + ".lock")).acquire(self.owner_lock_timeout):
+                self.owner_locks[owner].release()
+                return False
+        return True
     
     def release_owner(self, owner: str):
         if owner not in self.owner_locks:
             print("Error: owner not in locks")
             return
         # print("****** Releasing Owner", owner)
+        self.__release_file_lock(os.path.join(self.locks_dir, owner + ".lock"))
         self.owner_locks[owner].release()
     
     def lock_all_projects_of_owner(self, owner: str):
@@ -243,7 +456,7 @@ class GoosvcProjects:
     def release_all_projects_of_owner(self, owner: str):
         projects = self.get_project_names(owner)
         for project in projects:
-            self.project_locks[owner][project].release()
+            self.release_project(owner, project)
     
     def lock_all_projects(self):
         for owner in self.get_all_project_names():
@@ -254,6 +467,168 @@ class GoosvcProjects:
         for owner in self.get_all_project_names():
             self.release_all_projects_of_owner(owner)
     
+    # acquires the lock of a project (write or read lock). returns the lock or None if it could not be acquired
+    # within the timeout or the names are invalid. a lock dropped while the thread waited for it (see __drop_project_lock)
+    # is released again and the new lock of the project is used
+    def __acquire_project_lock(self, owner: str, project: str, write: bool):
+        if not common.is_name_valid(owner) or not common.is_name_valid(project):
+            return None
+        while True:
+            lock = self.__get_project_lock(owner, project)
+            if write:
+                acquired = lock.acquire_write(timeout=self.project_lock_timeout)
+            else:
+                acquired = lock.acquire_read(timeout=self.project_lock_timeout)
+            if not acquired:
+                return None
+            if self.project_locks.get(owner, {}).get(project) is lock:
+                return lock
+            if write:
+                lock.release_write()
+            else:
+                lock.release_read()
+
+    # removes the lock of a project if no thread holds or waits for it (deleted, missing or evicted projects)
+    def __drop_project_lock(self, owner: str, project: str):
+        with self.locks_lock:
+            owner_locks = self.project_locks.get(owner)
+            if owner_locks == None or not project in owner_locks or not owner_locks[project].is_idle():
+                return
+            del owner_locks[project]
+            if len(owner_locks) == 0:
+                del self.project_locks[owner]
+
+    def __get_project_lock(self, owner: str, project: str):
+        with self.locks_lock:
+            if owner not in self.project_locks:
+                self.project_locks[owner] = {}
+            if project not in self.project_locks[owner]:
+                self.project_locks[owner][project] = GoosvcRWLock()
+            return self.project_locks[owner][project]
+
+    # drops cached state of a project written by another process. runs exclusively in this process
+    # (not for threads already holding the project lock: the state was valid when they got the lock)
+    def __validate(self, owner: str, project: str):
+        if not self.generations.is_stale(owner, project):
+            return
+        lock = self.__get_project_lock(owner, project)
+        if lock.is_held():
+            return
+        lock = self.__acquire_project_lock(owner, project, True)
+        if lock != None:
+            try:
+                self.generations.validate(owner, project)
+            finally:
+                lock.release_write()
+
+    def __cache_project(self, owner: str, project_name: str, project_obj: GoosvcProject):
+        key = (owner, project_name)
+        with self.projects_lock:
+            # keep the object of another thread loading the project at the same time
+            project_obj = self.projects.setdefault(key, project_obj)
+            self.projects.move_to_end(key)
+            evicted_keys = []
+            while len(self.projects) > self.project_cache_size:
+                evicted_key, _ = self.projects.popitem(last=False)
+                self.permission_tables.pop(evicted_key, None)
+                evicted_keys.append(evicted_key)
+        for evicted_owner, evicted_project in evicted_keys:
+            self.__drop_project_lock(evicted_owner, evicted_project)
+        return project_obj
+
+    # replaces the cached metadata of a project by a changed copy. caller must hold the project lock
+    def __replace_project(self, owner: str, project_name: str, project_obj: GoosvcProject):
+        key = (owner, project_name)
+        with self.projects_lock:
+            if key in self.projects:
+                self.projects[key] = project_obj
+            self.permission_tables.pop(key, None)
+
+    # returns the index of an owner or None if the owner does not exist. the index is built from the manifest
+    # (if there is one) or the project files and rebuilt when another process added or removed a project (owner directory
+    # changed) or changed the visibility of a project (owner generation changed)
+    def __get_owner_index(self, owner: str):
+        user_dir = os.path.join(self.projects_dir, owner)
+        if not common.is_name_valid(owner) or not os.path.isdir(user_dir):
+            return None
+        # the generation file is created before the modification time is read
+        generation = self.generations.get_owner_generation(owner)
+        mtime = os.stat(user_dir).st_mtime_ns
+        index = self.owner_indexes.get(owner)
+        if index != None and index.mtime == mtime and index.generation == generation:
+            return index
+        index = GoosvcOwnerIndex(mtime, generation)
+        manifest = self.get_manifest()
+        if manifest != None and owner in manifest and sorted(manifest[owner]) == sorted(self.get_project_names(owner)):
+            for project, private in manifest[owner].items():
+                index.set(project, private)
+        else:
+            for project in self.get_project_names(owner):
+                # cached metadata changed by another process is read again
+                self.__validate(owner, project)
+                project_obj = self.get_project(owner, project)
+                if project_obj != None:
+                    index.set(project, project_obj.private)
+        with self.projects_lock:
+            self.owner_indexes[owner] = index
+        return index
+
+    # adds (private is True or False) or removes (private is None) a project in the index of its owner.
+    # a visibility change (bump_owner) is announced to other processes by the owner generation
+    def __update_owner_index(self, owner: str, project_name: str, private: bool, bump_owner: bool = False):
+        index = self.owner_indexes.get(owner)
+        if index == None:
+            if bump_owner:
+                self.generations.bump_owner(owner)
+            return
+        with self.projects_lock:
+            generation = self.generations.get_owner_generation(owner)
+            if bump_owner:
+                self.generations.bump_owner(owner)
+            if private == None:
+                index.remove(project_name)
+            else:
+                index.set(project_name, private)
+            # the change of the owner directory is known
+            index.mtime = os.stat(os.path.join(self.projects_dir, owner)).st_mtime_ns
+            if index.generation == generation:
+                # no changes of other processes missed: the own change is known
+                index.generation = self.generations.get_owner_generation(owner)
+
+    # adds (private is True or False) or removes (private is None) a project in the manifest if there is one
+    def __update_manifest(self, owner: str, project_name: str, private: bool):
+        if not os.path.exists(self.manifest_file):
+            return
+        with self.manifest_lock:
+            lock_file = os.path.join(self.locks_dir, MANIFEST_FILE + ".lock")
+            if self.lock_backend == LOCK_BACKEND_FILE and not self.__get_file_lock(lock_file).acquire(self.owner_lock_timeout):
+                raise GoosvcException("1003")
+            try:
+                manifest = self.get_manifest()
+                owner_projects = dict(manifest.get(owner, {}))
+                if private == None:
+                    owner_projects.pop(project_name, None)
+                else:
+                    owner_projects[project_name] = private
+                manifest = dict(manifest)
+                manifest[owner] = owner_projects
+                common.write_file(self.manifest_file, json.dumps(manifest))
+            finally:
+                self.__release_file_lock(lock_file)
+
+    def __get_file_lock(self, lock_file: str):
+        with self.locks_lock:
+            if not lock_file in self.file_locks:
+                os.makedirs(os.path.dirname(lock_file), exist_ok=True)
+                self.file_locks[lock_file] = GoosvcFileLock(lock_file)
+            return self.file_locks[lock_file]
+
+    # releases a file lock if it is held (the backend may have been changed meanwhile)
+    def __release_file_lock(self, lock_file: str):
+        file_lock = self.file_locks.get(lock_file)
+        if file_lock != None:
+            file_lock.release()
+
     def __get_project_file(self, owner: str, project: str):
         project_dir = common.get_project_dir(self.projects_dir, owner, project)
         return os.path.join(project_dir, "project.json")
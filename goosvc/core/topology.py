@@ -0,0 +1,381 @@
+import os
+import json
+import struct
+import threading
+from array import array
+from collections import OrderedDict
+from goosvc.core import common as common
+from goosvc.core.packs import GoosvcPacks
+
+DEFAULT_RESIDENT_PROJECTS = 64 # number of project topologies kept in memory
+
+NO_NODE = -1 # parent of the root node
+TYPE_OTHER = 255 # type code used when a project has more than 255 node types
+TOPOLOGY_FILE = "topology.bin"
+TOPOLOGY_TYPES_FILE = "topology.types" # json list of type names, the position is the type code
+# topology record: parent sequence number, type code, version, timestamp
+TOPOLOGY_RECORD = struct.Struct("<iBiq")
+
+
+# Topology of a project as compact arrays indexed by the sequence number of the nodes in the pack.
+# Parents are always stored before their children.
+class GoosvcProjectTopology:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.loaded = threading.Event()
+        self.failed = False # set if loading raised an error (waiting threads try again)
+        self.parents = array('i')
+        self.types = array('B')
+        self.versions = array('i')
+        self.timestamps = array('q')
+        self.depths = array('i') # number of nodes from root to node (root has depth 1)
+        # skip pointers (skew binary jumps): every node points to an ancestor such that
+        # any ancestor can be reached in O(log depth) steps. the root points to itself
+        self.jumps = array('i')
+        # nearest ancestor (or the node itself) of every node by type code
+        self.nearest = {}
+        self.type_codes = {} # type name -> type code
+
+    def append(self, parent: int, type_code: int, version: int, timestamp: int):
+        seq = len(self.parents)
+        self.types.append(type_code)
+        self.versions.append(version)
+        self.timestamps.append(timestamp)
+        if parent == NO_NODE:
+            self.depths.append(1)
+            self.jumps.append(seq)
+        else:
+            self.depths.append(self.depths[parent] + 1)
+            jump = self.jumps[parent]
+            if self.depths[parent] - self.depths[jump] == self.depths[jump] - self.depths[self.jumps[jump]]:
+                self.jumps.append(self.jumps[jump])
+            else:
+                self.jumps.append(parent)
+        if not type_code in self.nearest:
+            # first node of this type: no earlier node has an ancestor of this type
+            self.nearest[type_code] = array('i', [NO_NODE]) * seq
+        for code, nearest in self.nearest.items():
+            if code == type_code:
+                nearest.append(seq)
+            elif parent == NO_NODE:
+                nearest.append(NO_NODE)
+            else:
+                nearest.append(nearest[parent])
+        # parent is added last: the node is visible to readers once all arrays are complete
+        self.parents.append(parent)
+
+    def get_count(self):
+        return len(self.parents)
+
+    # returns the type codes for a list of type names. unknown types are ignored.
+    # returns None if the codes can not be resolved (more than 255 types)
+    def get_type_codes(self, types: list[str]):
+        codes = set()
+        for type in types:
+            if type in self.type_codes:
+                codes.add(self.type_codes[type])
+            elif len(self.type_codes) >= TYPE_OTHER:
+                # type might be stored as TYPE_OTHER
+                return None
+        return codes
+
+    # returns the sequence numbers from seq to the root (or to root_seq, exclusive) filtered by type codes.
+    # with type codes, the path hops from one matching node to the next.
+    # returns None if root_seq is not an ancestor of seq
+    def get_path(self, seq: int, type_codes: set = None, root_seq: int = NO_NODE):
+        if root_seq != NO_NODE and not self.is_ancestor(root_seq, seq):
+            return None
+        path = []
+        parents = self.parents
+        if type_codes != None:
+            min_depth = 0 if root_seq == NO_NODE else self.depths[root_seq]
+            while seq != NO_NODE:
+                seq = self.get_nearest(seq, type_codes)
+                if seq == NO_NODE or self.depths[seq] <= min_depth:
+                    break
+                path.append(seq)
+                seq = parents[seq]
+            return path
+        while seq != root_seq:
+            path.append(seq)
+            seq = parents[seq]
+        return path
+
+    # returns the nearest ancestor of seq (or seq itself) with one of the type codes or NO_NODE
+    def get_nearest(self, seq: int, type_codes: set):
+        depths = self.depths
+        nearest_seq = NO_NODE
+        for type_code in type_codes:
+            if type_code in self.nearest:
+                candidate = self.nearest[type_code][seq]
+                if candidate != NO_NODE and (nearest_seq == NO_NODE or depths[candidate] > depths[nearest_seq]):
+                    nearest_seq = candidate
+        return nearest_seq
+
+    def is_ancestor(self, ancestor: int, seq: int):
+        depth = self.depths[ancestor]
+        if depth > self.depths[seq]:
+            return False
+        return self.get_level_ancestor(seq, depth) == ancestor
+
+    # returns the ancestor of seq with the given depth
+    def get_level_ancestor(self, seq: int, depth: int):
+        parents = self.parents
+        depths = self.depths
+        jumps = self.jumps
+        while depths[seq] > depth:
+            if depths[jumps[seq]] >= depth:
+                seq = jumps[seq]
+            else:
+                seq = parents[seq]
+        return seq
+
+    # returns the k-th ancestor of seq (k=0 is seq itself) or NO_NODE if the path is shorter
+    def get_ancestor(self, seq: int, k: int):
+        if k < 0 or k >= self.depths[seq]:
+            return NO_NODE
+        return self.get_level_ancestor(seq, self.depths[seq] - k)
+
+    # returns the lowest common ancestor of two nodes or NO_NODE if they have different roots
+    def get_common_ancestor(self, seq1: int, seq2: int):
+        depth = min(self.depths[seq1], self.depths[seq2])
+        seq1 = self.get_level_ancestor(seq1, depth)
+        seq2 = self.get_level_ancestor(seq2, depth)
+        parents = self.parents
+        jumps = self.jumps
+        # jump targets of nodes with the same depth have the same depth
+        while seq1 != seq2:
+            if parents[seq1] == NO_NODE:
+                return NO_NODE
+            if jumps[seq1] != jumps[seq2]:
+                seq1 = jumps[seq1]
+                seq2 = jumps[seq2]
+            else:
+                seq1 = parents[seq1]
+                seq2 = parents[seq2]
+        return seq1
+
+
+# Project topologies (parent, type, version and timestamp of all nodes) persisted next to the packs.
+# Topologies of recently used projects are kept in memory.
+class GoosvcTopology:
+    def __init__(self, projects_dir: str, packs: GoosvcPacks):
+        self.projects_dir = projects_dir
+        self.packs = packs
+        self.resident_projects = DEFAULT_RESIDENT_PROJECTS
+        # loaded topologies by owner and project (least recently used first)
+        self.topologies = OrderedDict()
+        self.topologies_lock = threading.Lock()
+        # type names by owner and project (also needed for projects not in memory)
+        self.type_codes = {}
+        # serialize the assignment of new type codes by owner and project
+        self.type_locks = {}
+        # serializes writes to topology files
+        self.files_lock = threading.Lock()
+
+    # returns the topology of a project (loaded on first access) or None if the project does not exist
+    def get_topology(self, owner: str, project: str):
+        key = (owner, project)
+        while True:
+            topology = None
+            with self.topologies_lock:
+                if key in self.topologies:
+                    self.topologies.move_to_end(key)
+                    topology = self.topologies[key]
+            if topology == None:
+                nodes_dir = self.__get_nodes_dir(owner, project)
+                if not os.path.isdir(nodes_dir):
+                    return None
+                new_topology = GoosvcProjectTopology()
+                with self.topologies_lock:
+                    if key in self.topologies:
+                        topology = self.topologies[key]
+                    else:
+                        topology = new_topology
+                        self.topologies[key] = topology
+                        if len(self.topologies) > self.resident_projects:
+                            self.topologies.popitem(last=False)
+                if topology is new_topology:
+                    try:
+                        with topology.lock:
+                            self.__extend(owner, project, topology)
+                    except:
+                        # drop the partially loaded topology so the next access loads it again
+                        topology.failed = True
+                        with self.topologies_lock:
+                            if self.topologies.get(key) is topology:
+                                del self.topologies[key]
+                        raise
+                    finally:
+                        topology.loaded.set()
+            # wait until another thread has loaded the topology
+            topology.loaded.wait()
+            if not topology.failed:
+                return topology
+
+    # adds a node to the topology. must be called in the order the nodes are written to the pack
+    def append(self, owner: str, project: str, seq: int, parent_seq: int, type: str, version: int, timestamp: int):
+        self.append_nodes(owner, project, seq, [(parent_seq, type, version, timestamp)])
+
+    # adds nodes (parent sequence number, type, version and timestamp) written to the pack starting with sequence number seq
+    def append_nodes(self, owner: str, project: str, seq: int, nodes: list):
+        entries = []
+        for parent_seq, type, version, timestamp in nodes:
+            entries.append((parent_seq, self.__get_type_code(owner, project, type), version, timestamp))
+        records = b"".join(TOPOLOGY_RECORD.pack(*entry) for entry in entries)
+        if not self.__write(owner, project, seq, records):
+            return
+        with self.topologies_lock:
+            topology = self.topologies.get((owner, project))
+        if topology != None:
+            with topology.lock:
+                if topology.get_count() == seq:
+                    topology.type_codes = self.__get_type_codes(owner, project)
+                    for entry in entries:
+                        topology.append(*entry)
+                elif topology.get_count() < seq:
+                    # nodes written before (e.g. recovered) are missing in memory
+                    self.__extend(owner, project, topology)
+
+    # adds the nodes of the pack missing in the topology file (e.g. projects created by older versions or
+    # writes interrupted by a crash). caller must hold the project lock for writing
+    def repair(self, owner: str, project: str):
+        self.__write(owner, project, self.packs.get_count(owner, project), b"")
+        self.__extend_loaded(owner, project)
+
+    # adds the nodes written by another process to a loaded topology. nothing is written (see repair)
+    def refresh(self, owner: str, project: str):
+        with self.topologies_lock:
+            # the other process may have added types
+            if (owner, project) in self.type_codes:
+                del self.type_codes[(owner, project)]
+        self.__extend_loaded(owner, project)
+
+    # drops the topology of a project (used when the project is deleted)
+    def close_project(self, owner: str, project: str):
+        with self.topologies_lock:
+            if (owner, project) in self.topologies:
+                del self.topologies[(owner, project)]
+            if (owner, project) in self.type_codes:
+                del self.type_codes[(owner, project)]
+            if (owner, project) in self.type_locks:
+                del self.type_locks[(owner, project)]
+
+    def __extend_loaded(self, owner: str, project: str):
+        with self.topologies_lock:
+            topology = self.topologies.get((owner, project))
+        if topology != None and topology.loaded.is_set() and not topology.failed:
+            with topology.lock:
+                self.__extend(owner, project, topology)
+
+    # adds the records of the topology file after the last node in memory, then the nodes of the pack missing
+    # in the file. the files are not changed: another process may be writing to them
+    def __extend(self, owner: str, project: str, topology: GoosvcProjectTopology):
+        topology_file = os.path.join(self.__get_nodes_dir(owner, project), TOPOLOGY_FILE)
+        if os.path.exists(topology_file):
+            with open(topology_file, 'rb') as f:
+                f.seek(topology.get_count() * TOPOLOGY_RECORD.size)
+                data = f.read()
+            # an incomplete record at the end (interrupted write) is ignored
+            valid_size = len(data) - len(data) % TOPOLOGY_RECORD.size
+            for parent, type_code, version, timestamp in TOPOLOGY_RECORD.iter_unpack(data[:valid_size]):
+                topology.append(parent, type_code, version, timestamp)
+        for entry in self.__read_pack(owner, project, topology.get_count(), False):
+            topology.append(*entry)
+        topology.type_codes = self.__get_type_codes(owner, project)
+
+    # returns the topology entries of the nodes in the pack starting with sequence number start.
+    # without assign, it stops at the first node with a type not in the types file (written before the node
+    # by a writer, so the node is not complete yet)
+    def __read_pack(self, owner: str, project: str, start: int, assign: bool):
+        entries = []
+        count = self.packs.get_count(owner, project)
+        if start >= count:
+            return entries
+        for record in self.packs.scan(owner, project, start):
+            node = json.loads(record)
+            parent_seq = NO_NODE
+            if node["parent_id"] != None:
+                parent_seq = self.packs.get_seq(owner, project, node["parent_id"])
+                if parent_seq == None:
+                    parent_seq = NO_NODE
+            if assign:
+                type_code = self.__get_type_code(owner, project, node["type"])
+            else:
+                type_code = self.__find_type_code(owner, project, node["type"])
+                if type_code == None:
+                    break
+            entries.append((parent_seq, type_code, node["version"], node["timestamp"]))
+            if start + len(entries) >= count:
+                break
+        return entries
+
+    # appends records starting with sequence number seq to the topology file. nodes of the pack missing in the file
+    # before seq are written first. returns False if the file does not end at seq. caller must hold the project lock for writing
+    def __write(self, owner: str, project: str, seq: int, records: bytes):
+        with self.files_lock:
+            with open(os.path.join(self.__get_nodes_dir(owner, project), TOPOLOGY_FILE), 'ab') as f:
+                size = f.seek(0, os.SEEK_END)
+                count = size // TOPOLOGY_RECORD.size
+                if count * TOPOLOGY_RECORD.size < size:
+                    # incomplete record at the end (interrupted write)
+                    f.truncate(count * TOPOLOGY_RECORD.size)
+                if count < seq:
+                    missing = self.__read_pack(owner, project, count, True)[:seq - count]
+                    f.write(b"".join(TOPOLOGY_RECORD.pack(*entry) for entry in missing))
+                    count += len(missing)
+                if count != seq:
+                    return False
+                f.write(records)
+        return True
+
+    def __get_type_codes(self, owner: str, project: str):
+        key = (owner, project)
+        if not key in self.type_codes:
+            self.type_codes[key] = self.__read_type_codes(owner, project)
+        return self.type_codes[key]
+
+    def __read_type_codes(self, owner: str, project: str):
+        types_file = os.path.join(self.__get_nodes_dir(owner, project), TOPOLOGY_TYPES_FILE)
+        type_codes = {}
+        if os.path.exists(types_file):
+            with open(types_file, 'r') as f:
+                for type_code, type in enumerate(json.load(f)):
+                    type_codes[type] = type_code
+        return type_codes
+
+    # returns the code of a type or None if the type has no code yet (codes are only assigned by writers)
+    def __find_type_code(self, owner: str, project: str, type: str):
+        type_codes = self.__get_type_codes(owner, project)
+        if not type in type_codes:
+            # the type may have been added by another process
+            type_codes = self.__read_type_codes(owner, project)
+            self.type_codes[(owner, project)] = type_codes
+        if type in type_codes:
+            return type_codes[type]
+        if len(type_codes) >= TYPE_OTHER:
+            return TYPE_OTHER
+        return None
+
+    def __get_type_code(self, owner: str, project: str, type: str):
+        type_codes = self.__get_type_codes(owner, project)
+        if type in type_codes:
+            return type_codes[type]
+        with self.__get_type_lock(owner, project):
+            # the type may have been added by another thread or process in the meantime
+            type_codes = self.__read_type_codes(owner, project)
+            if not type in type_codes and len(type_codes) < TYPE_OTHER:
+                type_codes[type] = len(type_codes)
+                types_file = os.path.join(self.__get_nodes_dir(owner, project), TOPOLOGY_TYPES_FILE)
+                common.write_file(types_file, json.dumps(list(type_codes.keys())))
+            self.type_codes[(owner, project)] = type_codes
+            return type_codes.get(type, TYPE_OTHER)
+
+    def __get_type_lock(self, owner: str, project: str):
+        with self.topologies_lock:
+            if not (owner, project) in self.type_locks:
+                self.type_locks[(owner, project)] = threading.Lock()
+            return self.type_locks[(owner, project)]
+
+    def __get_nodes_dir(self, owner: str, project: str):
+        return os.path.join(common.get_project_dir(self.projects_dir, owner, project), "nodes")
@@ -0,0 +1,231 @@
+import os
+import json
+import time
+import zlib
+import threading
+from goosvc.core import common as common
+from goosvc.core.exceptions import GoosvcException
+
+DURABILITY_NONE = "none" # log is never synced to disk (survives process crashes, not system crashes)
+DURABILITY_BATCHED = "batched" # log is synced by a background thread within the sync interval. writers do not wait for the sync
+DURABILITY_EVERY = "every" # entries are synced before the write is applied. concurrent writers share a single sync (group commit)
+
+DEFAULT_WAL_DURABILITY = DURABILITY_BATCHED
+DEFAULT_WAL_SYNC_INTERVAL = 0.05 # seconds between syncs (durability batched)
+DEFAULT_WAL_CHECKPOINT_SIZE = 4 * 1024 * 1024 # bytes. the log is checkpointed when it grows beyond this size
+WAL_FILE = "wal.log"
+WAL_FLUSHER_IDLE_TIME = 1.0 # seconds without commits before the background sync thread stops (started again by the next commit)
+
+
+# Log of a single project. Positions are counted in bytes ever written to the log
+# (also across checkpoints), so a writer can wait for its position to be synced.
+class GoosvcProjectWal:
+    def __init__(self, wal_file: str):
+        self.wal_file = wal_file
+        self.lock = threading.Lock() # protects writes to the log
+        self.sync_lock = threading.Lock() # held by the writer syncing the log (leader)
+        self.file = open(wal_file, 'ab')
+        self.size = self.file.tell() # current size of the log file
+        self.written = self.size # position after the last entry
+        self.synced = self.size # position up to which the log is synced
+        self.last_sync = time.monotonic()
+
+    # waits for a sync in progress (the file must stay open until the sync is done)
+    def close(self):
+        with self.sync_lock:
+            with self.lock:
+                self.file.close()
+
+    def is_closed(self):
+        return self.file.closed
+
+
+# Write-ahead log: every write is logged (one line per entry: crc32 and json) before the project files are changed.
+# Entries not applied completely (e.g. after a crash) are applied again on the next access to the project.
+class GoosvcWal:
+    def __init__(self, projects_dir: str):
+        self.projects_dir = projects_dir
+        self.durability = DEFAULT_WAL_DURABILITY
+        self.sync_interval = DEFAULT_WAL_SYNC_INTERVAL
+        self.checkpoint_size = DEFAULT_WAL_CHECKPOINT_SIZE
+        # open logs by owner and project
+        self.wals = {}
+        self.wals_lock = threading.Lock()
+        # logs with entries waiting for the background sync (durability batched). the flusher thread is started on the first commit
+        self.pending = set()
+        self.flush_condition = threading.Condition()
+        self.flusher = None
+        self.last_flush = time.monotonic()
+
+    # appends an entry (json serializable) to the log. returns the position to commit (see commit).
+    # with durability every, the entry is synced before append returns: the project files are only changed
+    # after their log entry is on disk, so writes are atomic also after a system crash
+    def append(self, owner: str, project: str, entry: dict):
+        wal = self.__get_wal(owner, project)
+        if wal == None:
+            raise GoosvcException("1001")
+        data = json.dumps(entry).encode()
+        line = format(zlib.crc32(data), "08x").encode() + b" " + data + b"\n"
+        with wal.lock:
+            wal.file.write(line)
+            wal.file.flush()
+            wal.size += len(line)
+            wal.written += len(line)
+            position = wal.written
+        if self.durability == DURABILITY_EVERY:
+            self.__sync(wal, position)
+        return position
+
+    # makes an appended entry durable according to the durability level.
+    # should be called after releasing the project lock so other writers can log their entries meanwhile
+    def commit(self, owner: str, project: str, position: int):
+        if self.durability == DURABILITY_NONE:
+            return
+        wal = self.__get_wal(owner, project)
+        if wal == None:
+            return
+        if self.durability == DURABILITY_BATCHED:
+            with self.flush_condition:
+                self.pending.add(wal)
+                if self.flusher == None:
+                    self.flusher = threading.Thread(target=self.__flush, name="goosvc-wal", daemon=True)
+                    self.flusher.start()
+                self.flush_condition.notify()
+            return
+        self.__sync(wal, position)
+
+    # returns all entries of the log. an incomplete or damaged entry at the end is removed
+    def read(self, owner: str, project: str):
+        wal = self.__get_wal(owner, project)
+        if wal == None:
+            return []
+        entries = []
+        with wal.lock:
+            with open(wal.wal_file, 'rb') as f:
+                data = f.read()
+            valid_size = 0
+            for line in data.split(b"\n")[:-1]:
+                crc, _, entry = line.partition(b" ")
+                if format(zlib.crc32(entry), "08x").encode() != crc:
+                    break
+                entries.append(json.loads(entry))
+                valid_size += len(line) + 1
+            if valid_size < len(data):
+                wal.file.truncate(valid_size)
+                wal.written -= wal.size - valid_size
+                wal.size = valid_size
+        return entries
+
+    # true if the log should be checkpointed (see truncate)
+    def needs_checkpoint(self, owner: str, project: str):
+        wal = self.__get_wal(owner, project)
+        return wal != None and wal.size > self.checkpoint_size
+
+    # removes all entries. must only be called when all entries are applied (and synced to disk)
+    def truncate(self, owner: str, project: str):
+        wal = self.__get_wal(owner, project)
+        if wal == None:
+            return
+        with wal.lock:
+            wal.file.truncate(0)
+            wal.size = 0
+            # everything written so far is in the (synced) project files
+            wal.synced = wal.written
+
+    # removes an incomplete entry at the end of the log (e.g. written by a crashed process) so the next entry
+    # starts on a new line. caller must hold the project lock for writing
+    def repair(self, owner: str, project: str):
+        wal = self.__get_wal(owner, project)
+        if wal == None:
+            return
+        with wal.lock:
+            size = os.fstat(wal.file.fileno()).st_size
+            if size == 0:
+                return
+            with open(wal.wal_file, 'rb') as f:
+                f.seek(size - 1)
+                if f.read(1) == b"\n":
+                    return
+                f.seek(0)
+                valid_size = f.read().rfind(b"\n") + 1
+            wal.file.truncate(valid_size)
+            wal.written -= size - valid_size
+            wal.size = valid_size
+
+    # updates the size of the log after another process wrote to it
+    def refresh(self, owner: str, project: str):
+        wal = self.__get_wal(owner, project)
+        if wal == None:
+            return
+        with wal.lock:
+            size = os.fstat(wal.file.fileno()).st_size
+            if size > wal.size:
+                wal.written += size - wal.size
+            wal.size = size
+
+    # closes the log of a project (used when the project is deleted). logged entries are synced first
+    def close_project(self, owner: str, project: str):
+        with self.wals_lock:
+            wal = self.wals.pop((owner, project), None)
+        if wal != None:
+            self.__close_wal(wal)
+
+    # syncs and closes all logs (e.g. before the process exits: the background sync is not waited for)
+    def close(self):
+        with self.wals_lock:
+            wals = list(self.wals.values())
+            self.wals.clear()
+        for wal in wals:
+            self.__close_wal(wal)
+
+    def __close_wal(self, wal: GoosvcProjectWal):
+        with self.flush_condition:
+            self.pending.discard(wal)
+        if self.durability != DURABILITY_NONE:
+            self.__sync(wal, wal.written)
+        wal.close()
+
+    # background sync of the logs (durability batched). entries are synced within the sync interval after their commit,
+    # all entries committed during an interval share a single sync per log
+    def __flush(self):
+        while True:
+            with self.flush_condition:
+                if not self.flush_condition.wait_for(lambda: len(self.pending) > 0, WAL_FLUSHER_IDLE_TIME):
+                    self.flusher = None
+                    return
+            time.sleep(max(0, self.last_flush + self.sync_interval - time.monotonic()))
+            with self.flush_condition:
+                wals = list(self.pending)
+                self.pending.clear()
+            self.last_flush = time.monotonic()
+            for wal in wals:
+                self.__sync(wal, wal.written)
+
+    # syncs the log up to position. the first waiting writer syncs the log for all writers waiting (leader),
+    # the others find their position synced when they get the sync lock
+    def __sync(self, wal: GoosvcProjectWal, position: int):
+        with wal.sync_lock:
+            if wal.synced >= position:
+                return
+            with wal.lock:
+                if wal.is_closed():
+                    return
+                target = wal.written
+                fd = wal.file.fileno()
+            os.fsync(fd)
+            wal.synced = max(wal.synced, target)
+            wal.last_sync = time.monotonic()
+
+    # returns the log of a project (opened on first access) or None if the project does not exist
+    def __get_wal(self, owner: str, project: str):
+        key = (owner, project)
+        wal = self.wals.get(key)
+        if wal != None:
+            return wal
+        with self.wals_lock:
+            if not key in self.wals:
+                project_dir = common.get_project_dir(self.projects_dir, owner, project)
+                if not os.path.isdir(project_dir):
+                    return None
+                self.wals[key] = GoosvcProjectWal(os.path.join(project_dir, WAL_FILE))
+            return self.wals[key]
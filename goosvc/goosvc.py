@@ -10,8 +10,14 @@ class Goosvc:
     def __init__(self, base_dir: str = DEFAULT_BASE_DIR):
         self.core = core.GoosvcCore(base_dir)
 
+    # every facade function checks the permission of the requester once, so there is no per-request memo:
+    # the compiled permission table of the project (see GoosvcProjects.get_access) is shared by all requests
     def permission(self, owner, project_name, user):
-        return self.core.projects.get_access_permission(owner, project_name, user)
+        return self.core.projects.get_access(owner, project_name, user)
+
+    # syncs pending writes to disk. call before the process exits
+    def close(self):
+        self.core.close()
     
     # ----------------
     # Info functions
@@ -32,6 +38,18 @@ class Goosvc:
         else:
             return self.core.projects.get_project_names(owner)
 
+    # returns a page of project names (sorted) and the cursor of the next page (None on the last page)
+    def get_project_names_page(self, owner, limit: int = projects.DEFAULT_PROJECTS_PAGE_SIZE, cursor: str = None, requester: str = "app"):
+        public_only = requester != "app" and requester != owner
+        return self.core.projects.get_project_names_page(owner, public_only, limit, cursor)
+
+    # returns the number of projects of an owner visible to the requester
+    def get_project_count(self, owner, requester: str = "app"):
+        count = self.core.projects.get_project_count(owner)
+        if requester != "app" and requester != owner:
+            return count["public"]
+        return count["projects"]
+
     def create_project(self, owner: str, project: str, project_description: str = "", requester: str = "app"):
         if requester != "app" and requester != owner:
             raise GoosvcException("1004")
@@ -149,6 +167,11 @@ class Goosvc:
         if self.permission(owner, project, requester).write:
             return self.core.nodes.add_node(owner, project, node)
         raise GoosvcException("1009")
+    
+    def add_nodes(self, owner: str, project: str, parent_id: str, nodes: list[nodes.GoosvcNode], requester: str = "app"):
+        if self.permission(owner, project, requester).write:
+            return self.core.nodes.add_nodes(owner, project, parent_id, nodes)
+        raise GoosvcException("1009")
 
     def get_node(self, owner: str, project: str, node_id: str, requester: str = "app"):
         if self.permission(owner, project, requester).read:
@@ -163,11 +186,31 @@ class Goosvc:
             return self.core.nodes.get_path(owner, project, id, type, root_id)
         raise GoosvcException("1002")
     
+    # returns the node ids of a path (see get_path) without loading the nodes
+    def get_path_ids(self, owner: str, project: str, id: str, type: list[str] = [], root_id: str = None, requester: str = "app"):
+        if self.permission(owner, project, requester).read:
+            node_ids = self.core.nodes.get_path_ids(owner, project, id, type, root_id)
+            if node_ids == None:
+                # path can not be resolved from the topology
+                node_ids = [node.node_id for node in self.core.nodes.get_path(owner, project, id, type, root_id)]
+            return node_ids
+        raise GoosvcException("1002")
+    
     def get_nodes(self, owner: str, project: str, requester: str = "app"):
         if self.permission(owner, project, requester).read:
             return self.core.nodes.get_nodes(owner, project)
         raise GoosvcException("1002")
     
+    def get_nodes_page(self, owner: str, project: str, limit: int = nodes.DEFAULT_NODES_PAGE_SIZE, cursor: str = None, type: list[str] = [], author: str = None, start_time: int = None, end_time: int = None, transaction_id: str = None, requester: str = "app"):
+        if self.permission(owner, project, requester).read:
+            return self.core.nodes.get_nodes_page(owner, project, limit, cursor, type, author, start_time, end_time, transaction_id)
+        raise GoosvcException("1002")
+    
+    def iter_nodes(self, owner: str, project: str, type: list[str] = [], author: str = None, start_time: int = None, end_time: int = None, transaction_id: str = None, cursor: str = None, requester: str = "app"):
+        if self.permission(owner, project, requester).read:
+            return self.core.nodes.iter_nodes(owner, project, type, author, start_time, end_time, transaction_id, cursor)
+        raise GoosvcException("1002")
+    
     # ----------------
     # Artifact functions
     # ----------------
@@ -259,9 +302,14 @@ class Goosvc:
             return self.core.messages.add_message(owner, project, id, message)
         raise GoosvcException("1009")
     
-    def get_message_nodes(self, owner: str, project: str, chat_id: str, node_id: str, requester: str = "app"):
+    def get_message_nodes(self, owner: str, project: str, chat_id: str, node_id: str, requester: str = "app", limit: int = None, before: str = None, after: str = None):
         if self.permission(owner, project, requester).read:
-            return self.core.messages.get_message_nodes(owner, project, chat_id, node_id)
+            return self.core.messages.get_message_nodes(owner, project, chat_id, node_id, limit, before, after)
+        raise GoosvcException("1002")
+
+    def iter_message_nodes(self, owner: str, project: str, chat_id: str, node_id: str, requester: str = "app", before: str = None):
+        if self.permission(owner, project, requester).read:
+            return self.core.messages.iter_message_nodes(owner, project, chat_id, node_id, before)
         raise GoosvcException("1002")
     
     def get_last_message_node(self, owner: str, project: str, chat_id: str, id: str, requester: str = "app"):
@@ -269,9 +317,14 @@ class Goosvc:
             return self.core.messages.get_last_message_node(owner, project, chat_id, id)
         raise GoosvcException("1002")
     
-    def get_messages(self, owner: str, project: str, chat_id: str, node_id: str, requester: str = "app"):
+    def get_messages(self, owner: str, project: str, chat_id: str, node_id: str, requester: str = "app", limit: int = None, before: str = None, after: str = None):
+        if self.permission(owner, project, requester).read:
+            return self.core.messages.get_messages(owner, project, chat_id, node_id, limit, before, after)
+        raise GoosvcException("1002")
+
+    def get_messages_page(self, owner: str, project: str, chat_id: str, node_id: str, limit: int = messages.DEFAULT_MESSAGES_PAGE_SIZE, cursor: str = None, requester: str = "app"):
         if self.permission(owner, project, requester).read:
-            return self.core.messages.get_messages(owner, project, chat_id, node_id)
+            return self.core.messages.get_messages_page(owner, project, chat_id, node_id, limit, cursor)
         raise GoosvcException("1002")
     
     def get_message(self, owner: str, project: str, node_id: str, requester: str = "app"):
@@ -0,0 +1,68 @@
+import unittest
+import asyncio
+import threading
+from goosvc.core import chats, messages, nodes
+from goosvc.asyncgoosvc import AsyncGoosvc
+
+USER_NAME = "test_user"
+PROJECT_NAME = "unittest_test_asyncgoosvc"
+TEST_TYPE1 = "test-type-1"
+
+
+class TestAsyncGoosvc(unittest.TestCase):
+
+    def setUp(self):
+        self.gvc = AsyncGoosvc("data-test", 4)
+        asyncio.run(self.gvc.create_project(USER_NAME, PROJECT_NAME))
+
+    def tearDown(self):
+        asyncio.run(self.gvc.delete_project(USER_NAME, PROJECT_NAME))
+        self.gvc.close()
+
+    def test_concurrent_sessions(self):
+        async def session(root_id, i):
+            node = nodes.GoosvcNode(TEST_TYPE1, root_id, USER_NAME, "test content " + str(i))
+            _, node_id = await self.gvc.add_node(USER_NAME, PROJECT_NAME, node)
+            path = await self.gvc.get_path(USER_NAME, PROJECT_NAME, node_id)
+            return [node.content for node in path]
+        async def run():
+            node = nodes.GoosvcNode(TEST_TYPE1, None, USER_NAME, "root")
+            _, root_id = await self.gvc.add_node(USER_NAME, PROJECT_NAME, node)
+            # more sessions than worker threads
+            paths = await asyncio.gather(*[session(root_id, i) for i in range(200)])
+            nodes_list = [node async for node in self.gvc.iter_nodes(USER_NAME, PROJECT_NAME)]
+            return paths, nodes_list
+        paths, nodes_list = asyncio.run(run())
+        for i, path in enumerate(paths):
+            self.assertEqual(path, ["test content " + str(i), "root"])
+        self.assertEqual(len(nodes_list), 201)
+
+    def test_cancel(self):
+        node = nodes.GoosvcNode(TEST_TYPE1, None, USER_NAME, "root")
+        _, root_id = asyncio.run(self.gvc.add_node(USER_NAME, PROJECT_NAME, node))
+        blocker = threading.Event()
+        async def run():
+            # occupy all workers, so the following calls are queued
+            blocked = [asyncio.get_running_loop().run_in_executor(self.gvc.executor, blocker.wait) for i in range(4)]
+            node = nodes.GoosvcNode(TEST_TYPE1, root_id, USER_NAME, "cancelled")
+            task = asyncio.ensure_future(self.gvc.add_node(USER_NAME, PROJECT_NAME, node))
+            await asyncio.sleep(0.1)
+            task.cancel()
+            await asyncio.sleep(0.1)
+            blocker.set()
+            await asyncio.gather(*blocked)
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            return await self.gvc.get_nodes(USER_NAME, PROJECT_NAME)
+        self.assertEqual(len(asyncio.run(run())), 1)
+
+    def test_iter_message_nodes(self):
+        async def run():
+            chat = chats.GoosvcChat(USER_NAME, "chat")
+            branch_id, _, chat_id = await self.gvc.create_chat(USER_NAME, PROJECT_NAME, None, chat)
+            for i in range(messages.DEFAULT_MESSAGES_PAGE_SIZE + 5):
+                message = messages.GoosvcMessage(USER_NAME, "Request " + str(i), "...", chat_id)
+                branch_id, _ = await self.gvc.add_message(USER_NAME, PROJECT_NAME, branch_id, message)
+            return [message_node.content["request"] async for message_node in self.gvc.iter_message_nodes(USER_NAME, PROJECT_NAME, chat_id, branch_id)]
+        requests = asyncio.run(run())
+        self.assertEqual(requests, ["Request " + str(i) for i in reversed(range(messages.DEFAULT_MESSAGES_PAGE_SIZE + 5))])
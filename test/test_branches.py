@@ -1,6 +1,7 @@
 import unittest
+import os
 from goosvc.goosvc import Goosvc
-from goosvc.core.branches import BranchGroup
+from goosvc.core.branches import BranchGroup, HEAD_LOG_FILE, HEAD_SNAPSHOT_FILE
 
 USER_NAME = "test_user"
 PROJECT_NAME = "unittest_test_nodes"
@@ -103,4 +104,47 @@ class TestBranches(unittest.TestCase):
         self.assertIn(branch_id2, group_content.branch_ids)
         self.assertIn(branch_id3, group_content.branch_ids)
         self.assertEqual(group_content.group_id, group_id)
-        self.assertEqual(group_content.description, "test_group_5")
\ No newline at end of file
+        self.assertEqual(group_content.description, "test_group_5")
+
+    def test_head_index(self):
+        branch_id = self.branches.create_branch(USER_NAME,PROJECT_NAME,NODE1_ID)
+        branch_id2 = self.branches.create_branch(USER_NAME,PROJECT_NAME,NODE2_ID)
+        # new instance: index is loaded from the branch files
+        gvc = Goosvc("data-test")
+        branches = gvc.core.branches
+        self.assertEqual(branches.get_branch_of_node(USER_NAME,PROJECT_NAME,NODE1_ID), branch_id)
+        self.assertEqual(branches.get_branch_of_node(USER_NAME,PROJECT_NAME,NODE2_ID), branch_id2)
+        # index follows head updates
+        branches.update_branch_head(USER_NAME,PROJECT_NAME,branch_id,NODE3_ID)
+        self.assertIsNone(branches.get_branch_of_node(USER_NAME,PROJECT_NAME,NODE1_ID))
+        self.assertEqual(branches.get_branch_of_node(USER_NAME,PROJECT_NAME,NODE3_ID), branch_id)
+        branch_id3 = branches.create_branch(USER_NAME,PROJECT_NAME,NODE1_ID)
+        self.assertEqual(branches.get_branch_of_node(USER_NAME,PROJECT_NAME,NODE1_ID), branch_id3)
+
+    def test_registry(self):
+        branch_id = self.branches.create_branch(USER_NAME,PROJECT_NAME,NODE1_ID)
+        self.branches.update_branch_head(USER_NAME,PROJECT_NAME,branch_id,NODE2_ID)
+        branches_dir = os.path.join(self.gvc.core.projects_dir, USER_NAME, PROJECT_NAME, "branches")
+        # incomplete update at the end of the log (e.g. after a crash)
+        with open(os.path.join(branches_dir, HEAD_LOG_FILE), 'ab') as f:
+            f.write(branch_id.encode() + b" 2f94fa")
+        branches = Goosvc("data-test").core.branches
+        self.assertEqual(branches.get_branches(USER_NAME,PROJECT_NAME), [branch_id])
+        self.assertEqual(branches.get_branch_head(USER_NAME,PROJECT_NAME,branch_id), NODE2_ID)
+        # log is written to a snapshot when full
+        branches.head_log_size = 3
+        branch_id2 = branches.create_branch(USER_NAME,PROJECT_NAME,NODE3_ID)
+        self.assertEqual(os.path.getsize(os.path.join(branches_dir, HEAD_LOG_FILE)), 0)
+        branches = Goosvc("data-test").core.branches
+        self.assertEqual(branches.get_heads(USER_NAME,PROJECT_NAME), [NODE2_ID, NODE3_ID])
+        self.assertEqual(branches.get_branch_of_node(USER_NAME,PROJECT_NAME,NODE3_ID), branch_id2)
+
+    def test_registry_migration(self):
+        # project created with one file per branch
+        branches_dir = os.path.join(self.gvc.core.projects_dir, USER_NAME, PROJECT_NAME, "branches")
+        branch_id = "dd55f0bd055641feac1f9d95f80e5a3f"
+        with open(os.path.join(branches_dir, branch_id + ".json"), 'w') as f:
+            f.write(NODE1_ID)
+        branches = Goosvc("data-test").core.branches
+        self.assertEqual(branches.get_branch_head(USER_NAME,PROJECT_NAME,branch_id), NODE1_ID)
+        self.assertEqual(sorted(os.listdir(branches_dir)), sorted([HEAD_LOG_FILE, HEAD_SNAPSHOT_FILE]))
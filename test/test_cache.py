@@ -1,6 +1,7 @@
 import unittest
 import time
 from goosvc.core.nodes import GoosvcNode
+from goosvc.core import cache
 from goosvc.goosvc import Goosvc
 
 USER_NAME = "test_user"
@@ -61,6 +62,120 @@ class TestCache(unittest.TestCase):
         # total ratio: 3.580302517803511
         # cache read ratio per path: 0.002580302517803511
 
+    def test_node_cache(self):
+        branch_id = self.add_nodes(10)
+        node_cache = self.gvc.core.node_cache
+        node_cache.clear()
+        head = self.nodes.get_node(USER_NAME, PROJECT_NAME, branch_id)
+        stats = node_cache.get_stats()
+        self.nodes.get_node(USER_NAME, PROJECT_NAME, head.node_id)
+        self.nodes.get_node(USER_NAME, PROJECT_NAME, head.node_id)
+        self.assertEqual(node_cache.get_stats()["hits"], stats["hits"] + 2)
+        stats = node_cache.get_stats(USER_NAME, PROJECT_NAME)
+        self.assertEqual(stats["project_entries"], 1)
+        self.assertGreater(stats["project_size"], 0)
+        # deleted projects are removed from the cache
+        self.gvc.delete_project(USER_NAME, PROJECT_NAME)
+        self.assertEqual(node_cache.get_stats(USER_NAME, PROJECT_NAME)["project_entries"], 0)
+        self.gvc.create_project(USER_NAME, PROJECT_NAME)
+
+    def test_lru_cache(self):
+        lru_cache = cache.GoosvcLruCache(1000)
+        for i in range(10):
+            lru_cache.put("owner1", "project1", str(i), i, 100)
+        # least recently used entry is evicted
+        lru_cache.get("owner1", "project1", "0")
+        lru_cache.put("owner1", "project1", "10", 10, 100)
+        self.assertEqual(lru_cache.get("owner1", "project1", "0"), 0)
+        self.assertIsNone(lru_cache.get("owner1", "project1", "1"))
+        self.assertEqual(lru_cache.get_stats()["size"], 1000)
+        # a second project gets its fair share
+        for i in range(10):
+            lru_cache.put("owner2", "project2", str(i), i, 100)
+        stats1 = lru_cache.get_stats("owner1", "project1")
+        stats2 = lru_cache.get_stats("owner2", "project2")
+        self.assertEqual(stats1["project_size"], 500)
+        self.assertEqual(stats2["project_size"], 500)
+        # a project above its share evicts its own entries
+        lru_cache.get("owner1", "project1", "10")
+        lru_cache.put("owner2", "project2", "10", 10, 100)
+        self.assertEqual(lru_cache.get_stats("owner1", "project1")["project_size"], 500)
+        self.assertEqual(lru_cache.get("owner2", "project2", "9"), 9)
+        self.assertIsNone(lru_cache.get("owner2", "project2", "5"))
+        stats = lru_cache.get_stats()
+        self.assertEqual(stats["evictions"], 12)
+        self.assertEqual(stats["misses"], 2)
+        lru_cache.remove_project("owner1", "project1")
+        self.assertEqual(lru_cache.get_stats()["size"], 500)
+
+    def test_path_cache(self):
+        path_cache = self.gvc.core.path_cache
+        branch_id = self.add_nodes(100)
+        head = self.nodes.get_node(USER_NAME, PROJECT_NAME, branch_id)
+        # 50 branches starting at the head of the first branch
+        branch_ids = []
+        for i in range(50):
+            node = GoosvcNode(TEST_TYPE1, head.node_id, USER_NAME, "branch content " + str(i))
+            new_branch_id, _ = self.gvc.add_node(USER_NAME, PROJECT_NAME, node)
+            branch_ids.append(new_branch_id)
+        path_cache.clear()
+        for new_branch_id in branch_ids:
+            path = self.nodes.get_path(USER_NAME, PROJECT_NAME, new_branch_id)
+            self.assertEqual(len(path), 102)
+        # shared ancestors are cached once
+        self.assertEqual(path_cache.size, 101 + 50)
+        cached_path = path_cache.get_path(USER_NAME, PROJECT_NAME, path[0].node_id)
+        self.assertEqual(cached_path, [node.node_id for node in path])
+        # partial path from the cache
+        path = self.nodes.get_path(USER_NAME, PROJECT_NAME, branch_ids[0], [], path[50].node_id)
+        self.assertEqual(len(path), 50)
+        # cached paths hold node ids only. the nodes are taken from the node cache and count against its byte budget
+        node_cache = self.gvc.core.node_cache
+        node_cache.clear()
+        path = self.nodes.get_path(USER_NAME, PROJECT_NAME, branch_ids[0])
+        self.assertEqual(len(path), 102)
+        self.assertEqual(node_cache.get_stats(USER_NAME, PROJECT_NAME)["project_entries"], 102)
+        # least recently used leaf segments are evicted first
+        path_cache.max_size = 101 + 10
+        node = GoosvcNode(TEST_TYPE1, head.node_id, USER_NAME, "branch content 50")
+        new_branch_id, node_id = self.gvc.add_node(USER_NAME, PROJECT_NAME, node)
+        self.nodes.get_path(USER_NAME, PROJECT_NAME, new_branch_id)
+        self.assertEqual(path_cache.size, 101 + 10)
+        self.assertTrue(path_cache.contains(USER_NAME, PROJECT_NAME, node_id))
+        self.assertTrue(path_cache.contains(USER_NAME, PROJECT_NAME, path[0].node_id))
+        self.assertTrue(path_cache.contains(USER_NAME, PROJECT_NAME, head.node_id))
+        self.assertFalse(path_cache.contains(USER_NAME, PROJECT_NAME, self.nodes.get_node(USER_NAME, PROJECT_NAME, branch_ids[1]).node_id))
+
+    def test_path_cache_append(self):
+        branch_id = self.add_nodes(100)
+        self.gvc.core.path_cache.clear()
+        self.nodes.get_path(USER_NAME, PROJECT_NAME, branch_id)
+        # count reads from the pack
+        packs = self.gvc.core.packs
+        reads = []
+        read, read_window = packs.read, packs.read_window
+        def count_read(owner, project, node_id):
+            record = read(owner, project, node_id)
+            if record != None:
+                reads.append(node_id)
+            return record
+        packs.read = count_read
+        packs.read_window = lambda owner, project, node_id: reads.append(node_id) or read_window(owner, project, node_id)
+        # paths of new heads are read from the cache (read after write)
+        for i in range(10):
+            node = GoosvcNode(TEST_TYPE1, branch_id, USER_NAME, "new content " + str(i))
+            self.gvc.add_node(USER_NAME, PROJECT_NAME, node)
+            path = self.nodes.get_path(USER_NAME, PROJECT_NAME, branch_id)
+            self.assertEqual(len(path), 102 + i)
+            self.assertEqual(path[0].content, "new content " + str(i))
+        # new branch from the middle of a cached path
+        node = GoosvcNode(TEST_TYPE1, path[50].node_id, USER_NAME, "branch content")
+        new_branch_id, _ = self.gvc.add_node(USER_NAME, PROJECT_NAME, node)
+        path = self.nodes.get_path(USER_NAME, PROJECT_NAME, new_branch_id)
+        self.assertEqual(len(path), 62)
+        self.assertEqual(len(reads), 0)
+        packs.read, packs.read_window = read, read_window
+
     def add_nodes(self, count):
         node = GoosvcNode(TEST_TYPE1, None, USER_NAME, "test content 0")
         branch_id, node_id = self.gvc.add_node(USER_NAME,PROJECT_NAME,node)
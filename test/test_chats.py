@@ -1,6 +1,7 @@
 import unittest
-from goosvc.core import chats, messages
+from goosvc.core import chats, messages, nodes
 from goosvc.goosvc import Goosvc
+from goosvc.core.exceptions import GoosvcException
 
 
 USER_NAME = "test_user"
@@ -188,6 +189,111 @@ class TestChats(unittest.TestCase):
         self.assertEqual(messagesC[3]['request'], "Request C2")
         self.assertEqual(messagesC[4]['request'], "Request C3")
     
+    def test_chat_exists(self):
+        branch_id, chat1_id, chat2_id = self.create_two_chats(None)
+        chat1_node_id = self.gvc.core.chats.get_chat_node(USER_NAME, PROJECT_NAME, chat1_id, branch_id).node_id
+        message = messages.GoosvcMessage(USER_NAME, QUESTION1, RESPONSE1, chat1_id)
+        _, node_id = self.gvc.add_message(USER_NAME, PROJECT_NAME, branch_id, message)
+        self.assertEqual(self.gvc.core.chats.get_chat_ids(USER_NAME, PROJECT_NAME, node_id), {chat1_id, chat2_id})
+        self.assertTrue(self.gvc.core.chats.chat_exists(USER_NAME, PROJECT_NAME, branch_id, chat2_id))
+        # second chat is not visible from the first chat node
+        self.assertTrue(self.gvc.core.chats.chat_exists(USER_NAME, PROJECT_NAME, chat1_node_id, chat1_id))
+        self.assertFalse(self.gvc.core.chats.chat_exists(USER_NAME, PROJECT_NAME, chat1_node_id, chat2_id))
+        self.assertFalse(self.gvc.core.chats.chat_exists(USER_NAME, PROJECT_NAME, branch_id, "unknown"))
+        # chat nodes are registered again from the nodes (e.g. after a restart)
+        gvc = Goosvc("data-test")
+        self.assertTrue(gvc.core.chats.chat_exists(USER_NAME, PROJECT_NAME, node_id, chat1_id))
+        registry = gvc.core.chats.registries[(USER_NAME, PROJECT_NAME)]
+        self.assertEqual(len(registry.entries), 2)
+        # the entry of the second chat node links to the entry of the first one
+        chat2_node_id = gvc.core.chats.get_chat_node_id(USER_NAME, PROJECT_NAME, chat2_id, node_id)
+        self.assertIs(registry.entries[chat2_node_id].parent, registry.entries[chat1_node_id])
+        # remembered lookups are bounded. a dropped registry is built again
+        gvc.core.chats.chat_lookups = 1
+        self.assertTrue(gvc.core.chats.chat_exists(USER_NAME, PROJECT_NAME, node_id, chat2_id))
+        self.assertFalse(gvc.core.chats.chat_exists(USER_NAME, PROJECT_NAME, node_id, "unknown"))
+        self.assertEqual(len(registry.lookups), 1)
+        gvc.core.chats.close_project(USER_NAME, PROJECT_NAME)
+        self.assertFalse((USER_NAME, PROJECT_NAME) in gvc.core.chats.registries)
+        self.assertEqual(gvc.core.chats.get_chat_ids(USER_NAME, PROJECT_NAME, node_id), {chat1_id, chat2_id})
+
+    def test_message_back_pointers(self):
+        branch_id, chat1_id, chat2_id = self.create_two_chats(None)
+        message = messages.GoosvcMessage(USER_NAME, QUESTION1, RESPONSE1, chat1_id)
+        branch_id, node1_id = self.gvc.add_message(USER_NAME, PROJECT_NAME, branch_id, message)
+        message = messages.GoosvcMessage(USER_NAME, QUESTION2, RESPONSE2, chat2_id)
+        branch_id, node2_id = self.gvc.add_message(USER_NAME, PROJECT_NAME, branch_id, message)
+        message = messages.GoosvcMessage(USER_NAME, QUESTION3, RESPONSE3, chat1_id)
+        branch_id, node3_id = self.gvc.add_message(USER_NAME, PROJECT_NAME, branch_id, message)
+        # each message refers to the previous message of its chat
+        self.assertIsNone(self.gvc.get_message(USER_NAME, PROJECT_NAME, node1_id)["previous_message_node_id"])
+        self.assertIsNone(self.gvc.get_message(USER_NAME, PROJECT_NAME, node2_id)["previous_message_node_id"])
+        self.assertEqual(self.gvc.get_message(USER_NAME, PROJECT_NAME, node3_id)["previous_message_node_id"], node1_id)
+        # last message of each chat is indexed for the branch
+        anchor_id, last_messages = self.gvc.core.messages.last_messages[(USER_NAME, PROJECT_NAME, branch_id)]
+        self.assertEqual(anchor_id, node3_id)
+        self.assertEqual(last_messages, {chat1_id: node3_id, chat2_id: node2_id})
+        # messages are read by following the back-pointers (no other nodes are read)
+        self.gvc.core.messages.last_messages.clear()
+        self.gvc.core.node_cache.clear()
+        misses = self.gvc.core.node_cache.get_stats()["misses"]
+        message_nodes = self.gvc.get_message_nodes(USER_NAME, PROJECT_NAME, chat1_id, node1_id)
+        self.assertEqual([node.node_id for node in message_nodes], [node1_id])
+        message_nodes = self.gvc.get_message_nodes(USER_NAME, PROJECT_NAME, chat1_id, branch_id)
+        self.assertEqual([node.node_id for node in message_nodes], [node1_id, node3_id])
+        self.assertLessEqual(self.gvc.core.node_cache.get_stats()["misses"] - misses, 4)
+        # index is extended by nodes written without add_message (e.g. by another instance)
+        gvc = Goosvc("data-test")
+        message = messages.GoosvcMessage(USER_NAME, QUESTION4, RESPONSE4, chat2_id)
+        _, node4_id = gvc.add_message(USER_NAME, PROJECT_NAME, branch_id, message)
+        message_nodes = self.gvc.get_message_nodes(USER_NAME, PROJECT_NAME, chat2_id, branch_id)
+        self.assertEqual([node.node_id for node in message_nodes], [node2_id, node4_id])
+        _, last_messages = self.gvc.core.messages.last_messages[(USER_NAME, PROJECT_NAME, branch_id)]
+        self.assertEqual(last_messages[chat1_id], node3_id)
+        # messages without back-pointer (written by older versions) are found on the path
+        content = {"chat_id": chat1_id, "request": QUESTION4, "response": RESPONSE4, "assistant": ASSISTANT_NAME, "request_artifacts": {}, "response_artifacts": {}}
+        branch_id, node5_id = self.gvc.core.nodes.add_node(USER_NAME, PROJECT_NAME, nodes.GoosvcNode("message", branch_id, USER_NAME, content))
+        message_nodes = self.gvc.get_message_nodes(USER_NAME, PROJECT_NAME, chat1_id, branch_id)
+        self.assertEqual([node.node_id for node in message_nodes], [node1_id, node3_id, node5_id])
+
+    def test_message_cursors(self):
+        branch_id, chat1_id, chat2_id = self.create_two_chats(None)
+        node_ids = []
+        for i in range(10):
+            message = messages.GoosvcMessage(USER_NAME, "Request " + str(i), "...", chat1_id if i % 2 == 0 else chat2_id)
+            branch_id, node_id = self.gvc.add_message(USER_NAME, PROJECT_NAME, branch_id, message)
+            node_ids.append(node_id)
+        chat1_node_ids = node_ids[0::2]
+        # newest messages
+        message_nodes = self.gvc.get_message_nodes(USER_NAME, PROJECT_NAME, chat1_id, branch_id, limit=2)
+        self.assertEqual([node.node_id for node in message_nodes], chat1_node_ids[3:])
+        self.assertEqual(self.gvc.get_last_message_node(USER_NAME, PROJECT_NAME, chat1_id, branch_id).node_id, chat1_node_ids[4])
+        # messages before and after a cursor
+        message_nodes = self.gvc.get_message_nodes(USER_NAME, PROJECT_NAME, chat1_id, branch_id, limit=2, before=chat1_node_ids[3])
+        self.assertEqual([node.node_id for node in message_nodes], chat1_node_ids[1:3])
+        message_nodes = self.gvc.get_message_nodes(USER_NAME, PROJECT_NAME, chat1_id, branch_id, after=chat1_node_ids[1])
+        self.assertEqual([node.node_id for node in message_nodes], chat1_node_ids[2:])
+        message_nodes = self.gvc.get_message_nodes(USER_NAME, PROJECT_NAME, chat1_id, branch_id, limit=2, after=chat1_node_ids[1])
+        self.assertEqual([node.node_id for node in message_nodes], chat1_node_ids[2:4])
+        messages_read = self.gvc.get_messages(USER_NAME, PROJECT_NAME, chat1_id, branch_id, limit=1, before=chat1_node_ids[1])
+        self.assertEqual([message["request"] for message in messages_read], ["Request 0"])
+        # cursor must be a message on the path
+        self.assertRaises(GoosvcException, self.gvc.get_message_nodes, USER_NAME, PROJECT_NAME, chat1_id, chat1_node_ids[1], None, None, chat1_node_ids[3])
+        # pages from the newest to the oldest messages
+        pages = []
+        page, cursor = self.gvc.get_messages_page(USER_NAME, PROJECT_NAME, chat1_id, branch_id, 2)
+        pages.append([message["request"] for message in page])
+        while cursor != None:
+            page, cursor = self.gvc.get_messages_page(USER_NAME, PROJECT_NAME, chat1_id, branch_id, 2, cursor)
+            pages.append([message["request"] for message in page])
+        self.assertEqual(pages, [["Request 6", "Request 8"], ["Request 2", "Request 4"], ["Request 0"]])
+        # iterator reads older messages only when needed
+        self.gvc.core.node_cache.clear()
+        misses = self.gvc.core.node_cache.get_stats()["misses"]
+        message_node = next(self.gvc.iter_message_nodes(USER_NAME, PROJECT_NAME, chat2_id, branch_id))
+        self.assertEqual(message_node.node_id, node_ids[9])
+        self.assertLessEqual(self.gvc.core.node_cache.get_stats()["misses"] - misses, 1)
+
     # helper functions
     def create_one_chat(self, parent_id):
         chat1 = chats.GoosvcChat(USER_NAME, CHAT1_NAME)
@@ -1,5 +1,8 @@
 import unittest
+import os
+import threading
 from goosvc.core import core
+from goosvc.core import common as common
 
 
 class TestCore(unittest.TestCase):
@@ -8,4 +11,23 @@ class TestCore(unittest.TestCase):
 
     def test_basedir(self):
         base_dir = self.gvc.get_base_dir()
-        self.assertEqual(base_dir, "data-test")
\ No newline at end of file
+        self.assertEqual(base_dir, "data-test")
+
+    def test_write_file(self):
+        test_file = os.path.join("data-test", "test_write_file.json")
+        common.write_file(test_file, "0" * 10000)
+        values = []
+        def write():
+            for i in range(1, 200):
+                common.write_file(test_file, str(i % 10) * 10000)
+        thread = threading.Thread(target=write)
+        thread.start()
+        while thread.is_alive():
+            with open(test_file, 'r') as f:
+                values.append(f.read())
+        thread.join()
+        os.remove(test_file)
+        # readers never see a partially written file
+        for value in values:
+            self.assertEqual(value, value[0] * 10000)
+        self.assertEqual([file for file in os.listdir("data-test") if file.endswith(".tmp")], [])
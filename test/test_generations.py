@@ -0,0 +1,76 @@
+import unittest
+import os
+from goosvc.core import locks
+from goosvc.core import common as common
+from goosvc.core.nodes import GoosvcNode
+from goosvc.core.projects import GoosvcPermission
+from goosvc.goosvc import Goosvc
+
+USER_NAME = "test_user"
+USER_NAME2 = "test_user2"
+PROJECT_NAME = "unittest_test_generations"
+TEST_TYPE1 = "test-type-1"
+
+
+class TestGenerations(unittest.TestCase):
+
+    def setUp(self):
+        # two instances on the same repository behave like two processes (no shared memory)
+        self.gvc = Goosvc("data-test")
+        self.gvc.create_project(USER_NAME, PROJECT_NAME)
+        self.gvc2 = Goosvc("data-test")
+        for gvc in [self.gvc, self.gvc2]:
+            gvc.core.projects.lock_backend = locks.LOCK_BACKEND_FILE
+
+    def tearDown(self):
+        self.gvc.delete_project(USER_NAME, PROJECT_NAME)
+
+    def test_nodes(self):
+        node = GoosvcNode(TEST_TYPE1, None, USER_NAME, "node 1")
+        branch_id, node_id = self.gvc.add_node(USER_NAME, PROJECT_NAME, node)
+        self.assertEqual(len(self.gvc.get_path(USER_NAME, PROJECT_NAME, branch_id)), 1)
+        # second instance reads and extends the branch
+        self.assertEqual(self.gvc2.get_branch_head(USER_NAME, PROJECT_NAME, branch_id), node_id)
+        node = GoosvcNode(TEST_TYPE1, branch_id, USER_NAME, "node 2")
+        _, node_id2 = self.gvc2.add_node(USER_NAME, PROJECT_NAME, node)
+        # first instance drops its cached state
+        self.assertTrue(self.gvc.core.generations.is_stale(USER_NAME, PROJECT_NAME))
+        self.assertEqual(self.gvc.get_branch_head(USER_NAME, PROJECT_NAME, branch_id), node_id2)
+        self.assertFalse(self.gvc.core.generations.is_stale(USER_NAME, PROJECT_NAME))
+        node = GoosvcNode(TEST_TYPE1, branch_id, USER_NAME, "node 3")
+        self.gvc.add_node(USER_NAME, PROJECT_NAME, node)
+        for gvc in [self.gvc, self.gvc2]:
+            path = gvc.get_path(USER_NAME, PROJECT_NAME, branch_id)
+            self.assertEqual([node.content for node in path], ["node 3", "node 2", "node 1"])
+            self.assertEqual(path[0].version, 3)
+            self.assertEqual(len(gvc.get_branches(USER_NAME, PROJECT_NAME)), 1)
+
+    def test_write_in_progress(self):
+        node = GoosvcNode(TEST_TYPE1, None, USER_NAME, "node 1")
+        branch_id, node_id = self.gvc.add_node(USER_NAME, PROJECT_NAME, node)
+        self.assertEqual(len(self.gvc2.get_path(USER_NAME, PROJECT_NAME, branch_id)), 1)
+        # first instance is writing a record (not indexed yet) and another write was completed before
+        nodes_dir = os.path.join(common.get_project_dir(self.gvc.core.projects_dir, USER_NAME, PROJECT_NAME), "nodes")
+        segment_file = os.path.join(nodes_dir, "00000001.pack")
+        with open(segment_file, 'ab') as f:
+            f.write(b'{"type": "incomplete')
+        segment_size = os.path.getsize(segment_file)
+        self.gvc.core.generations.bump(USER_NAME, PROJECT_NAME)
+        # second instance reads the ends of the files again without changing them and keeps its caches
+        self.assertEqual(len(self.gvc2.get_path(USER_NAME, PROJECT_NAME, branch_id)), 1)
+        self.assertEqual(os.path.getsize(segment_file), segment_size)
+        self.assertIsNotNone(self.gvc2.core.node_cache.get(USER_NAME, PROJECT_NAME, node_id))
+        # the write was interrupted: the next writer removes the incomplete record
+        node = GoosvcNode(TEST_TYPE1, branch_id, USER_NAME, "node 2")
+        self.gvc2.add_node(USER_NAME, PROJECT_NAME, node)
+        node = GoosvcNode(TEST_TYPE1, branch_id, USER_NAME, "node 3")
+        self.gvc.add_node(USER_NAME, PROJECT_NAME, node)
+        for gvc in [self.gvc, self.gvc2, Goosvc("data-test")]:
+            path = gvc.get_path(USER_NAME, PROJECT_NAME, branch_id)
+            self.assertEqual([node.content for node in path], ["node 3", "node 2", "node 1"])
+            self.assertEqual(gvc.get_path_ids(USER_NAME, PROJECT_NAME, branch_id), [node.node_id for node in path])
+
+    def test_permissions(self):
+        self.assertFalse(self.gvc.permission(USER_NAME, PROJECT_NAME, USER_NAME2).read)
+        self.gvc2.set_access_permission(USER_NAME, PROJECT_NAME, USER_NAME2, GoosvcPermission(True, False, False))
+        self.assertTrue(self.gvc.permission(USER_NAME, PROJECT_NAME, USER_NAME2).read)
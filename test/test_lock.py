@@ -5,6 +5,9 @@ import goosvc.core.common as common
 from goosvc.goosvc import Goosvc
 from threading import Thread
 from goosvc.core.exceptions import GoosvcException
+import os
+from goosvc.core import locks
+from goosvc.core.locks import GoosvcRWLock, GoosvcFileLock
 
 USER_NAME = "test_user"
 USER_NAME2 = "test_user2"
@@ -105,6 +108,99 @@ class TestLock(unittest.TestCase):
         self.assertIsNotNone(branch_id)
         self.assertIsNotNone(node_id)
     
+    def test_simultaneous_add_branches(self):
+        node = GoosvcNode(TEST_TYPE1, None, USER_NAME, "first node")
+        _, root_id = self.gvc.add_node(USER_NAME,PROJECT_NAME,node)
+        branch_ids = []
+        for i in range(8):
+            node = GoosvcNode(TEST_TYPE1, root_id, USER_NAME, "branch " + str(i))
+            branch_ids.append(self.gvc.add_node(USER_NAME,PROJECT_NAME,node)[0])
+        threads = [Thread(target = self.write_nodes, args=(50, branch_id, i)) for i, branch_id in enumerate(branch_ids)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(self.branches.get_branches(USER_NAME, PROJECT_NAME)), 8)
+        for i, branch_id in enumerate(branch_ids):
+            path = self.nodes.get_path(USER_NAME, PROJECT_NAME, branch_id)
+            self.assertEqual(len(path), 52)
+            self.assertEqual(path[0].content, "thread " + str(i) + " node 50")
+            self.assertEqual(path[0].version, 52)
+            # topology (appended by concurrent writers) matches the nodes
+            self.assertEqual(self.nodes.get_path_ids(USER_NAME, PROJECT_NAME, branch_id), [node.node_id for node in path])
+        # branch locks are dropped once the writers are done
+        self.assertEqual(len(self.nodes.branch_locks), 0)
+
+    def test_rw_lock(self):
+        lock = GoosvcRWLock()
+        # readers share the lock (also reentrant), writers wait for them
+        self.assertTrue(lock.acquire_read(1))
+        self.assertTrue(lock.acquire_read(1))
+        t1 = Thread(target = lambda: self.assertTrue(lock.acquire_read(1) and lock.release_read() == None))
+        t1.start()
+        t1.join()
+        self.assertFalse(lock.acquire_write(0.1))
+        # waiting writers are preferred over new readers. readers holding the lock can read again
+        results = []
+        t2 = Thread(target = lambda: results.append(lock.acquire_write(5)))
+        t2.start()
+        time.sleep(0.1)
+        t3 = Thread(target = lambda: results.append(lock.acquire_read(0.1)))
+        t3.start()
+        t3.join()
+        self.assertTrue(lock.acquire_read(0.1))
+        lock.release_read()
+        lock.release_read()
+        lock.release_read()
+        t2.join()
+        self.assertEqual(results, [False, True])
+        # writer can read, the write lock can be released by another thread
+        self.assertFalse(lock.acquire_write(0.1))
+        t4 = Thread(target = lock.release_write)
+        t4.start()
+        t4.join()
+        self.assertTrue(lock.acquire_write(0.1))
+        self.assertTrue(lock.acquire_read(0.1))
+        lock.release_read()
+        lock.release_write()
+
+    def test_read_during_write(self):
+        node = GoosvcNode(TEST_TYPE1, None, USER_NAME, "first node")
+        branch_id, node_id = self.gvc.add_node(USER_NAME,PROJECT_NAME,node)
+        # reads wait for the write and fail after the lock timeout
+        self.project.project_lock_timeout = 0.1
+        t1 = Thread(target = self.project.lock_project, args=(USER_NAME, PROJECT_NAME))
+        t1.start()
+        t1.join()
+        self.assertRaises(GoosvcException, self.nodes.get_node, USER_NAME, PROJECT_NAME, node_id)
+        self.assertRaises(GoosvcException, self.branches.get_branch_head, USER_NAME, PROJECT_NAME, branch_id)
+        self.project.release_project(USER_NAME, PROJECT_NAME)
+        self.assertEqual(self.nodes.get_node(USER_NAME, PROJECT_NAME, node_id).node_id, node_id)
+
+    def test_file_lock_backend(self):
+        self.project.lock_backend = locks.LOCK_BACKEND_FILE
+        self.project.project_lock_timeout = 0.1
+        node = GoosvcNode(TEST_TYPE1, None, USER_NAME, "first node")
+        branch_id, node_id = self.gvc.add_node(USER_NAME,PROJECT_NAME,node)
+        # lock held by another process (a second open lock file behaves the same)
+        other_lock = GoosvcFileLock(os.path.join(self.project.locks_dir, USER_NAME, PROJECT_NAME + ".lock"))
+        self.assertTrue(other_lock.acquire(0.1))
+        self.assertFalse(self.project.lock_project(USER_NAME, PROJECT_NAME))
+        node = GoosvcNode(TEST_TYPE1, branch_id, USER_NAME, "second node")
+        self.assertRaises(GoosvcException, self.gvc.add_node, USER_NAME, PROJECT_NAME, node)
+        # other projects are not affected
+        self.assertTrue(self.project.lock_project(USER_NAME, PROJECT_NAME2))
+        self.project.release_project(USER_NAME, PROJECT_NAME2)
+        other_lock.release()
+        node = GoosvcNode(TEST_TYPE1, branch_id, USER_NAME, "second node")
+        self.assertEqual(self.gvc.add_node(USER_NAME,PROJECT_NAME,node)[0], branch_id)
+        # while the project is locked, the other process can not get the lock
+        self.assertTrue(self.project.lock_project(USER_NAME, PROJECT_NAME))
+        self.assertFalse(other_lock.acquire(0.1))
+        self.project.release_project(USER_NAME, PROJECT_NAME)
+        self.assertTrue(other_lock.acquire(0.1))
+        other_lock.release()
+
     def write_nodes(self, count, branch_id, thread_id):
         # print("writing nodes in thread",thread_id)
         for i in range(count):
@@ -374,6 +374,68 @@ class TestMerge(unittest.TestCase):
         self.assertEqual(chat_2_message_nodes[0].content['request'], "Message a")
         self.assertEqual(chat_2_message_nodes[1].content['request'], "Message d")
         self.assertEqual(chat_2_message_nodes[2].content['request'], "Message e")
+        # the merged branches are unchanged (merge must not modify the cached original nodes)
+        branch2_messages = self.gvc.get_messages(USER_NAME, PROJECT_NAME, chat1_id, branch_id2)
+        self.assertEqual([message["request"] for message in branch2_messages], ["Message a", "Message d", "Message e"])
+        self.assertEqual(self.gvc.core.nodes.get_node(USER_NAME, PROJECT_NAME, message_e_node_id).content['chat_id'], chat1_id)
+
+    # before merge (chat 1 is continued on both branches, chat x and chat y are new):
+    # branch 1: chat 1 -> message a -> message b -> chat x -> message x1 -> message c -> message x2
+    # branch 2:                     -> chat y -> message d -> message y1 -> message e -> message y2
+    # the merged messages refer to the previous merged message of their chat
+    def test_merge_message_back_pointers(self):
+        node1 = GoosvcNode(TEST_TYPE1, None, USER_NAME, "test content 1")
+        branch_id1, node1_id = self.gvc.add_node(USER_NAME,PROJECT_NAME,node1)
+        chat1 = GoosvcChat(USER_NAME, "chat 1")
+        branch_id1, chat1_node_id, chat1_id = self.gvc.create_chat(USER_NAME, PROJECT_NAME, branch_id1, chat1)
+        branch_id1, message_a_node_id = self.gvc.add_message(USER_NAME, PROJECT_NAME, branch_id1, GoosvcMessage(USER_NAME, "Message a", "...", chat1_id))
+        # branch 1
+        node2 = GoosvcNode(TEST_TYPE1, message_a_node_id, USER_NAME, "test content 2")
+        branch_id1, _ = self.gvc.add_node(USER_NAME,PROJECT_NAME,node2)
+        branch_id1, _ = self.gvc.add_message(USER_NAME, PROJECT_NAME, branch_id1, GoosvcMessage(USER_NAME, "Message b", "...", chat1_id))
+        branch_id1, _, chat_x_id = self.gvc.create_chat(USER_NAME, PROJECT_NAME, branch_id1, GoosvcChat(USER_NAME, "chat x"))
+        branch_id1, _ = self.gvc.add_message(USER_NAME, PROJECT_NAME, branch_id1, GoosvcMessage(USER_NAME, "Message x1", "...", chat_x_id))
+        branch_id1, _ = self.gvc.add_message(USER_NAME, PROJECT_NAME, branch_id1, GoosvcMessage(USER_NAME, "Message c", "...", chat1_id))
+        branch_id1, head1_id = self.gvc.add_message(USER_NAME, PROJECT_NAME, branch_id1, GoosvcMessage(USER_NAME, "Message x2", "...", chat_x_id))
+        # branch 2
+        node3 = GoosvcNode(TEST_TYPE1, message_a_node_id, USER_NAME, "test content 3")
+        branch_id2, _ = self.gvc.add_node(USER_NAME,PROJECT_NAME,node3)
+        branch_id2, _, chat_y_id = self.gvc.create_chat(USER_NAME, PROJECT_NAME, branch_id2, GoosvcChat(USER_NAME, "chat y"))
+        branch_id2, _ = self.gvc.add_message(USER_NAME, PROJECT_NAME, branch_id2, GoosvcMessage(USER_NAME, "Message d", "...", chat1_id))
+        branch_id2, _ = self.gvc.add_message(USER_NAME, PROJECT_NAME, branch_id2, GoosvcMessage(USER_NAME, "Message y1", "...", chat_y_id))
+        branch_id2, _ = self.gvc.add_message(USER_NAME, PROJECT_NAME, branch_id2, GoosvcMessage(USER_NAME, "Message e", "...", chat1_id))
+        branch_id2, head2_id = self.gvc.add_message(USER_NAME, PROJECT_NAME, branch_id2, GoosvcMessage(USER_NAME, "Message y2", "...", chat_y_id))
+        # merge
+        merge_branch_id, _ = self.merge.merge(USER_NAME, PROJECT_NAME, USER_NAME, [head1_id, head2_id])
+        self.assertIsNotNone(merge_branch_id)
+        merged = {} # request -> merged message node
+        for node in self.gvc.get_path(USER_NAME, PROJECT_NAME, merge_branch_id, ["message"], message_a_node_id):
+            merged[node.content["request"]] = node
+        self.assertEqual(sorted(merged.keys()), ["Message b", "Message c", "Message d", "Message e", "Message x1", "Message x2", "Message y1", "Message y2"])
+        # previous message of each merged message (chat 1 of branch 2 continues as a new chat: its first message has none)
+        expected = {
+            "Message b": message_a_node_id,
+            "Message x1": None,
+            "Message c": merged["Message b"].node_id,
+            "Message x2": merged["Message x1"].node_id,
+            "Message d": None,
+            "Message y1": None,
+            "Message e": merged["Message d"].node_id,
+            "Message y2": merged["Message y1"].node_id,
+        }
+        for request, previous_id in expected.items():
+            self.assertEqual(merged[request].content["previous_message_node_id"], previous_id, request)
+        # chats read along the pointers
+        chats = {chat["chat_name"]: chat["chat_id"] for chat in self.gvc.get_chats(USER_NAME, PROJECT_NAME, merge_branch_id)}
+        expected_requests = {
+            "chat 1": ["Message a", "Message b", "Message c"],
+            "chat 1.": ["Message a", "Message d", "Message e"],
+            "chat x": ["Message x1", "Message x2"],
+            "chat y": ["Message y1", "Message y2"],
+        }
+        for chat_name, requests in expected_requests.items():
+            messages = self.gvc.get_messages(USER_NAME, PROJECT_NAME, chats[chat_name], merge_branch_id)
+            self.assertEqual([message["request"] for message in messages], requests, chat_name)
 
 
         
@@ -1,5 +1,6 @@
 import unittest
 import os
+import threading
 from goosvc.core import chats, messages
 from goosvc.goosvc import Goosvc
 from goosvc.core.artifacts import StoreFileArtifact, StoreTextArtifact
@@ -56,6 +57,40 @@ class TestMessages(unittest.TestCase):
         self.assertEqual(message1_node["response"], RESPONSE1)
         self.assertEqual(message1_node["chat_id"], chat_id)
 
+    def test_add_messages_concurrently(self):
+        # two chats on one branch, two writers per chat
+        chat1 = chats.GoosvcChat(USER_NAME, CHAT1_NAME)
+        branch_id, _, chat1_id = self.gvc.create_chat(USER_NAME, PROJECT_NAME, None, chat1)
+        chat2 = chats.GoosvcChat(USER_NAME, CHAT1_NAME)
+        _, _, chat2_id = self.gvc.create_chat(USER_NAME, PROJECT_NAME, branch_id, chat2)
+        branch_ids = []
+        errors = []
+        def add_messages(chat_id):
+            try:
+                for i in range(20):
+                    message = messages.GoosvcMessage(USER_NAME, QUESTION1, RESPONSE1, chat_id, ASSISTANT_NAME)
+                    branch_ids.append(self.gvc.add_message(USER_NAME, PROJECT_NAME, branch_id, message)[0])
+            except Exception as e:
+                errors.append(e)
+        threads = [threading.Thread(target=add_messages, args=(chat_id,)) for chat_id in [chat1_id, chat1_id, chat2_id, chat2_id]]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        # all messages are appended to the branch
+        self.assertEqual(set(branch_ids), {branch_id})
+        path = self.gvc.get_path(USER_NAME, PROJECT_NAME, branch_id, ["message"])
+        self.assertEqual(len(path), 80)
+        # each message points to the message of its chat before it on the branch
+        for chat_id in [chat1_id, chat2_id]:
+            message_nodes = self.gvc.get_message_nodes(USER_NAME, PROJECT_NAME, chat_id, branch_id)
+            self.assertEqual([node.node_id for node in message_nodes], [node.node_id for node in reversed(path) if node.content["chat_id"] == chat_id])
+            previous_id = None
+            for message_node in message_nodes:
+                self.assertEqual(message_node.content["chat_id"], chat_id)
+                self.assertEqual(message_node.content["previous_message_node_id"], previous_id)
+                previous_id = message_node.node_id
 
     def test_add_message_with_artifacts(self):
         # create chat 1
@@ -215,3 +215,95 @@ class TestNodes(unittest.TestCase):
 
 
     
+
+    def test_get_nodes_page(self):
+        node = nodes.GoosvcNode(TEST_TYPE1, None, USER_NAME, "test content 0")
+        branch_id, _ = self.gvc.add_node(USER_NAME,PROJECT_NAME,node)
+        for i in range(24):
+            node_type = TEST_TYPE1 if i % 2 == 0 else TEST_TYPE2
+            author = USER_NAME if i % 3 == 0 else "other_user"
+            node = nodes.GoosvcNode(node_type, branch_id, author, "test content " + str(i+1))
+            self.gvc.add_node(USER_NAME,PROJECT_NAME,node)
+        # all nodes in pages of 10
+        contents = []
+        cursor = None
+        pages = 0
+        while True:
+            page, cursor = self.gvc.get_nodes_page(USER_NAME,PROJECT_NAME,10,cursor)
+            contents.extend([node.content for node in page])
+            pages += 1
+            if cursor == None:
+                break
+        self.assertEqual(pages, 3)
+        self.assertEqual(contents, ["test content " + str(i) for i in range(25)])
+        # filters
+        page, cursor = self.gvc.get_nodes_page(USER_NAME,PROJECT_NAME,10,None,[TEST_TYPE2])
+        self.assertEqual(len(page), 10)
+        self.assertTrue(all(node.type == TEST_TYPE2 for node in page))
+        page, cursor = self.gvc.get_nodes_page(USER_NAME,PROJECT_NAME,10,cursor,[TEST_TYPE2])
+        self.assertEqual(len(page), 2)
+        self.assertIsNone(cursor)
+        page, _ = self.gvc.get_nodes_page(USER_NAME,PROJECT_NAME,100,None,[TEST_TYPE2],"other_user")
+        self.assertEqual(len(page), 8)
+        first_node = self.gvc.get_nodes(USER_NAME,PROJECT_NAME)[0]
+        page, _ = self.gvc.get_nodes_page(USER_NAME,PROJECT_NAME,100,None,[],None,first_node.timestamp,first_node.timestamp + 3600)
+        self.assertEqual(len(page), 25)
+        page, _ = self.gvc.get_nodes_page(USER_NAME,PROJECT_NAME,100,None,[],None,None,first_node.timestamp)
+        self.assertEqual(len(page), 0)
+        # lazy iteration
+        iterator = self.gvc.iter_nodes(USER_NAME,PROJECT_NAME,TEST_TYPE1)
+        self.assertEqual(next(iterator).content, "test content 0")
+        self.assertEqual(next(iterator).content, "test content 1")
+        # unknown cursor
+        with self.assertRaises(GoosvcException) as context:
+            self.gvc.get_nodes_page(USER_NAME,PROJECT_NAME,10,branch_id + 'A')
+        self.assertEqual(context.exception.code, "1025")
+
+    def test_add_nodes(self):
+        node1 = nodes.GoosvcNode(TEST_TYPE1, None, USER_NAME, "test content 1")
+        branch_id, node1_id = self.gvc.add_node(USER_NAME,PROJECT_NAME,node1)
+        new_nodes = [nodes.GoosvcNode(TEST_TYPE2, None, USER_NAME, "test content " + str(i+2)) for i in range(100)]
+        branch_id2, node_ids = self.gvc.add_nodes(USER_NAME,PROJECT_NAME,branch_id,new_nodes)
+        self.assertEqual(branch_id2, branch_id)
+        self.assertEqual(len(node_ids), 100)
+        self.assertEqual(self.branches.get_branch_head(USER_NAME,PROJECT_NAME,branch_id), node_ids[-1])
+        path = self.gvc.get_path(USER_NAME,PROJECT_NAME,branch_id)
+        self.assertEqual(len(path), 101)
+        self.assertEqual(path[0].version, 101)
+        self.assertEqual(path[-2].parent_id, node1_id)
+        # nodes added to a node which is not a head create a new branch
+        branch_id3, node_ids = self.gvc.add_nodes(USER_NAME,PROJECT_NAME,node1_id,[nodes.GoosvcNode(TEST_TYPE1, None, USER_NAME, "branch")])
+        self.assertNotEqual(branch_id3, branch_id)
+        # invalid transaction: no node is written
+        count = len(self.gvc.get_nodes(USER_NAME,PROJECT_NAME))
+        invalid_nodes = [nodes.GoosvcNode(TEST_TYPE1, None, USER_NAME, "valid"), nodes.GoosvcNode(TEST_TYPE1, None, USER_NAME, "invalid", None, None, 0, "unknown")]
+        with self.assertRaises(GoosvcException) as context:
+            self.gvc.add_nodes(USER_NAME,PROJECT_NAME,branch_id,invalid_nodes)
+        self.assertEqual(context.exception.code, "1027")
+        self.assertEqual(len(self.gvc.get_nodes(USER_NAME,PROJECT_NAME)), count)
+        # project is not locked after the error
+        self.gvc.add_node(USER_NAME,PROJECT_NAME,nodes.GoosvcNode(TEST_TYPE1, branch_id, USER_NAME, "after error"))
+
+    def test_add_nodes_keep_ids(self):
+        node_nodes = self.gvc.core.nodes
+        node1 = nodes.GoosvcNode(TEST_TYPE1, None, USER_NAME, "test content 1", "0123456789abcdef0123456789abcdef")
+        branch_id, node_ids = node_nodes.add_nodes(USER_NAME, PROJECT_NAME, None, [node1], False, True)
+        self.assertEqual(node_ids, ["0123456789abcdef0123456789abcdef"])
+        self.assertEqual(self.gvc.get_node(USER_NAME, PROJECT_NAME, node_ids[0]).content, "test content 1")
+        count = len(self.gvc.get_nodes(USER_NAME, PROJECT_NAME))
+        # ids must be 32 hex characters
+        invalid_node = nodes.GoosvcNode(TEST_TYPE1, None, USER_NAME, "invalid", "ghijklmnopqrstuvghijklmnopqrstuv")
+        with self.assertRaises(GoosvcException) as context:
+            node_nodes.add_nodes(USER_NAME, PROJECT_NAME, branch_id, [invalid_node], False, True)
+        self.assertEqual(context.exception.code, "1031")
+        # ids must not exist in the project
+        duplicate_node = nodes.GoosvcNode(TEST_TYPE1, None, USER_NAME, "duplicate", node_ids[0])
+        with self.assertRaises(GoosvcException) as context:
+            node_nodes.add_nodes(USER_NAME, PROJECT_NAME, branch_id, [duplicate_node], False, True)
+        self.assertEqual(context.exception.code, "1032")
+        # ids must be unique within the batch
+        batch = [nodes.GoosvcNode(TEST_TYPE1, None, USER_NAME, "batch " + str(i), "fedcba9876543210fedcba9876543210") for i in range(2)]
+        with self.assertRaises(GoosvcException) as context:
+            node_nodes.add_nodes(USER_NAME, PROJECT_NAME, branch_id, batch, False, True)
+        self.assertEqual(context.exception.code, "1032")
+        self.assertEqual(len(self.gvc.get_nodes(USER_NAME, PROJECT_NAME)), count)
@@ -0,0 +1,109 @@
+import unittest
+import os
+import json
+import dataclasses
+from goosvc.core import nodes
+from goosvc.core import common as common
+from goosvc.core.index import GoosvcNodeIndex
+from goosvc.goosvc import Goosvc
+
+USER_NAME = "test_user"
+PROJECT_NAME = "unittest_test_packs"
+TEST_TYPE1 = "test-type-1"
+
+
+class TestPacks(unittest.TestCase):
+
+    def setUp(self):
+        self.gvc = Goosvc("data-test")
+        self.gvc.create_project(USER_NAME, PROJECT_NAME)
+        self.packs = self.gvc.core.packs
+        project_dir = common.get_project_dir(self.gvc.core.projects_dir, USER_NAME, PROJECT_NAME)
+        self.nodes_dir = os.path.join(project_dir, "nodes")
+
+    def tearDown(self):
+        self.gvc.delete_project(USER_NAME, PROJECT_NAME)
+
+    def test_segments(self):
+        # small segments to force several segment files
+        self.packs.segment_size = 1024
+        branch_id = self.add_nodes(50)
+        segment_files = [f for f in os.listdir(self.nodes_dir) if f.endswith(".pack")]
+        self.assertGreater(len(segment_files), 1)
+        # no file per node
+        self.assertEqual(len([f for f in os.listdir(self.nodes_dir) if f.endswith(".json")]), 0)
+        # read path and nodes with a new instance (cold start)
+        gvc = Goosvc("data-test")
+        path = gvc.get_path(USER_NAME, PROJECT_NAME, branch_id)
+        self.assertEqual(len(path), 51)
+        self.assertEqual(path[0].content, "test content 50")
+        self.assertEqual(path[-1].content, "test content 0")
+        all_nodes = gvc.get_nodes(USER_NAME, PROJECT_NAME)
+        self.assertEqual(len(all_nodes), 51)
+        self.assertEqual(all_nodes[0].content, "test content 0")
+
+    def test_import_node_files(self):
+        # nodes stored as single files by older versions
+        node1 = nodes.GoosvcNode(TEST_TYPE1, None, USER_NAME, "test content 1", common.get_id(), common.get_timestamp(), 1)
+        node2 = nodes.GoosvcNode(TEST_TYPE1, node1.node_id, USER_NAME, "test content 2", common.get_id(), common.get_timestamp(), 2)
+        for node in [node2, node1]:
+            with open(os.path.join(self.nodes_dir, node.node_id + ".json"), 'w') as f:
+                f.write(json.dumps(dataclasses.asdict(node)))
+        gvc = Goosvc("data-test")
+        path = gvc.get_path(USER_NAME, PROJECT_NAME, node2.node_id)
+        self.assertEqual([node.node_id for node in path], [node2.node_id, node1.node_id])
+        self.assertEqual(len([f for f in os.listdir(self.nodes_dir) if f.endswith(".json")]), 0)
+        # imported nodes are written parents first
+        all_nodes = gvc.get_nodes(USER_NAME, PROJECT_NAME)
+        self.assertEqual([node.node_id for node in all_nodes], [node1.node_id, node2.node_id])
+
+    def test_interrupted_write(self):
+        branch_id = self.add_nodes(3)
+        self.packs.close_project(USER_NAME, PROJECT_NAME)
+        # remove last index entry and append an incomplete record
+        index_file = os.path.join(self.nodes_dir, "pack.idx")
+        with open(index_file, 'r+b') as f:
+            f.truncate(os.path.getsize(index_file) - 10)
+        with open(os.path.join(self.nodes_dir, "00000001.pack"), 'ab') as f:
+            f.write(b'{"type": "incomplete')
+        gvc = Goosvc("data-test")
+        path = gvc.get_path(USER_NAME, PROJECT_NAME, branch_id)
+        self.assertEqual(len(path), 4)
+        node = nodes.GoosvcNode(TEST_TYPE1, branch_id, USER_NAME, "test content 4")
+        gvc.add_node(USER_NAME, PROJECT_NAME, node)
+        self.assertEqual(len(gvc.get_nodes(USER_NAME, PROJECT_NAME)), 5)
+
+    def test_node_index(self):
+        index_file = os.path.join(self.nodes_dir, "test.map")
+        index = GoosvcNodeIndex(index_file)
+        self.assertFalse(index.open())
+        index.create(16)
+        node_ids = [common.get_id() for i in range(1000)]
+        for seq, node_id in enumerate(node_ids):
+            index.insert(node_id, seq, 1, seq * 100, 100)
+        # table was grown while inserting (through uniquely named temporary files)
+        self.assertGreaterEqual(index.capacity, 2000)
+        self.assertEqual([f for f in os.listdir(self.nodes_dir) if f.endswith(".tmp")], [])
+        # a second instance (e.g. another process) sees all entries
+        other_index = GoosvcNodeIndex(index_file)
+        self.assertTrue(other_index.open())
+        self.assertEqual(other_index.get_count(), 1000)
+        for seq, node_id in enumerate(node_ids):
+            self.assertEqual(other_index.lookup(node_id), (seq, 1, seq * 100, 100))
+        self.assertIsNone(other_index.lookup(common.get_id()))
+        self.assertIsNone(other_index.lookup("invalid"))
+        # growing the table retires the file mapped by the other instance
+        for seq in range(1000, 1100):
+            node_id = common.get_id()
+            index.insert(node_id, seq, 1, 0, 100)
+        self.assertEqual(other_index.lookup(node_id), (1099, 1, 0, 100))
+        other_index.close()
+        index.close()
+
+    def add_nodes(self, count):
+        node = nodes.GoosvcNode(TEST_TYPE1, None, USER_NAME, "test content 0")
+        branch_id, node_id = self.gvc.add_node(USER_NAME, PROJECT_NAME, node)
+        for i in range(count):
+            node = nodes.GoosvcNode(TEST_TYPE1, branch_id, USER_NAME, "test content " + str(i+1))
+            self.gvc.add_node(USER_NAME, PROJECT_NAME, node)
+        return branch_id
@@ -1,6 +1,7 @@
 import unittest
+import threading
 from goosvc.goosvc import Goosvc
-from goosvc.core.projects import GoosvcPermission
+from goosvc.core.projects import GoosvcPermission, ACCESS, PERMISSION_ALL, PERMISSION_READ
 from goosvc.core.nodes import GoosvcNode
 from goosvc.core.exceptions import GoosvcException
 
@@ -91,4 +92,34 @@ class TestPermissions(unittest.TestCase):
         # read path as unknown user
         self.assertRaises(GoosvcException, self.gvc.get_path, OWNER_NAME, PROJECT_NAME, branch_id2, [], None, "unknown")
 
+    def test_permission_table(self):
+        self.gvc.set_access_permission(OWNER_NAME, PROJECT_NAME, USER_NAME, GoosvcPermission(True, True, False))
+        projects = self.gvc.core.projects
+        self.assertIs(projects.get_access(OWNER_NAME, PROJECT_NAME, USER_NAME), ACCESS[3])
+        self.assertIs(projects.get_access(OWNER_NAME, PROJECT_NAME, "app"), ACCESS[PERMISSION_ALL])
+        self.assertIs(projects.get_access(OWNER_NAME, "unknown_project", USER_NAME), ACCESS[0])
+        # table is compiled again after a change
+        self.gvc.set_private(OWNER_NAME, PROJECT_NAME, False)
+        self.assertIs(projects.get_access(OWNER_NAME, PROJECT_NAME, "unknown"), ACCESS[PERMISSION_READ])
+        self.gvc.set_access_permission(OWNER_NAME, PROJECT_NAME, USER_NAME, GoosvcPermission(False, False, False))
+        self.assertIs(projects.get_access(OWNER_NAME, PROJECT_NAME, USER_NAME), ACCESS[0])
 
+    def test_permission_table_race(self):
+        projects = self.gvc.core.projects
+        done = threading.Event()
+        def check():
+            while not done.is_set():
+                # table is compiled while the permission changes
+                projects.permission_tables.clear()
+                projects.get_access(OWNER_NAME, PROJECT_NAME, USER_NAME)
+        reader = threading.Thread(target=check)
+        reader.start()
+        try:
+            for i in range(100):
+                self.gvc.set_access_permission(OWNER_NAME, PROJECT_NAME, USER_NAME, GoosvcPermission(True, True, False))
+                self.gvc.set_access_permission(OWNER_NAME, PROJECT_NAME, USER_NAME, GoosvcPermission(False, False, False))
+        finally:
+            done.set()
+            reader.join()
+        # a table compiled from replaced metadata is never kept: the revoked permission is not granted
+        self.assertIs(projects.get_access(OWNER_NAME, PROJECT_NAME, USER_NAME), ACCESS[0])
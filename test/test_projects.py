@@ -1,4 +1,5 @@
 import unittest
+import os
 from goosvc.goosvc import Goosvc
 
 USER_NAME = "test_user"
@@ -18,3 +19,89 @@ class TestProjects(unittest.TestCase):
 
     def tearDown(self):
         self.gvc.delete_project(USER_NAME, PROJECT_NAME)
+
+    def test_lazy_loading(self):
+        self.gvc.create_project(USER_NAME, PROJECT_NAME, "description")
+        gvc = Goosvc("data-test")
+        projects = gvc.core.projects
+        # nothing is loaded at startup
+        self.assertEqual(len(projects.projects), 0)
+        self.assertEqual(gvc.get_project(USER_NAME, PROJECT_NAME).description, "description")
+        self.assertEqual(len(projects.projects), 1)
+        self.assertIsNone(projects.get_project(USER_NAME, "unknown_project"))
+        self.assertIsNone(projects.get_project(USER_NAME, "../" + USER_NAME))
+        # least recently used projects are dropped and loaded again
+        projects.project_cache_size = 1
+        gvc.create_project(USER_NAME, PROJECT_NAME + "2")
+        self.assertEqual(list(projects.projects), [(USER_NAME, PROJECT_NAME + "2")])
+        self.assertTrue(gvc.permission(USER_NAME, PROJECT_NAME, USER_NAME).write)
+        gvc.delete_project(USER_NAME, PROJECT_NAME + "2")
+
+    def test_project_locks(self):
+        self.gvc.create_project(USER_NAME, PROJECT_NAME)
+        gvc = Goosvc("data-test")
+        projects = gvc.core.projects
+        # no locks for invalid names and missing projects
+        self.assertTrue(projects.lock_project_read(USER_NAME, "../" + USER_NAME))
+        projects.release_project_read(USER_NAME, "../" + USER_NAME)
+        self.assertFalse(projects.lock_project(USER_NAME, "../" + USER_NAME))
+        self.assertTrue(projects.lock_project_read(USER_NAME, "unknown_project"))
+        projects.release_project_read(USER_NAME, "unknown_project")
+        self.assertEqual(projects.project_locks, {})
+        # lock of an existing project is kept until the project is evicted or deleted
+        self.assertTrue(projects.lock_project(USER_NAME, PROJECT_NAME))
+        projects.release_project(USER_NAME, PROJECT_NAME)
+        self.assertIn(PROJECT_NAME, projects.project_locks[USER_NAME])
+        gvc.create_project(USER_NAME, PROJECT_NAME + "2")
+        projects.project_cache_size = 1
+        gvc.get_project(USER_NAME, PROJECT_NAME)
+        self.assertNotIn(PROJECT_NAME + "2", projects.project_locks[USER_NAME])
+        gvc.delete_project(USER_NAME, PROJECT_NAME)
+        self.assertEqual(projects.project_locks, {})
+        gvc.delete_project(USER_NAME, PROJECT_NAME + "2")
+
+    def test_manifest(self):
+        self.gvc.create_project(USER_NAME, PROJECT_NAME)
+        projects = self.gvc.core.projects
+        self.assertIsNone(projects.get_manifest())
+        projects.build_manifest()
+        try:
+            self.assertEqual(projects.get_manifest()[USER_NAME][PROJECT_NAME], True)
+            # manifest is kept up to date
+            self.gvc.create_project(USER_NAME, PROJECT_NAME + "2")
+            self.gvc.set_private(USER_NAME, PROJECT_NAME, False)
+            gvc = Goosvc("data-test")
+            self.assertEqual(gvc.core.projects.get_manifest()[USER_NAME], {PROJECT_NAME: False, PROJECT_NAME + "2": True})
+            self.gvc.delete_project(USER_NAME, PROJECT_NAME + "2")
+            self.assertEqual(gvc.core.projects.get_all_project_names()[USER_NAME], [PROJECT_NAME])
+        finally:
+            os.remove(projects.manifest_file)
+
+    def test_project_index(self):
+        names = [PROJECT_NAME] + [PROJECT_NAME + str(i) for i in range(4)]
+        for name in names:
+            self.gvc.create_project(USER_NAME, name)
+        self.gvc.set_private(USER_NAME, names[1], False)
+        self.gvc.set_private(USER_NAME, names[3], False)
+        try:
+            self.assertEqual(self.gvc.get_project_count(USER_NAME), 5)
+            self.assertEqual(self.gvc.get_project_count(USER_NAME, "other_user"), 2)
+            self.assertEqual(self.gvc.get_project_names(USER_NAME, "other_user"), [names[1], names[3]])
+            # pages
+            page, cursor = self.gvc.get_project_names_page(USER_NAME, 2)
+            self.assertEqual(page, names[0:2])
+            self.gvc.delete_project(USER_NAME, names[2])
+            page, cursor = self.gvc.get_project_names_page(USER_NAME, 2, cursor)
+            self.assertEqual((page, cursor), (names[3:5], None))
+            self.assertEqual(self.gvc.get_project_names_page(USER_NAME, 10, None, "other_user"), ([names[1], names[3]], None))
+            # projects created by another instance (process) are found
+            Goosvc("data-test").create_project(USER_NAME, PROJECT_NAME + "x")
+            self.assertEqual(self.gvc.get_project_count(USER_NAME), 5)
+            self.assertEqual(self.gvc.get_project_count("unknown_user"), 0)
+            # visibility changed by another instance (the owner directory is not changed)
+            Goosvc("data-test").set_private(USER_NAME, names[1], True)
+            self.assertEqual(self.gvc.get_project_names(USER_NAME, "other_user"), [names[3]])
+            self.assertEqual(self.gvc.get_project_count(USER_NAME, "other_user"), 1)
+        finally:
+            for name in names[3:] + [names[1], PROJECT_NAME + "x"]:
+                self.gvc.delete_project(USER_NAME, name)
@@ -0,0 +1,183 @@
+import unittest
+import os
+from threading import Thread
+from goosvc.core import nodes
+from goosvc.core import common as common
+from goosvc.goosvc import Goosvc
+
+USER_NAME = "test_user"
+PROJECT_NAME = "unittest_test_topology"
+TEST_TYPE1 = "test-type-1"
+TEST_TYPE2 = "test-type-2"
+
+
+class TestTopology(unittest.TestCase):
+
+    def setUp(self):
+        self.gvc = Goosvc("data-test")
+        self.gvc.create_project(USER_NAME, PROJECT_NAME)
+        self.nodes = self.gvc.core.nodes
+
+    def tearDown(self):
+        self.gvc.delete_project(USER_NAME, PROJECT_NAME)
+
+    # root -> 1 -> ... -> 20 (branch 1)
+    #              \-> 10a -> ... -> 15a (branch 2)
+    def add_tree(self):
+        node = nodes.GoosvcNode(TEST_TYPE1, None, USER_NAME, "root")
+        branch1_id, root_id = self.gvc.add_node(USER_NAME, PROJECT_NAME, node)
+        node_ids = [root_id]
+        for i in range(20):
+            node_type = TEST_TYPE1 if i % 3 == 0 else TEST_TYPE2
+            node = nodes.GoosvcNode(node_type, branch1_id, USER_NAME, "node " + str(i+1))
+            _, node_id = self.gvc.add_node(USER_NAME, PROJECT_NAME, node)
+            node_ids.append(node_id)
+        branch2_id = node_ids[9]
+        for i in range(6):
+            node = nodes.GoosvcNode(TEST_TYPE2, branch2_id, USER_NAME, "node " + str(i+10) + "a")
+            branch2_id, _ = self.gvc.add_node(USER_NAME, PROJECT_NAME, node)
+        return branch1_id, branch2_id, node_ids
+
+    def test_resident_path(self):
+        branch1_id, branch2_id, node_ids = self.add_tree()
+        queries = [
+            (branch1_id, [], None),
+            (branch2_id, [], None),
+            (branch1_id, [TEST_TYPE1], None),
+            (branch2_id, [TEST_TYPE2], None),
+            (branch1_id, [], node_ids[5]),
+            (branch2_id, [TEST_TYPE1], node_ids[2]),
+            (branch2_id, [], node_ids[15]), # root is not an ancestor
+            (node_ids[7], [TEST_TYPE1, TEST_TYPE2], None),
+        ]
+        expected = []
+        for id, types, root_id in queries:
+            path = self.nodes.get_path(USER_NAME, PROJECT_NAME, id, types, root_id)
+            expected.append([node.node_id for node in path])
+        # same results in resident mode
+        self.nodes.resident = True
+        for (id, types, root_id), expected_ids in zip(queries, expected):
+            path = self.nodes.get_path(USER_NAME, PROJECT_NAME, id, types, root_id)
+            self.assertEqual([node.node_id for node in path], expected_ids)
+            self.assertEqual(self.nodes.get_path_ids(USER_NAME, PROJECT_NAME, id, types, root_id), expected_ids)
+            self.assertEqual(self.gvc.get_path_ids(USER_NAME, PROJECT_NAME, id, types, root_id), expected_ids)
+        self.assertEqual(len(expected[0]), 21)
+        self.assertEqual(len(expected[1]), 16)
+        self.assertEqual(len(expected[6]), 0)
+
+    def test_is_ancestor(self):
+        branch1_id, branch2_id, node_ids = self.add_tree()
+        self.assertTrue(self.nodes.is_ancestor(USER_NAME, PROJECT_NAME, node_ids[0], branch2_id))
+        self.assertTrue(self.nodes.is_ancestor(USER_NAME, PROJECT_NAME, node_ids[9], branch2_id))
+        self.assertFalse(self.nodes.is_ancestor(USER_NAME, PROJECT_NAME, node_ids[10], branch2_id))
+        self.assertTrue(self.nodes.is_ancestor(USER_NAME, PROJECT_NAME, node_ids[10], branch1_id))
+        self.assertTrue(self.nodes.is_ancestor(USER_NAME, PROJECT_NAME, node_ids[20], node_ids[20]))
+        self.assertFalse(self.nodes.is_ancestor(USER_NAME, PROJECT_NAME, node_ids[20], node_ids[19]))
+        self.assertFalse(self.nodes.is_ancestor(USER_NAME, PROJECT_NAME, common.get_id(), branch1_id))
+
+    def test_rebuild(self):
+        branch1_id, branch2_id, node_ids = self.add_tree()
+        path = self.nodes.get_path_ids(USER_NAME, PROJECT_NAME, branch2_id, [TEST_TYPE2])
+        # remove topology files (e.g. project written by an older version)
+        project_dir = common.get_project_dir(self.gvc.core.projects_dir, USER_NAME, PROJECT_NAME)
+        os.remove(os.path.join(project_dir, "nodes", "topology.bin"))
+        os.remove(os.path.join(project_dir, "nodes", "topology.types"))
+        gvc = Goosvc("data-test")
+        self.assertEqual(gvc.core.nodes.get_path_ids(USER_NAME, PROJECT_NAME, branch2_id, [TEST_TYPE2]), path)
+        topology = gvc.core.topology.get_topology(USER_NAME, PROJECT_NAME)
+        self.assertEqual(topology.get_count(), 27)
+        self.assertEqual(max(topology.depths), 21)
+
+    def test_ancestors(self):
+        branch1_id, branch2_id, node_ids = self.add_tree()
+        self.assertEqual(self.nodes.get_ancestor(USER_NAME, PROJECT_NAME, branch1_id, 0), node_ids[20])
+        self.assertEqual(self.nodes.get_ancestor(USER_NAME, PROJECT_NAME, branch1_id, 20), node_ids[0])
+        self.assertEqual(self.nodes.get_ancestor(USER_NAME, PROJECT_NAME, branch2_id, 6), node_ids[9])
+        self.assertIsNone(self.nodes.get_ancestor(USER_NAME, PROJECT_NAME, branch1_id, 21))
+        self.assertEqual(self.nodes.get_common_ancestor(USER_NAME, PROJECT_NAME, [branch1_id, branch2_id]), node_ids[9])
+        self.assertEqual(self.nodes.get_common_ancestor(USER_NAME, PROJECT_NAME, [branch1_id, node_ids[4], branch2_id]), node_ids[4])
+        self.assertEqual(self.nodes.get_common_ancestor(USER_NAME, PROJECT_NAME, [branch2_id]), self.nodes.get_node(USER_NAME, PROJECT_NAME, branch2_id).node_id)
+        # separate root
+        node = nodes.GoosvcNode(TEST_TYPE1, None, USER_NAME, "second root")
+        branch3_id, _ = self.gvc.add_node(USER_NAME, PROJECT_NAME, node)
+        self.assertIsNone(self.nodes.get_common_ancestor(USER_NAME, PROJECT_NAME, [branch1_id, branch3_id]))
+
+    def test_deep_history(self):
+        # ancestor queries on a long history, compared with a walk through the parents
+        topology = self.gvc.core.topology.get_topology(USER_NAME, PROJECT_NAME)
+        topology.append(-1, 0, 1, 0)
+        for seq in range(1, 5000):
+            parent = seq - 1 if seq % 100 != 0 else seq // 2
+            topology.append(parent, 0, 1, 0)
+        for seq1, seq2 in [(4999, 4321), (4999, 2000), (3999, 2500), (4000, 4099), (17, 4999)]:
+            ancestors = set()
+            seq = seq1
+            while seq != -1:
+                ancestors.add(seq)
+                seq = topology.parents[seq]
+            seq = seq2
+            while not seq in ancestors:
+                seq = topology.parents[seq]
+            self.assertEqual(topology.get_common_ancestor(seq1, seq2), seq)
+            self.assertTrue(topology.is_ancestor(seq, seq1))
+            self.assertEqual(topology.is_ancestor(seq2, seq1), seq2 in ancestors)
+            self.assertEqual(topology.get_ancestor(seq1, topology.depths[seq1] - topology.depths[seq]), seq)
+
+    def test_typed_path(self):
+        # long path with few nodes of the requested type
+        node = nodes.GoosvcNode("stage", None, USER_NAME, {"stage_name": "stage 0", "stage_description": ""})
+        branch_id, _ = self.gvc.add_node(USER_NAME, PROJECT_NAME, node)
+        for i in range(300):
+            if i % 100 == 99:
+                node = nodes.GoosvcNode("stage", branch_id, USER_NAME, {"stage_name": "stage " + str(i), "stage_description": ""})
+            else:
+                node = nodes.GoosvcNode(TEST_TYPE1, branch_id, USER_NAME, "node " + str(i))
+            self.gvc.add_node(USER_NAME, PROJECT_NAME, node)
+        # count reads from the pack
+        packs = self.gvc.core.packs
+        reads = []
+        read = packs.read
+        packs.read = lambda owner, project, node_id: reads.append(node_id) or read(owner, project, node_id)
+        self.nodes.node_cache.clear()
+        stage_names = self.gvc.core.stages.get_stage_names(USER_NAME, PROJECT_NAME, branch_id)
+        self.assertEqual(stage_names, ["stage 299", "stage 199", "stage 99", "stage 0"])
+        self.assertEqual(len(reads), 4)
+        self.assertEqual(self.nodes.get_last_node(USER_NAME, PROJECT_NAME, branch_id, "stage").content["stage_name"], "stage 299")
+        self.assertIsNone(self.nodes.get_last_node(USER_NAME, PROJECT_NAME, branch_id, TEST_TYPE2))
+        packs.read = read
+
+    def test_load_failure(self):
+        branch1_id, branch2_id, node_ids = self.add_tree()
+        gvc = Goosvc("data-test")
+        packs = gvc.core.packs
+        get_count = packs.get_count
+        def failing_get_count(owner, project):
+            raise OSError("read error")
+        packs.get_count = failing_get_count
+        self.assertRaises(OSError, gvc.core.topology.get_topology, USER_NAME, PROJECT_NAME)
+        # the failed topology is dropped and loaded again on the next access
+        packs.get_count = get_count
+        topology = gvc.core.topology.get_topology(USER_NAME, PROJECT_NAME)
+        self.assertEqual(topology.get_count(), 27)
+
+    def test_concurrent_types(self):
+        # new types added by several threads at once get distinct codes
+        def add_nodes(thread):
+            node = nodes.GoosvcNode(TEST_TYPE1, None, USER_NAME, "root " + str(thread))
+            branch_id, _ = self.gvc.add_node(USER_NAME, PROJECT_NAME, node)
+            for i in range(5):
+                node = nodes.GoosvcNode("type-" + str(thread) + "-" + str(i), branch_id, USER_NAME, "node " + str(i))
+                self.gvc.add_node(USER_NAME, PROJECT_NAME, node)
+            branch_ids.append(branch_id)
+        branch_ids = []
+        threads = [Thread(target=add_nodes, args=(thread,)) for thread in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        gvc = Goosvc("data-test")
+        topology = gvc.core.topology.get_topology(USER_NAME, PROJECT_NAME)
+        self.assertEqual(len(set(topology.type_codes.values())), 41)
+        for branch_id in branch_ids:
+            node = gvc.core.nodes.get_node(USER_NAME, PROJECT_NAME, branch_id)
+            self.assertEqual(gvc.core.nodes.get_last_node(USER_NAME, PROJECT_NAME, branch_id, node.type).node_id, node.node_id)
@@ -0,0 +1,148 @@
+import unittest
+import os
+import time
+import threading
+from goosvc.core import nodes
+from goosvc.core import wal
+from goosvc.core import common as common
+from goosvc.goosvc import Goosvc
+
+USER_NAME = "test_user"
+PROJECT_NAME = "unittest_test_wal"
+TEST_TYPE1 = "test-type-1"
+
+
+class TestWal(unittest.TestCase):
+
+    def setUp(self):
+        self.gvc = Goosvc("data-test")
+        self.gvc.create_project(USER_NAME, PROJECT_NAME)
+        self.wal = self.gvc.core.wal
+        project_dir = common.get_project_dir(self.gvc.core.projects_dir, USER_NAME, PROJECT_NAME)
+        self.wal_file = os.path.join(project_dir, wal.WAL_FILE)
+
+    def tearDown(self):
+        self.gvc.delete_project(USER_NAME, PROJECT_NAME)
+
+    def test_recover(self):
+        node = nodes.GoosvcNode(TEST_TYPE1, None, USER_NAME, "test content 1")
+        branch_id, node_id = self.gvc.add_node(USER_NAME, PROJECT_NAME, node)
+        # write logged but not applied (e.g. crash after logging)
+        lost_node_id = common.get_id()
+        record = '{"type": "test-type-1", "parent_id": "' + node_id + '", "author": "test_user", "content": "test content 2", "node_id": "' + lost_node_id + '", "timestamp": 1, "version": 2, "transaction_id": null}\n'
+        self.wal.append(USER_NAME, PROJECT_NAME, {"records": [record], "branch_id": branch_id})
+        # incomplete entry at the end of the log
+        with open(self.wal_file, 'ab') as f:
+            f.write(b'0badc0de {"records": ["incomplete')
+        # write logged is completed on the first access (a read)
+        gvc = Goosvc("data-test")
+        self.assertEqual([node.content for node in gvc.get_path(USER_NAME, PROJECT_NAME, lost_node_id)], ["test content 2", "test content 1"])
+        # log is cleared after recovery
+        self.assertEqual(os.path.getsize(self.wal_file), 0)
+        node = nodes.GoosvcNode(TEST_TYPE1, branch_id, USER_NAME, "test content 3")
+        gvc.add_node(USER_NAME, PROJECT_NAME, node)
+        path = gvc.get_path(USER_NAME, PROJECT_NAME, branch_id)
+        self.assertEqual([node.content for node in path], ["test content 3", "test content 2", "test content 1"])
+
+    def test_checkpoint_replay(self):
+        node = nodes.GoosvcNode(TEST_TYPE1, None, USER_NAME, "test content 1")
+        branch_id, node_id = self.gvc.add_node(USER_NAME, PROJECT_NAME, node)
+        # write logged but not applied by another process (crash after logging)
+        lost_node_id = common.get_id()
+        record = '{"type": "test-type-1", "parent_id": "' + node_id + '", "author": "test_user", "content": "test content 2", "node_id": "' + lost_node_id + '", "timestamp": 1, "version": 2, "transaction_id": null}\n'
+        self.wal.append(USER_NAME, PROJECT_NAME, {"records": [record], "branch_id": branch_id})
+        # the next checkpoint completes the write before the log is cleared
+        self.wal.checkpoint_size = 0
+        node = nodes.GoosvcNode(TEST_TYPE1, None, USER_NAME, "new root")
+        self.gvc.add_node(USER_NAME, PROJECT_NAME, node)
+        self.assertEqual(len(self.get_log_lines()), 1)
+        path = self.gvc.get_path(USER_NAME, PROJECT_NAME, branch_id)
+        self.assertEqual([node.content for node in path], ["test content 2", "test content 1"])
+
+    def test_recover_branch_head(self):
+        node = nodes.GoosvcNode(TEST_TYPE1, None, USER_NAME, "test content 1")
+        branch_id, node_id = self.gvc.add_node(USER_NAME, PROJECT_NAME, node)
+        node = nodes.GoosvcNode(TEST_TYPE1, branch_id, USER_NAME, "test content 2")
+        _, node_id2 = self.gvc.add_node(USER_NAME, PROJECT_NAME, node)
+        # node written but branch head not updated (crash before head update)
+        self.gvc.core.branches.update_branch_head(USER_NAME, PROJECT_NAME, branch_id, node_id)
+        gvc = Goosvc("data-test")
+        self.assertEqual(gvc.core.branches.get_branch_head(USER_NAME, PROJECT_NAME, branch_id), node_id)
+        node = nodes.GoosvcNode(TEST_TYPE1, None, USER_NAME, "new root")
+        gvc.add_node(USER_NAME, PROJECT_NAME, node)
+        self.assertEqual(gvc.core.branches.get_branch_head(USER_NAME, PROJECT_NAME, branch_id), node_id2)
+
+    def test_group_commit(self):
+        self.wal.durability = wal.DURABILITY_EVERY
+        node = nodes.GoosvcNode(TEST_TYPE1, None, USER_NAME, "root")
+        _, root_id = self.gvc.add_node(USER_NAME, PROJECT_NAME, node)
+        errors = []
+        def add_nodes():
+            try:
+                for i in range(20):
+                    node = nodes.GoosvcNode(TEST_TYPE1, root_id, USER_NAME, "test content " + str(i))
+                    self.gvc.add_node(USER_NAME, PROJECT_NAME, node)
+            except Exception as e:
+                errors.append(e)
+        threads = [threading.Thread(target=add_nodes) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(len(self.gvc.get_nodes(USER_NAME, PROJECT_NAME)), 161)
+        project_wal = self.wal.wals[(USER_NAME, PROJECT_NAME)]
+        self.assertEqual(project_wal.synced, project_wal.written)
+        self.assertEqual(len(self.get_log_lines()), 161)
+
+    def test_sync_before_write(self):
+        self.wal.durability = wal.DURABILITY_EVERY
+        node = nodes.GoosvcNode(TEST_TYPE1, None, USER_NAME, "root")
+        branch_id, _ = self.gvc.add_node(USER_NAME, PROJECT_NAME, node)
+        project_wal = self.wal.wals[(USER_NAME, PROJECT_NAME)]
+        # the log entry is on disk when the node is written
+        packs = self.gvc.core.packs
+        synced = []
+        append = packs.append
+        packs.append = lambda owner, project, records: synced.append(project_wal.synced == project_wal.written) or append(owner, project, records)
+        node = nodes.GoosvcNode(TEST_TYPE1, branch_id, USER_NAME, "test content 1")
+        self.gvc.add_node(USER_NAME, PROJECT_NAME, node)
+        node = nodes.GoosvcNode(TEST_TYPE1, None, USER_NAME, "new root")
+        self.gvc.add_node(USER_NAME, PROJECT_NAME, node)
+        packs.append = append
+        self.assertEqual(synced, [True, True])
+
+    def test_batched_sync(self):
+        self.wal.durability = wal.DURABILITY_BATCHED
+        self.wal.sync_interval = 0.01
+        node = nodes.GoosvcNode(TEST_TYPE1, None, USER_NAME, "test content 1")
+        self.gvc.add_node(USER_NAME, PROJECT_NAME, node)
+        project_wal = self.wal.wals[(USER_NAME, PROJECT_NAME)]
+        # the last write is synced in the background without further writes
+        end_time = time.monotonic() + 5
+        while project_wal.synced < project_wal.written and time.monotonic() < end_time:
+            time.sleep(0.01)
+        self.assertEqual(project_wal.synced, project_wal.written)
+        # close syncs writes not synced yet
+        self.wal.sync_interval = 60
+        node = nodes.GoosvcNode(TEST_TYPE1, None, USER_NAME, "test content 2")
+        self.gvc.add_node(USER_NAME, PROJECT_NAME, node)
+        self.assertLess(project_wal.synced, project_wal.written)
+        self.gvc.close()
+        self.assertEqual(project_wal.synced, project_wal.written)
+        self.assertTrue(project_wal.is_closed())
+        self.assertEqual(len(self.gvc.get_nodes(USER_NAME, PROJECT_NAME)), 2)
+
+    def test_checkpoint(self):
+        self.wal.checkpoint_size = 1024
+        node = nodes.GoosvcNode(TEST_TYPE1, None, USER_NAME, "test content 0")
+        branch_id, _ = self.gvc.add_node(USER_NAME, PROJECT_NAME, node)
+        for i in range(50):
+            node = nodes.GoosvcNode(TEST_TYPE1, branch_id, USER_NAME, "test content " + str(i+1))
+            self.gvc.add_node(USER_NAME, PROJECT_NAME, node)
+        self.assertLess(os.path.getsize(self.wal_file), 2048)
+        self.assertEqual(len(self.gvc.get_path(USER_NAME, PROJECT_NAME, branch_id)), 51)
+
+    def get_log_lines(self):
+        with open(self.wal_file, 'rb') as f:
+            return f.read().splitlines()